@@ -1,5 +1,7 @@
 # app/config.py
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,8 +16,89 @@ class Settings(BaseSettings):
     # OpenRouter API Key
     OPENROUTER_API_KEY: str
 
-    # URL for the self-hosted embedding service API
-    EMBEDDING_SERVICE_URL: str
+    # Where embeddings are computed: "api" (the self-hosted HTTP service), "onnx" (an ONNX model
+    # run in-process on the CPU) or "hashing" (a model-free vectorizer for tests and offline runs)
+    EMBEDDING_BACKEND: Literal["api", "onnx", "hashing"] = "api"
+
+    # URL for the self-hosted embedding service API (required by the "api" backend)
+    EMBEDDING_SERVICE_URL: str | None = None
+
+    # Path to the .onnx model file of the "onnx" backend; tokenizer.json is expected next to it or one level up
+    EMBEDDING_MODEL_PATH: str | None = None
+
+    # Prefixes the "onnx" backend adds to queries and documents (e5 models are trained with these)
+    EMBEDDING_QUERY_PREFIX: str = "query: "
+    EMBEDDING_DOCUMENT_PREFIX: str = "passage: "
+
+    # Texts longer than this many tokens are truncated by the "onnx" backend
+    EMBEDDING_MAX_LENGTH: int = 512
+
+    # Size of the vectors produced by the "hashing" backend
+    EMBEDDING_DIMENSIONS: int = 384
+
+    # Determines if a local embedding model is loaded at startup instead of on the first question
+    EMBEDDING_PRELOAD: bool = True
+
+    # Determines if embeddings are cached (in memory and on disk) to skip repeated API calls
+    EMBEDDING_CACHE_ENABLED: bool = True
+
+    # Maximum number of embedding vectors kept in the in-memory cache tier
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+
+    # Determines if cached embeddings are also persisted to app/db/embedding_cache.sqlite3
+    EMBEDDING_CACHE_PERSIST: bool = True
+
+    # Number of texts in the first embedding requests when indexing; adapted to the service's latency
+    EMBEDDING_BATCH_SIZE: int = 16
+
+    # Upper bound for the adaptive embedding batch size
+    EMBEDDING_MAX_BATCH_SIZE: int = 128
+
+    # Maximum number of embedding requests in flight when indexing
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+
+    # Embedding response time above which batches shrink, in seconds
+    EMBEDDING_TARGET_LATENCY: float = 2.0
+
+    # Maximum size of a knowledge-base chunk, in tokens
+    CHUNK_MAX_TOKENS: int = 512
+
+    # Markdown sections smaller than this many tokens are merged with their neighbours
+    CHUNK_MIN_TOKENS: int = 64
+
+    # Overlap between the pieces of a section that exceeds CHUNK_MAX_TOKENS, in tokens
+    CHUNK_OVERLAP_TOKENS: int = 50
+
+    # tiktoken encoding used to count tokens (falls back to an estimate if it cannot be loaded)
+    CHUNK_TOKENIZER: str = "cl100k_base"
+
+    # Number of processes that load and split documents when indexing (0 or 1 splits in a worker thread)
+    INDEXING_WORKERS: int = 0
+
+    # Number of threads that run Chroma's synchronous calls
+    VECTOR_STORE_WORKERS: int = 4
+
+    # Number of Chroma calls that may queue for a thread; further callers wait on the event loop
+    VECTOR_STORE_MAX_PENDING: int = 32
+
+    # Determines if retrieval combines vector search with the BM25 lexical index (built during indexing)
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+
+    # How often retrieval checks whether the indexing script rewrote the BM25 index, in seconds
+    LEXICAL_INDEX_CHECK_INTERVAL: float = 30.0
+
+    # Number of knowledge-base chunks retrieved for a question
+    RETRIEVAL_K: int = 4
+
+    # Number of candidates taken from each of the vector and BM25 searches before fusion
+    RETRIEVAL_FETCH_K: int = 20
+
+    # Constant of the reciprocal rank fusion; higher values flatten the weight of the top ranks
+    RETRIEVAL_RRF_K: int = 60
+
+    # (Optional) Tag that identifies the embedding model in the cache.
+    # Defaults to EMBEDDING_SERVICE_URL (or the model of a local backend); change it when the service switches models.
+    EMBEDDING_CACHE_NAMESPACE: str | None = None
     
     # The specific chat model to use from OpenRouter
     # Best="google/gemini-2.0-flash-exp:free"
@@ -44,9 +127,118 @@ class Settings(BaseSettings):
     # Limits the length of the generated response in tokens
     OPENROUTER_MAX_TOKENS: int = 1024
     
+    # Context window of the chat models, in tokens (use the smaller of the primary and fallback models)
+    MODEL_CONTEXT_TOKENS: int = 8192
+
+    # Upper bound for the knowledge-base context in the prompt, in tokens
+    CONTEXT_MAX_TOKENS: int = 2048
+
+    # Maximum number of questions sent through the RAG chain (and so to the LLM) at a time; others wait in line
+    LLM_MAX_CONCURRENCY: int = 8
+
     # Number of messages to keep in the conversation window memory
     MEMORY_WINDOW_SIZE: int = 10
 
+    # Determines if the background startup runs one embedding and one retrieval, so the first question is fast
+    STARTUP_WARM_UP: bool = True
+
+    # Determines if startup also sends a one-token request to the LLM (checks the API key, opens the connection)
+    STARTUP_PING_LLM: bool = False
+
+    # Determines if answers to the predefined menu questions are precomputed and served instantly
+    CANNED_ANSWERS_ENABLED: bool = True
+
+    # How often to check the knowledge base and prompt for changes and refresh canned answers, in seconds
+    CANNED_ANSWERS_REFRESH_INTERVAL: int = 300
+
+    # Determines if answers to free-text questions are reused for semantically equivalent questions
+    SEMANTIC_CACHE_ENABLED: bool = False
+
+    # Minimum cosine similarity between two questions for a cached answer to be reused
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+
+    # How long a cached answer may be reused, in seconds
+    SEMANTIC_CACHE_TTL: int = 24 * 60 * 60
+
+    # Maximum number of answers kept in the semantic cache
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+
+    # How often the semantic cache checks the knowledge base for changes, in seconds
+    SEMANTIC_CACHE_KB_CHECK_INTERVAL: int = 60
+
+    # Maximum number of sessions whose recent history window is cached in memory (0 disables)
+    HISTORY_CACHE_MAX_ENTRIES: int = 1000
+
+    # Approximate memory budget for the history window cache, in bytes
+    HISTORY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Messages older than this many days are moved from chat_history to the archive (0 keeps them regardless of age).
+    # The memory window (MEMORY_WINDOW_SIZE turns) of every session is kept whatever its age.
+    HISTORY_RETENTION_DAYS: int = 30
+
+    # Number of most recent messages kept per session in chat_history; older ones are archived.
+    # 0 disables the limit; it is never lower than the memory window (MEMORY_WINDOW_SIZE turns).
+    HISTORY_RETENTION_MAX_MESSAGES: int = 200
+
+    # How often the background task applies the retention policy, in seconds (0 disables the task)
+    HISTORY_RETENTION_INTERVAL: int = 6 * 60 * 60
+
+    # Maximum number of messages archived per transaction
+    HISTORY_RETENTION_BATCH_SIZE: int = 1000
+
+    # Number of read-only connections kept open per SQLite database
+    DB_READER_POOL_SIZE: int = 4
+
+    # How long a SQLite connection waits for a lock before failing, in milliseconds
+    DB_BUSY_TIMEOUT_MS: int = 5000
+
+    # Number of prepared statements cached per SQLite connection
+    DB_CACHED_STATEMENTS: int = 128
+
+    # Maximum number of query statistics rows waiting to be written; further rows are dropped
+    STATS_QUEUE_MAX_SIZE: int = 10000
+
+    # Maximum number of query statistics rows written per transaction
+    STATS_BATCH_SIZE: int = 100
+
+    # How long a query statistics row may wait for others to be written with, in seconds
+    STATS_FLUSH_INTERVAL: float = 1.0
+
+    # Determines if long responses are stored zlib-compressed in the query statistics
+    STATS_COMPRESS_RESPONSES: bool = True
+
+    # Responses shorter than this many bytes are stored as plain text
+    STATS_COMPRESS_MIN_BYTES: int = 256
+
+    # How the bot receives updates: "polling" (long polling) or "webhook" (an aiohttp server Telegram posts to)
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+
+    # (Optional) Public HTTPS base URL of the webhook, e.g. "https://bot.example.com".
+    # If set, the webhook is registered with Telegram at startup; leave it unset on all but one replica.
+    WEBHOOK_BASE_URL: str | None = None
+
+    # Path the webhook server receives updates on
+    WEBHOOK_PATH: str = "/webhook"
+
+    # Secret token Telegram sends with every update (required in webhook mode; 1-256 characters A-Z, a-z, 0-9, _ and -)
+    WEBHOOK_SECRET: str | None = None
+
+    # Address and port the webhook server listens on
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+
+    # How long shutdown waits for the updates being handled to finish, in seconds
+    WEBHOOK_SHUTDOWN_TIMEOUT: float = 30.0
+
+    # Determines if answers are streamed by progressively editing a placeholder message
+    STREAM_RESPONSES: bool = False
+
+    # Minimum interval between edits of a streamed message, in seconds (Telegram limits edit frequency)
+    STREAM_EDIT_INTERVAL: float = 1.5
+
+    # Text of the placeholder message sent before the first token arrives
+    STREAM_PLACEHOLDER_TEXT: str = "…"
+
     # Determines if the bot's response should be wrapped in a markdown code block
     RESPONSE_AS_CODE_BLOCK: bool = False
 
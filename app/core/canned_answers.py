@@ -0,0 +1,193 @@
+# app/core/canned_answers.py
+
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from langchain_core.runnables import Runnable
+
+from app.config import settings
+from app.core.concurrency import ConcurrencyLimiter
+from app.core.database import get_pool
+from app.core.memory import CHAT_HISTORY_DB_PATH
+from app.core.predefined_questions import PREDEFINED_QUESTIONS
+from app.core.rag import compute_knowledge_base_version
+
+
+class CannedAnswer(NamedTuple):
+    """A precomputed answer to a predefined question."""
+
+    action: str
+    kb_version: str
+    answer: str
+    context: str | None
+    generation_seconds: float
+
+
+# --- Canned Answer Store ---
+
+class CannedAnswerStore:
+    """
+    Precomputed answers to the predefined menu questions.
+
+    The answers do not depend on the user, so they are generated once per
+    knowledge-base version (see `compute_knowledge_base_version`) without chat
+    history, persisted in SQLite and served instantly on click. A background
+    task re-checks the version periodically and regenerates the answers when
+    the indexed knowledge base, system prompt or models change, i.e. after
+    re-indexing, not when the markdown sources are merely edited.
+    """
+
+    def __init__(
+        self,
+        rag_chain: Runnable,
+        db_path: str | Path = CHAT_HISTORY_DB_PATH,
+        llm_limiter: ConcurrencyLimiter | None = None,
+    ):
+        """
+        Initializes an empty store.
+
+        Args:
+            rag_chain: The conversational RAG chain used to generate answers.
+            db_path: The SQLite database where answers are persisted.
+            llm_limiter: The limit on concurrent chain runs shared with user
+                questions, if any.
+        """
+        self.rag_chain = rag_chain
+        self.llm_limiter = llm_limiter
+        self.db_path = str(db_path)
+        self.kb_version: str | None = None
+        self._answers: dict[str, CannedAnswer] = {}
+        self._refresh_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_seconds = 0.0
+
+    def get(self, action: str) -> CannedAnswer | None:
+        """
+        Returns the precomputed answer for an action if it matches the current
+        knowledge-base version, counting the hit or miss.
+        """
+        answer = self._answers.get(action)
+        if answer is None or answer.kb_version != self.kb_version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.latency_saved_seconds += answer.generation_seconds
+        return answer
+
+    def stats(self) -> dict:
+        """Returns the hit rate and the total LLM latency saved by the store."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            "answers": len(self._answers),
+            "kb_version": self.kb_version,
+        }
+
+    async def load(self, kb_version: str) -> None:
+        """Loads persisted answers for a knowledge-base version from the database."""
+        pool = await get_pool(self.db_path)
+        async with pool.reader() as db:
+            cursor = await db.execute(
+                "SELECT action, kb_version, answer, context, generation_seconds "
+                "FROM canned_answers WHERE kb_version = ?",
+                (kb_version,),
+            )
+            rows = await cursor.fetchall()
+        for row in rows:
+            self._answers[row[0]] = CannedAnswer(*row)
+
+    async def _generate(self, action: str, kb_version: str) -> CannedAnswer:
+        """Runs a predefined question through the RAG chain without chat history."""
+        question = PREDEFINED_QUESTIONS[action]
+        async with self.llm_limiter or nullcontext():
+            start = time.perf_counter()
+            result = await self.rag_chain.ainvoke({"session_id": None, "question": question})
+            generation_seconds = time.perf_counter() - start
+        return CannedAnswer(action, kb_version, result["answer"], result["context"], generation_seconds)
+
+    async def _save(self, answer: CannedAnswer) -> None:
+        """Persists an answer and drops answers from older knowledge-base versions."""
+        pool = await get_pool(self.db_path)
+        async with pool.writer() as db:
+            await db.execute(
+                "DELETE FROM canned_answers WHERE action = ? AND kb_version != ?",
+                (answer.action, answer.kb_version),
+            )
+            await db.execute(
+                """
+                INSERT OR REPLACE INTO canned_answers (
+                    action, kb_version, question, answer, context, generation_seconds, created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    answer.action,
+                    answer.kb_version,
+                    PREDEFINED_QUESTIONS[answer.action],
+                    answer.answer,
+                    answer.context,
+                    answer.generation_seconds,
+                    datetime.now(timezone.utc),
+                ),
+            )
+
+    async def refresh(self) -> None:
+        """
+        Makes sure every predefined question has an answer for the current
+        knowledge-base version, generating only the missing ones.
+
+        Answers are generated one at a time to stay within free-tier rate limits.
+        A failed generation is logged and retried on the next refresh.
+        """
+        kb_version = await asyncio.to_thread(compute_knowledge_base_version)
+        if kb_version != self.kb_version:
+            logging.info(f"Knowledge base version is now {kb_version}; refreshing canned answers.")
+            await self.load(kb_version)
+            self.kb_version = kb_version
+
+        for action in PREDEFINED_QUESTIONS:
+            current = self._answers.get(action)
+            if current is not None and current.kb_version == kb_version:
+                continue
+            try:
+                answer = await self._generate(action, kb_version)
+                await self._save(answer)
+            except Exception as e:
+                logging.error(f"Failed to precompute the answer for '{action}': {e}")
+                continue
+            self._answers[action] = answer
+            logging.info(f"Precomputed the answer for '{action}' in {answer.generation_seconds:.2f}s.")
+
+    async def _refresh_forever(self, interval: float) -> None:
+        """Refreshes the answers now and then every `interval` seconds."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Canned answer refresh failed: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = settings.CANNED_ANSWERS_REFRESH_INTERVAL) -> None:
+        """Starts warming and periodic refreshing in a background task."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_forever(interval))
+
+    async def stop(self) -> None:
+        """Stops the background task and logs the store's statistics."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        logging.info(f"Canned answer stats: {self.stats()}")
@@ -3,18 +3,23 @@
 import textwrap
 import logging
 from operator import itemgetter
-from typing import Any
+from typing import Any, AsyncIterator
 from uuid import UUID
 
 from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnablePassthrough, RunnablePick
 from langchain_openai import ChatOpenAI
 
 from app.config import settings
+from app.core.context import build_context, context_token_budget
+from app.core.lexical import BM25Index, LexicalIndexFile
 from app.core.memory import get_chat_memory
-from app.core.rag import get_vector_store
+from app.core.rag import get_async_vector_store
+from app.core.retrieval import HybridRetriever
+from app.core.semantic_cache import SemanticResponseCache, fingerprint_context
+from app.core.vector_store import AsyncVectorStore
 
 # --- Fallback Logging ---
 
@@ -43,39 +48,72 @@ class FallbackLoggingCallbackHandler(BaseCallbackHandler):
 
 async def _get_async_chat_history(x: dict) -> dict:
     """
-    Asynchronously loads chat history directly from SQLiteChatMessageHistory
-    and applies windowing logic.
+    Asynchronously loads the windowed chat history directly from SQLiteChatMessageHistory.
 
     This is necessary because LangChain's ConversationBufferWindowMemory
     is not fully async-aware for its `chat_memory` attribute's `messages` property,
     leading to `TypeError` when trying to access an awaited coroutine.
+    The window (k * 2 messages for k conversation turns) is selected in SQL,
+    so older messages are never loaded or deserialized.
+    A `session_id` of None means a stateless question with no history.
     """
     session_id = x["session_id"]
+    if session_id is None:
+        return {"chat_history": []}
     # Get the ConversationBufferWindowMemory instance, which wraps SQLiteChatMessageHistory
     memory_buffer = get_chat_memory(session_id=session_id)
-    # Await the async messages property of the underlying SQLiteChatMessageHistory
-    all_messages = await memory_buffer.chat_memory.messages
-    # Apply windowing logic (k * 2 messages for k conversation turns)
     k = settings.MEMORY_WINDOW_SIZE
-    windowed_messages = all_messages[-k * 2 :] if k > 0 else []
+    windowed_messages = await memory_buffer.chat_memory.get_last_messages(k * 2)
     return {"chat_history": windowed_messages}
 
-def get_rag_chain():
+def _with_semantic_cache(
+    rag_chain: Runnable, semantic_cache: SemanticResponseCache, vector_store: AsyncVectorStore
+) -> Runnable:
     """
-    Creates and returns a conversational RAG (Retrieval-Augmented Generation) chain.
+    Wraps the answer-generating chain with a semantic cache lookup.
 
-    This function orchestrates the entire process of handling a user query:
-    1.  Loads conversation history for the session.
-    2.  Retrieves relevant documents (context) from the vector store based on the question.
-    3.  Formats the system prompt with the retrieved context.
-    4.  Sends the prompt, history, and question to the LLM.
-    5.  Parses the LLM's response into a string.
-    6.  Saves the new question and answer to the session's history.
+    The question is embedded with the vector store's embedding model (which is
+    itself cached), and a stored answer is returned if a similar question was
+    answered from the same retrieved context. Sessions with chat history bypass
+    the cache, because the history can change the answer.
+    """
+    embeddings = vector_store.embeddings
+
+    async def answer(x: dict, config: RunnableConfig) -> AsyncIterator[str]:
+        # An async generator, so a generated answer is still streamed token by token.
+        if x["chat_history"] or embeddings is None:
+            semantic_cache.record_bypass()
+            async for chunk in rag_chain.astream(x, config):
+                yield chunk
+            return
+
+        vector = await embeddings.aembed_query(x["question"])
+        context_fingerprint = fingerprint_context(x["context"])
+        kb_version = await semantic_cache.current_kb_version()
+
+        cached_answer = semantic_cache.lookup(vector, context_fingerprint, kb_version)
+        if cached_answer is not None:
+            logging.info("Answered from the semantic cache.")
+            yield cached_answer
+            return
+
+        chunks = []
+        async for chunk in rag_chain.astream(x, config):
+            chunks.append(chunk)
+            yield chunk
+        semantic_cache.store(vector, context_fingerprint, kb_version, "".join(chunks))
+
+    return RunnableLambda(answer)
+
+
+def get_llm() -> Runnable:
+    """
+    Creates the chat model: the primary OpenRouter model with a fallback model.
 
     Returns:
-        A Runnable object representing the complete conversational RAG chain.
+        A Runnable that falls back to OPENROUTER_FALLBACK_MODEL if the primary
+        model fails.
     """
-    # 1. Initialize components
     # Initialize the primary LLM using the main model from settings
     primary_llm = ChatOpenAI(
         model=settings.OPENROUTER_CHAT_MODEL,
@@ -95,23 +133,70 @@ def get_rag_chain():
     )
 
     # Create a resilient LLM component with a fallback mechanism
-    llm = primary_llm.with_fallbacks([fallback_llm])
+    return primary_llm.with_fallbacks([fallback_llm])
+
+
+def get_rag_chain(
+    vector_store: AsyncVectorStore | None = None,
+    semantic_cache: SemanticResponseCache | None = None,
+    lexical_index: BM25Index | LexicalIndexFile | None = None,
+    llm: Runnable | None = None,
+):
+    """
+    Creates and returns a conversational RAG (Retrieval-Augmented Generation) chain.
+
+    Building the chain is expensive (LLM clients, vector store, HTTP client), so
+    the bot builds it once per process in `app.core.runtime` and reuses it.
+
+    This function orchestrates the entire process of handling a user query:
+    1.  Loads conversation history for the session.
+    2.  Retrieves relevant documents (context) from the vector store based on the question.
+    3.  Formats the system prompt with the retrieved context.
+    4.  Sends the prompt, history, and question to the LLM.
+    5.  Parses the LLM's response into a string.
+    6.  Saves the new question and answer to the session's history.
+
+    Args:
+        vector_store: The vector store to retrieve context from. If omitted,
+            a new one is created with `get_async_vector_store()`.
+        semantic_cache: An optional cache of answers to free-text questions.
+            If given, the LLM is skipped for questions similar to ones
+            already answered from the same context.
+        lexical_index: An optional BM25 index over the same chunks, or its
+            file to be reloaded after re-indexing. If given, retrieval fuses
+            vector and lexical search (see `HybridRetriever`).
+        llm: The chat model to answer with. If omitted, a new one is created
+            with `get_llm()`.
+
+    Returns:
+        A Runnable object representing the complete conversational RAG chain.
+    """
+    # 1. Initialize components
+    if llm is None:
+        llm = get_llm()
 
-    retriever = get_vector_store().as_retriever()
+    if vector_store is None:
+        vector_store = get_async_vector_store()
+    retriever = HybridRetriever(vector_store=vector_store, lexical_index=lexical_index)
 
     # 2. Define the prompt template
+    system_prompt = textwrap.dedent(settings.SYSTEM_PROMPT).strip()
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", textwrap.dedent(settings.SYSTEM_PROMPT).strip()),
+            ("system", system_prompt),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "Вопрос: {question}\n\nКонтекст из базы знаний:\n{context}"),
         ]
     )
 
-    # 3. Define a function to format retrieved documents
-    def format_docs(docs: list) -> str:
-        """Converts a list of Document objects into a single string."""
-        return "\n\n".join(doc.page_content for doc in docs)
+    # 3. Define a function to assemble the retrieved documents into the context
+    def assemble_context(x: dict) -> str:
+        """
+        Merges overlapping chunks and fits them into the tokens left by the
+        system prompt, the history, the question and the answer.
+        """
+        budget = context_token_budget(system_prompt, x["chat_history"], x["question"])
+        return build_context(x["docs"], budget)
 
     # 4. Create the core RAG chain using LangChain Expression Language (LCEL)
     # This chain is responsible for retrieving context and generating a response.
@@ -119,22 +204,30 @@ def get_rag_chain():
     rag_chain = (
         prompt | llm | StrOutputParser()
     )
+    if semantic_cache is not None:
+        rag_chain = _with_semantic_cache(rag_chain, semantic_cache, vector_store)
 
     # 5. Create the full conversational chain with memory
     # This chain takes a session_id and a question as input.
     conversational_rag_chain = (
-        # Step 1: Prepare the context in parallel: load chat history and retrieve documents.
-        # The result is a dictionary with 'chat_history' and 'context'.
+        # Step 1: Prepare the inputs in parallel: load chat history and retrieve documents.
+        # The result is a dictionary with 'chat_history' and 'docs'.
         RunnablePassthrough.assign(
             chat_history=RunnableLambda(_get_async_chat_history) | itemgetter("chat_history"),
-            context=itemgetter("question") | retriever | format_docs
+            docs=itemgetter("question") | retriever,
         )
+        # Step 1b: Assemble the documents into the 'context' within the token budget.
+        | RunnablePassthrough.assign(context=RunnableLambda(assemble_context))
         # Step 2: Pass the prepared context to the main RAG chain to get the answer.
         # We use assign again to add the 'answer' to the dictionary.
         | RunnablePassthrough.assign(answer=rag_chain)
         # Step 3: Select only the 'answer' and 'context' keys for the final output.
-        # This ensures a clean, predictable output format.
-        | (lambda x: {"answer": x["answer"], "context": x["context"]})
+        # This ensures a clean, predictable output format. Unlike a plain lambda,
+        # RunnablePick passes chunks through, so `astream` yields the 'context'
+        # first and then the 'answer' token by token.
+        | RunnablePick(["answer", "context"])
     )
 
-    return conversational_rag_chain
\ No newline at end of file
+    # Bound here rather than passed by every caller, so the callers need not
+    # import LangChain's callback machinery.
+    return conversational_rag_chain.with_config(callbacks=[FallbackLoggingCallbackHandler()])
\ No newline at end of file
@@ -0,0 +1,222 @@
+# app/core/chunking.py
+
+import logging
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.config import settings
+
+# A Markdown ATX heading, e.g. "## Project: PrimeNetworking ##".
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+# Separator between the section titles of a breadcrumb.
+BREADCRUMB_SEPARATOR = " > "
+
+# Bumped whenever the same settings start producing different chunks.
+CHUNKER_VERSION = 2
+
+
+# --- Token Counting ---
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str):
+    """Loads a tiktoken encoding once per process, or returns None if it is unavailable."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logging.warning(f"Tokenizer '{name}' is unavailable ({e}); estimating token counts instead.")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with the configured tiktoken encoding.
+
+    If the encoding cannot be loaded (tiktoken downloads it on first use), the
+    count is estimated as one token per four UTF-8 bytes, which is close for
+    both English and Russian text.
+    """
+    encoding = _get_encoding(settings.CHUNK_TOKENIZER)
+    if encoding is None:
+        return (len(text.encode("utf-8")) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# --- Markdown Chunker ---
+
+class _Section(NamedTuple):
+    """A heading with its body, up to the next heading."""
+
+    path: Tuple[str, ...]
+    text: str
+
+
+def _common_prefix(paths: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+    prefix = paths[0]
+    for path in paths[1:]:
+        length = 0
+        while length < min(len(prefix), len(path)) and prefix[length] == path[length]:
+            length += 1
+        prefix = prefix[:length]
+    return prefix
+
+
+class MarkdownChunker:
+    """
+    Splits Markdown documents along their heading hierarchy.
+
+    - Every heading starts a section; its breadcrumb is the chain of titles of
+      the enclosing headings (e.g. "Проекты > PrimeNetworking > Стек").
+    - Consecutive sections are packed into one chunk while they fit in the
+      token budget and either belong to the same parent section or are smaller
+      than `min_tokens`, so a project description stays in one chunk.
+    - Sections larger than the budget are split further by paragraphs and
+      sentences, and each piece is prefixed with its breadcrumb.
+
+    Each chunk's metadata carries the breadcrumb of the sections it contains.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = settings.CHUNK_MAX_TOKENS,
+        min_tokens: int = settings.CHUNK_MIN_TOKENS,
+        overlap_tokens: int = settings.CHUNK_OVERLAP_TOKENS,
+    ):
+        """
+        Initializes the chunker.
+
+        Args:
+            max_tokens: The maximum size of a chunk, in tokens.
+            min_tokens: Sections smaller than this are merged with their neighbours.
+            overlap_tokens: The overlap between pieces of an oversized section.
+        """
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+
+    @property
+    def signature(self) -> str:
+        """Identifies the chunking settings; chunks change whenever it does."""
+        return f"markdown{CHUNKER_VERSION}:{self.max_tokens}:{self.min_tokens}:{self.overlap_tokens}:{settings.CHUNK_TOKENIZER}"
+
+    @staticmethod
+    def _parse_sections(text: str) -> List[_Section]:
+        """Splits a document into sections at headings outside fenced code blocks."""
+        sections: List[_Section] = []
+        path: Tuple[str, ...] = ()
+        levels: Tuple[int, ...] = ()
+        lines: List[str] = []
+        in_fence = False
+
+        def close_section() -> None:
+            body = "\n".join(lines).strip()
+            if body:
+                sections.append(_Section(path, body))
+
+        for line in text.splitlines():
+            if line.lstrip().startswith(("```", "~~~")):
+                in_fence = not in_fence
+            match = None if in_fence else HEADING_PATTERN.match(line)
+            if match:
+                close_section()
+                lines = []
+                level = len(match.group(1))
+                # Drop the titles of headings at the same or a deeper level.
+                depth = sum(1 for parent_level in levels if parent_level < level)
+                path = path[:depth] + (match.group(2),)
+                levels = levels[:depth] + (level,)
+            lines.append(line)
+        close_section()
+        return sections
+
+    def _split_large(self, section: _Section) -> List[str]:
+        """
+        Splits a section that does not fit in the budget by paragraphs and
+        sentences. The section's heading is replaced by its full breadcrumb,
+        repeated at the top of every piece.
+        """
+        breadcrumb = BREADCRUMB_SEPARATOR.join(section.path)
+        body = section.text
+        if section.path and HEADING_PATTERN.match(body.split("\n", 1)[0]):
+            body = body.split("\n", 1)[1] if "\n" in body else ""
+        prefix_tokens = count_tokens(breadcrumb) + 2 if breadcrumb else 0
+        budget = max(1, self.max_tokens - prefix_tokens)
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=budget,
+            chunk_overlap=min(self.overlap_tokens, budget - 1),
+            length_function=count_tokens,
+            separators=["\n\n", "\n", ". ", " ", ""],
+            keep_separator="end",
+        )
+        pieces = splitter.split_text(body)
+        return [f"{breadcrumb}\n\n{piece}" if breadcrumb else piece for piece in pieces]
+
+    def split_text(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Splits a Markdown text into chunks.
+
+        Returns:
+            A list of (chunk text, breadcrumb) pairs.
+        """
+        chunks: List[Tuple[str, str]] = []
+        group: List[_Section] = []
+        group_tokens = 0
+        # Headings with no text of their own, waiting for the section they introduce.
+        headings: List[_Section] = []
+
+        def flush() -> None:
+            if group:
+                # A heading with no text of its own only introduces the next section.
+                paths = [s.path for s in group if not HEADING_PATTERN.match(s.text)] or [s.path for s in group]
+                breadcrumb = BREADCRUMB_SEPARATOR.join(_common_prefix(paths))
+                chunks.append(("\n\n".join(s.text for s in group), breadcrumb))
+                group.clear()
+
+        for section in self._parse_sections(text):
+            if HEADING_PATTERN.match(section.text):
+                headings.append(section)
+                continue
+            tokens = count_tokens(section.text)
+            if tokens > self.max_tokens:
+                # The breadcrumb of every piece repeats the enclosing headings,
+                # so only unrelated empty headings are kept, with the previous group.
+                group.extend(h for h in headings if section.path[:len(h.path)] != h.path)
+                headings.clear()
+                flush()
+                group_tokens = 0
+                breadcrumb = BREADCRUMB_SEPARATOR.join(section.path)
+                chunks.extend((piece, breadcrumb) for piece in self._split_large(section))
+                continue
+
+            # A heading-only section moves together with the section it introduces.
+            unit = headings + [section]
+            tokens += sum(count_tokens(h.text) for h in headings)
+            headings = []
+            if group:
+                root = group[0].path
+                related = unit[0].path[:len(root)] == root
+                small = group_tokens < self.min_tokens or tokens < self.min_tokens
+                if group_tokens + tokens <= self.max_tokens and (related or small):
+                    group.extend(unit)
+                    group_tokens += tokens
+                    continue
+                flush()
+            group.extend(unit)
+            group_tokens = tokens
+        group.extend(headings)
+        flush()
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Splits documents into chunks, adding a 'breadcrumb' to each chunk's metadata."""
+        return [
+            Document(page_content=chunk, metadata={**document.metadata, "breadcrumb": breadcrumb})
+            for document in documents
+            for chunk, breadcrumb in self.split_text(document.page_content)
+        ]
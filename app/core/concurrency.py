@@ -0,0 +1,177 @@
+# app/core/concurrency.py
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from typing import Any, TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+
+# --- Global Limit ---
+
+class ConcurrencyLimiter:
+    """
+    Caps how many operations of one kind run at a time, e.g. LLM calls.
+
+    Callers beyond the limit wait on the event loop in arrival order. The
+    number of waiting and running operations is reported as the
+    "<name>_waiting" and "<name>_in_flight" gauges, and every wait is observed
+    as "<name>_wait_seconds".
+    """
+
+    def __init__(self, limit: int, name: str):
+        """
+        Initializes the limiter.
+
+        Args:
+            limit: The maximum number of operations running at a time.
+            name: The prefix of the metrics.
+        """
+        self.limit = limit
+        self.name = name
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+
+    def _report(self) -> None:
+        metrics.set_gauge(f"{self.name}_waiting", self.waiting)
+        metrics.set_gauge(f"{self.name}_in_flight", self.in_flight)
+
+    async def __aenter__(self) -> None:
+        start = time.perf_counter()
+        self.waiting += 1
+        self._report()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self._report()
+        metrics.observe(f"{self.name}_wait_seconds", time.perf_counter() - start)
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.in_flight -= 1
+        self._report()
+        self._semaphore.release()
+
+
+# --- Per-Key Serialization ---
+
+class KeyedLocks:
+    """
+    One lock per key, e.g. per chat, so operations on the same key run one at
+    a time while different keys run in parallel.
+
+    A lock only exists while it is held or waited for, so the number of locks
+    stays bounded by the number of active keys. The total number of operations
+    waiting for their key is reported as the "<name>_waiting" gauge.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes an empty set of locks.
+
+        Args:
+            name: The prefix of the metrics.
+        """
+        self.name = name
+        # key -> (lock, number of holders and waiters)
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+        self.waiting = 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Holds the lock of a key, waiting for the operations queued before on the same key."""
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            if lock.locked():
+                self.waiting += 1
+                metrics.set_gauge(f"{self.name}_waiting", self.waiting)
+                try:
+                    await lock.acquire()
+                finally:
+                    self.waiting -= 1
+                    metrics.set_gauge(f"{self.name}_waiting", self.waiting)
+            else:
+                await lock.acquire()
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+# --- Request Coalescing ---
+
+class SingleFlight:
+    """
+    Coalesces identical operations that are in flight at the same time.
+
+    The first caller for a key runs the operation; callers with the same key
+    that arrive before it finishes wait for it and get the same result (or
+    exception) instead of running it again. Once it finishes, the next call
+    runs it anew. Coalesced calls are counted as "<name>_coalesced".
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes the coalescer.
+
+        Args:
+            name: The prefix of the metrics.
+        """
+        self.name = name
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs an operation, or joins the identical one already in flight.
+
+        Args:
+            key: Identifies identical operations.
+            operation: Starts the operation; only called if none is in flight.
+
+        Returns:
+            The result of the operation.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.increment(f"{self.name}_coalesced")
+            # Shielded: a cancelled duplicate must not cancel the shared run.
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await operation()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Retrieved here, so an error nobody else waited for is not reported as unhandled.
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
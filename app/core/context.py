@@ -0,0 +1,148 @@
+# app/core/context.py
+
+import re
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+
+from app.config import settings
+from app.core.chunking import count_tokens
+
+# --- Constants ---
+
+# Overlaps shorter than this many characters are treated as coincidences.
+MIN_OVERLAP_CHARS = 20
+
+# Tokens reserved for message framing and the human message template.
+PROMPT_OVERHEAD_TOKENS = 64
+
+
+# --- Overlap Removal ---
+
+def _overlap(left: str, right: str) -> int:
+    """Returns the length of the longest suffix of `left` that is a prefix of `right`."""
+    for length in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def _strip_header(text: str, header: str) -> str:
+    return text[len(header):] if header and text.startswith(header) else text
+
+
+def _merge_into(segments: List[str], text: str, header: str = "") -> None:
+    """
+    Adds a chunk to the segments of its source, joining it with an overlapping neighbour.
+
+    Args:
+        segments: The merged segments of the chunk's source so far.
+        text: The chunk text.
+        header: The breadcrumb line that the chunker repeats at the top of the
+            pieces of a long section; it is ignored when looking for overlaps.
+    """
+    body = _strip_header(text, header)
+    for index, segment in enumerate(segments):
+        if body in segment:
+            return
+        if segment in text:
+            segments[index] = text
+            return
+        overlap = _overlap(segment, body)
+        if overlap:
+            segments[index] = segment + body[overlap:]
+            return
+        segment_body = _strip_header(segment, header)
+        overlap = _overlap(text, segment_body)
+        if overlap:
+            segments[index] = text + segment_body[overlap:]
+            return
+    segments.append(text)
+
+
+def merge_documents(docs: List[Document]) -> List[str]:
+    """
+    Merges retrieved chunks into non-overlapping text segments.
+
+    Chunks from the same source are grouped together and adjacent chunks are
+    joined without repeating their overlapping span. Sources keep the order in
+    which the retriever ranked their best chunk.
+
+    Returns:
+        The segments, most relevant source first.
+    """
+    by_source: dict[str, List[str]] = {}
+    for doc in docs:
+        source = str(doc.metadata.get("source", ""))
+        breadcrumb = doc.metadata.get("breadcrumb")
+        header = f"{breadcrumb}\n\n" if breadcrumb else ""
+        _merge_into(by_source.setdefault(source, []), doc.page_content.strip(), header)
+    return [segment for segments in by_source.values() for segment in segments]
+
+
+# --- Token Budget ---
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Shortens a text to fit `max_tokens`, cutting at a paragraph or sentence boundary if possible."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Cut proportionally, then back off to the last boundary and re-check.
+    cut = text[: max(1, len(text) * max_tokens // count_tokens(text))]
+    while cut and count_tokens(cut) > max_tokens:
+        cut = cut[: int(len(cut) * 0.9)]
+    boundary = max(cut.rfind("\n\n"), *(m.end() for m in re.finditer(r"[.!?]\s", cut)), -1)
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip()
+
+
+def context_token_budget(system_prompt: str, chat_history: List[BaseMessage], question: str) -> int:
+    """
+    Returns how many tokens the knowledge-base context may take in the prompt.
+
+    The model's context window (MODEL_CONTEXT_TOKENS) must hold the system
+    prompt, the chat history, the question and the answer (OPENROUTER_MAX_TOKENS);
+    the context gets what is left, but never more than CONTEXT_MAX_TOKENS.
+    """
+    used = (
+        count_tokens(system_prompt)
+        + sum(count_tokens(str(message.content)) for message in chat_history)
+        + count_tokens(question)
+        + settings.OPENROUTER_MAX_TOKENS
+        + PROMPT_OVERHEAD_TOKENS
+    )
+    return max(0, min(settings.CONTEXT_MAX_TOKENS, settings.MODEL_CONTEXT_TOKENS - used))
+
+
+def build_context(docs: List[Document], max_tokens: int) -> str:
+    """
+    Assembles the retrieved chunks into the context string for the prompt.
+
+    Overlapping chunks are merged (see `merge_documents`) and segments are
+    added in order of relevance until the token budget is used up; the last
+    segment that does not fit is truncated.
+
+    Args:
+        docs: The retrieved chunks, most relevant first.
+        max_tokens: The token budget for the context.
+
+    Returns:
+        The context, with segments separated by blank lines.
+    """
+    parts: List[str] = []
+    remaining = max_tokens
+    for segment in merge_documents(docs):
+        # Account for the blank line that separates segments.
+        tokens = count_tokens(segment) + (1 if parts else 0)
+        if tokens <= remaining:
+            parts.append(segment)
+            remaining -= tokens
+            continue
+        truncated = _truncate(segment, remaining - (1 if parts else 0))
+        if truncated:
+            parts.append(truncated)
+        break
+    return "\n\n".join(parts)
@@ -0,0 +1,235 @@
+# app/core/database.py
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import aiosqlite
+
+from app.config import settings
+from app.core.migrations import SCHEMA_MIGRATIONS, Migration, run_migrations
+
+
+# --- Connection Pool ---
+
+class SQLiteConnectionPool:
+    """
+    A small async connection pool for a single SQLite database file.
+
+    SQLite allows only one writer at a time, so the pool keeps exactly one
+    writer connection (guarded by a lock) and N reader connections. Every
+    connection is opened once and reused, which avoids the connect and
+    thread-creation cost of `aiosqlite.connect` on every query.
+
+    Connections are configured for concurrent use:
+    - `journal_mode=WAL` lets readers run while the writer commits.
+    - `synchronous=NORMAL` is durable enough in WAL mode and much faster.
+    - `busy_timeout` makes connections wait for locks instead of failing.
+    - A larger `cached_statements` keeps prepared statements for hot queries.
+    - `auto_vacuum=INCREMENTAL` lets space freed by deletes be returned to the
+      file system with `PRAGMA incremental_vacuum`. It applies to new files;
+      an existing file is converted by its next full VACUUM.
+
+    Schema migrations are applied once when the pool is opened, so queries on
+    the hot path never need to run DDL.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        pool_size: int = settings.DB_READER_POOL_SIZE,
+        busy_timeout_ms: int = settings.DB_BUSY_TIMEOUT_MS,
+        cached_statements: int = settings.DB_CACHED_STATEMENTS,
+        read_only: bool = False,
+        migrations: tuple[Migration, ...] = (),
+    ):
+        """
+        Initializes the pool. Connections are opened lazily by `open()`.
+
+        Args:
+            db_path: The file path to the SQLite database.
+            pool_size: The number of reader connections.
+            busy_timeout_ms: How long a connection waits for a lock, in milliseconds.
+            cached_statements: The size of each connection's prepared statement cache.
+            read_only: If True, no writer is opened and readers use a read-only URI,
+                so the pool can be used safely by inspection tools.
+            migrations: Schema migrations to apply when the pool is opened.
+                Ignored for read-only pools.
+        """
+        self.db_path = str(db_path)
+        self.pool_size = max(1, pool_size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+        self.migrations = migrations
+
+        self._writer: aiosqlite.Connection | None = None
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+        self._is_open = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the pool's connections are currently open."""
+        return self._is_open
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        """Opens and configures a single connection."""
+        if read_only and self.read_only:
+            # The URI form is required to open the file in read-only mode.
+            db = await aiosqlite.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, cached_statements=self.cached_statements
+            )
+        else:
+            db = await aiosqlite.connect(self.db_path, cached_statements=self.cached_statements)
+
+        await db.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if read_only:
+            # Guard against accidental writes through a reader connection.
+            await db.execute("PRAGMA query_only = ON")
+        else:
+            # Must come before the switch to WAL, which initializes a new file.
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await db.execute("PRAGMA journal_mode = WAL")
+            await db.execute("PRAGMA synchronous = NORMAL")
+        return db
+
+    async def open(self) -> None:
+        """Opens the writer and reader connections. Safe to call more than once."""
+        async with self._open_lock:
+            if self._is_open:
+                return
+
+            if not self.read_only:
+                # Open the writer first: it creates the file, switches it to WAL
+                # (persistent, so the readers pick it up) and migrates the schema.
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._writer = await self._connect(read_only=False)
+                if self.migrations:
+                    try:
+                        version = await run_migrations(self._writer, self.migrations)
+                    except BaseException:
+                        await self._writer.close()
+                        self._writer = None
+                        raise
+                    logging.info(f"Database '{self.db_path}' schema is at version {version}.")
+
+            for _ in range(self.pool_size):
+                reader = await self._connect(read_only=True)
+                self._readers.append(reader)
+                self._idle_readers.put_nowait(reader)
+
+            self._is_open = True
+
+            logging.info(
+                f"Opened SQLite pool for '{self.db_path}' "
+                f"({'no' if self.read_only else 'one'} writer, {self.pool_size} reader(s))."
+            )
+
+    async def close(self) -> None:
+        """Closes all connections. Safe to call more than once."""
+        async with self._open_lock:
+            if not self._is_open:
+                return
+
+            for reader in self._readers:
+                await reader.close()
+            self._readers.clear()
+            self._idle_readers = asyncio.Queue()
+
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+            self._is_open = False
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Provides exclusive access to the writer connection.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises.
+        """
+        if self.read_only:
+            raise RuntimeError(f"SQLite pool for '{self.db_path}' is read-only.")
+        await self.open()
+        async with self._write_lock:
+            assert self._writer is not None
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrows a reader connection and returns it to the pool afterwards."""
+        await self.open()
+        db = await self._idle_readers.get()
+        try:
+            yield db
+        finally:
+            self._idle_readers.put_nowait(db)
+
+
+# --- Pool Registry ---
+
+_pools: dict[str, SQLiteConnectionPool] = {}
+
+
+async def get_pool(
+    db_path: str | Path, migrations: tuple[Migration, ...] = SCHEMA_MIGRATIONS
+) -> SQLiteConnectionPool:
+    """
+    Returns the shared, opened connection pool for a database file.
+
+    Pools are created on first use and kept for the lifetime of the process,
+    so every module that touches the same file shares the same connections.
+    The schema is migrated once, when the pool is first opened.
+
+    Args:
+        db_path: The file path to the SQLite database.
+        migrations: Schema migrations for this database. Defaults to the
+            application schema (chat history and statistics).
+    """
+    key = str(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = SQLiteConnectionPool(key, migrations=migrations)
+        _pools[key] = pool
+    await pool.open()
+    return pool
+
+
+async def close_all_pools() -> None:
+    """Closes every shared pool. Must be called on shutdown."""
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.close()
+
+
+# --- Maintenance ---
+
+async def vacuum(db_path: str | Path) -> None:
+    """
+    Rebuilds the database file, returning all free pages to the file system.
+
+    The rebuild also switches a file created before the pool enabled it to
+    incremental auto-vacuum. It rewrites the whole file, so it is meant for
+    maintenance scripts, not for the running bot.
+    """
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        # VACUUM cannot run inside a transaction; end the one the writer may have open.
+        await db.commit()
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("VACUUM")
+        # In WAL mode the rebuilt pages land in the log; move them into the file and truncate the log.
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
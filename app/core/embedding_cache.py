@@ -0,0 +1,277 @@
+# app/core/embedding_cache.py
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+from app.core.memory import DB_DIR
+
+# --- Constants ---
+
+# Path to the SQLite database file for the persistent embedding cache.
+# It only holds derived data and can be deleted at any time.
+EMBEDDING_CACHE_DB_PATH = DB_DIR / "embedding_cache.sqlite3"
+
+
+# --- Embedding Cache ---
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embedding vectors with two tiers.
+
+    - An in-memory LRU tier for hot entries (e.g. the predefined menu questions).
+    - An optional persistent SQLite tier, so restarts and re-index runs can
+      reuse vectors computed earlier.
+
+    Keys are SHA-256 hashes of the text together with a namespace (the model or
+    service that produced the vector) and the kind of embedding (query or
+    document), so vectors from different models never mix.
+
+    The persistent tier uses the standard `sqlite3` module behind a lock, because
+    LangChain and Chroma call the synchronous `Embeddings` methods from worker
+    threads. Async callers go through `asyncio.to_thread`.
+    """
+
+    def __init__(self, max_entries: int, db_path: str | Path | None = None):
+        """
+        Initializes the cache. The database is opened lazily on first use.
+
+        Args:
+            max_entries: The maximum number of vectors kept in memory.
+            db_path: The file path of the persistent tier, or None to keep
+                the cache in memory only.
+        """
+        self.max_entries = max_entries
+        self.db_path = str(db_path) if db_path is not None else None
+        self._memory: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, kind: str, text: str) -> str:
+        """Builds the cache key for a text embedded by a given model."""
+        digest = hashlib.sha256()
+        for part in (namespace, kind, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection | None:
+        """Opens the persistent tier on first use. Must be called with the lock held."""
+        if self.db_path is None:
+            return None
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(f"PRAGMA busy_timeout = {int(settings.DB_BUSY_TIMEOUT_MS)}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """Stores a vector in the memory tier. Must be called with the lock held."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[List[float] | None]:
+        """
+        Looks up vectors by key, checking memory first and then the persistent tier.
+
+        Returns:
+            A list aligned with `keys`, with None for every key that is not cached.
+        """
+        with self._lock:
+            results: List[List[float] | None] = []
+            missing: List[str] = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+                results.append(vector)
+
+            conn = self._connect()
+            if missing and conn is not None:
+                placeholders = ",".join("?" * len(missing))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                found = {key: array("f", blob).tolist() for key, blob in rows}
+                for index, key in enumerate(keys):
+                    if results[index] is None and key in found:
+                        results[index] = found[key]
+                        self._remember(key, found[key])
+                        self.disk_hits += 1
+
+            self.misses += sum(1 for vector in results if vector is None)
+            return results
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """Stores vectors in both tiers."""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+            conn = self._connect()
+            if conn is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in zip(keys, vectors)],
+                )
+                conn.commit()
+
+    async def aget_many(self, keys: List[str]) -> List[List[float] | None]:
+        """Async version of `get_many` that keeps disk I/O off the event loop."""
+        if self.db_path is None:
+            return self.get_many(keys)
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aput_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """Async version of `put_many` that keeps disk I/O off the event loop."""
+        if self.db_path is None:
+            self.put_many(keys, vectors)
+            return
+        await asyncio.to_thread(self.put_many, keys, vectors)
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters of the cache."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        """Closes the persistent tier. The cache can still be used afterwards."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# --- Caching Embeddings Wrapper ---
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain `Embeddings` implementation with an `EmbeddingCache`.
+
+    Only texts that are not cached are sent to the wrapped model, and duplicate
+    texts within one call are embedded once.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, namespace: str):
+        """
+        Initializes the wrapper.
+
+        Args:
+            embeddings: The embedding model to call on cache misses.
+            cache: The cache to read from and write to.
+            namespace: Identifies the model that produced the vectors, e.g. the
+                embedding service URL. Vectors are never shared across namespaces.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+
+    def _keys(self, kind: str, texts: List[str]) -> List[str]:
+        return [self.cache.make_key(self.namespace, kind, text) for text in texts]
+
+    @staticmethod
+    def _missing(texts: List[str], keys: List[str], vectors: List[List[float] | None]) -> dict[str, str]:
+        """Returns the unique {key: text} pairs that still need to be embedded."""
+        return {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embeds documents, calling the model only for uncached texts."""
+        keys = self._keys("document", texts)
+        vectors = await self.cache.aget_many(keys)
+        missing = self._missing(texts, keys, vectors)
+        if missing:
+            new_vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            await self.cache.aput_many(list(missing), new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [vector if vector is not None else computed[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds documents in a synchronous context, calling the model only for uncached texts."""
+        keys = self._keys("document", texts)
+        vectors = self.cache.get_many(keys)
+        missing = self._missing(texts, keys, vectors)
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [vector if vector is not None else computed[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronously embeds a query, reusing a cached vector if there is one."""
+        key = self.cache.make_key(self.namespace, "query", text)
+        vector = (await self.cache.aget_many([key]))[0]
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await self.cache.aput_many([key], [vector])
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a query in a synchronous context, reusing a cached vector if there is one."""
+        key = self.cache.make_key(self.namespace, "query", text)
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many([key], [vector])
+        return vector
+
+
+# --- Process-wide Cache ---
+
+_embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, creating it on first use."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        db_path = EMBEDDING_CACHE_DB_PATH if settings.EMBEDDING_CACHE_PERSIST else None
+        _embedding_cache = EmbeddingCache(
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES, db_path=db_path
+        )
+    return _embedding_cache
+
+
+def close_embedding_cache() -> None:
+    """Closes the process-wide embedding cache, logging its statistics."""
+    global _embedding_cache
+    if _embedding_cache is not None:
+        logging.info(f"Embedding cache stats: {_embedding_cache.stats()}")
+        _embedding_cache.close()
+        _embedding_cache = None
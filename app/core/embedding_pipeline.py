@@ -0,0 +1,273 @@
+# app/core/embedding_pipeline.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Tuple
+
+import httpx
+from langchain_core.documents import Document
+
+from app.config import settings
+
+# An embedding function: texts in, vectors out.
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+# A writer for embedded chunks: (ids, documents, vectors).
+WriteFn = Callable[[List[str], List[Document], List[List[float]]], Awaitable[None]]
+
+
+def parse_retry_after(response: httpx.Response, default: float = 1.0) -> float:
+    """Returns the delay requested by a 429/503 response's Retry-After header, in seconds."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# --- Adaptive Limits ---
+
+class AdaptiveLimiter:
+    """
+    Adapts the number of in-flight requests and the batch size to the service.
+
+    It follows the additive-increase/multiplicative-decrease scheme used by TCP:
+    - every fast response adds roughly one request of concurrency per round,
+      and grows the batch size while responses stay well under the target latency;
+    - a slow response halves the batch size;
+    - a 429 halves the concurrency and pauses all requests for Retry-After.
+    """
+
+    def __init__(
+        self,
+        initial_batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        max_batch_size: int = settings.EMBEDDING_MAX_BATCH_SIZE,
+        max_concurrency: int = settings.EMBEDDING_MAX_CONCURRENCY,
+        target_latency: float = settings.EMBEDDING_TARGET_LATENCY,
+        min_batch_size: int = 1,
+    ):
+        """
+        Initializes the limiter with one request in flight.
+
+        Args:
+            initial_batch_size: The number of texts in the first requests.
+            max_batch_size: The upper bound for the batch size.
+            max_concurrency: The upper bound for in-flight requests.
+            target_latency: The response time above which batches shrink, in seconds.
+            min_batch_size: The lower bound for the batch size.
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.min_batch_size = max(1, min(min_batch_size, self.max_batch_size))
+        self.batch_size = min(max(initial_batch_size, self.min_batch_size), self.max_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self._concurrency = 1.0
+        self.resume_at = 0.0
+        self.throttled = 0
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._concurrency)
+
+    def on_success(self, latency: float) -> None:
+        """Adjusts the limits after a successful request."""
+        if latency > self.target_latency:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            return
+        self._concurrency = min(self.max_concurrency, self._concurrency + 1 / self.concurrency)
+        if latency < self.target_latency / 2:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+
+    def on_throttle(self, retry_after: float) -> None:
+        """Backs off after a 429 response."""
+        self.throttled += 1
+        self._concurrency = max(1.0, self._concurrency / 2)
+        self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+
+    def pause_remaining(self) -> float:
+        """Returns how long new requests must still wait, in seconds."""
+        return max(0.0, self.resume_at - time.monotonic())
+
+
+# --- Pipeline ---
+
+class EmbeddingPipeline:
+    """
+    Embeds chunks with several concurrent requests and writes them through a queue.
+
+    Embedding requests and vector store writes run independently: workers put
+    embedded batches on a bounded queue, and a single writer drains it. The
+    bounded queue applies backpressure if writes fall behind.
+    """
+
+    def __init__(
+        self,
+        embed: EmbedFn,
+        write: WriteFn,
+        limiter: AdaptiveLimiter | None = None,
+        max_retries: int = 5,
+        queue_size: int = 8,
+    ):
+        """
+        Initializes the pipeline.
+
+        Args:
+            embed: Embeds a batch of texts, e.g. `Embeddings.aembed_documents`.
+            write: Stores an embedded batch, e.g. in Chroma.
+            limiter: Controls the concurrency and batch size. Defaults to one
+                built from the settings.
+            max_retries: How many times a batch is retried after a server or
+                network error. Rate-limited batches are always retried.
+            queue_size: The maximum number of embedded batches waiting for the writer.
+        """
+        self.embed = embed
+        self.write = write
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.queue_size = queue_size
+        self.requests = 0
+
+    async def _embed_batch(
+        self, batch: List[Tuple[str, Document]], attempt: int, queue: asyncio.Queue
+    ) -> int | None:
+        """
+        Embeds one batch and hands it to the writer.
+
+        Returns:
+            None on success, or the attempt number to retry the batch with.
+            Rate-limited requests do not count as failed attempts.
+        """
+        texts = [document.page_content for _, document in batch]
+        start = time.perf_counter()
+        try:
+            self.requests += 1
+            vectors = await self.embed(texts)
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 429:
+                retry_after = parse_retry_after(e.response)
+                logging.warning(f"Embedding service is rate limiting; backing off for {retry_after:.1f}s.")
+                self.limiter.on_throttle(retry_after)
+                return attempt
+            if status < 500 or attempt >= self.max_retries:
+                raise
+            self.limiter.on_throttle(min(2 ** attempt, 30))
+            return attempt + 1
+        except httpx.TransportError:
+            if attempt >= self.max_retries:
+                raise
+            self.limiter.on_throttle(min(2 ** attempt, 30))
+            return attempt + 1
+
+        self.limiter.on_success(time.perf_counter() - start)
+        await queue.put(([chunk_id for chunk_id, _ in batch], [document for _, document in batch], vectors))
+        return None
+
+    async def _write_loop(self, queue: asyncio.Queue) -> None:
+        """Writes embedded batches until it receives None."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await self.write(*item)
+
+    async def run(self, chunks: AsyncIterable[Tuple[str, Document]] | Iterable[Tuple[str, Document]]) -> int:
+        """
+        Embeds and writes all chunks.
+
+        Chunks are pulled from `chunks` only when a new batch is dispatched, so
+        a lazy source (see `app.core.indexing.iter_new_chunks`) is never held
+        in memory as a whole.
+
+        Args:
+            chunks: (chunk_id, chunk) pairs, from a sync or async iterable.
+
+        Returns:
+            The number of chunks embedded.
+
+        Raises:
+            Exception: The first error that could not be retried, from either
+                an embedding request or the writer.
+        """
+        source = _aiter(chunks)
+        exhausted = False
+        total = 0
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        writer = asyncio.create_task(self._write_loop(queue))
+        pending: deque[Tuple[List[Tuple[str, Document]], int]] = deque()
+        tasks: dict[asyncio.Task, List[Tuple[str, Document]]] = {}
+
+        try:
+            while not exhausted or pending or tasks:
+                if writer.done():
+                    # The writer only stops early on an error; surface it.
+                    writer.result()
+                    raise RuntimeError("Vector store writer stopped unexpectedly.")
+
+                pause = self.limiter.pause_remaining()
+                while (pending or not exhausted) and len(tasks) < self.limiter.concurrency and not pause:
+                    if pending:
+                        batch, attempt = pending.popleft()
+                    else:
+                        batch, attempt = [], 0
+                        async for item in source:
+                            batch.append(item)
+                            if len(batch) >= self.limiter.batch_size:
+                                break
+                        else:
+                            exhausted = True
+                        if not batch:
+                            break
+                        total += len(batch)
+                    task = asyncio.create_task(self._embed_batch(batch, attempt, queue))
+                    tasks[task] = batch
+
+                if not tasks:
+                    if pause:
+                        await asyncio.sleep(pause)
+                    continue
+
+                done, _ = await asyncio.wait(
+                    [*tasks, writer], timeout=pause or None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task is writer:
+                        continue
+                    batch = tasks.pop(task)
+                    retry_attempt = task.result()
+                    if retry_attempt is not None:
+                        pending.append((batch, retry_attempt))
+
+            await queue.put(None)
+            await writer
+        finally:
+            for task in [*tasks, writer]:
+                task.cancel()
+            await asyncio.gather(*tasks, writer, return_exceptions=True)
+            await source.aclose()
+
+        logging.info(
+            f"Embedded {total} chunk(s) in {self.requests} request(s); "
+            f"final batch size {self.limiter.batch_size}, concurrency {self.limiter.concurrency}, "
+            f"throttled {self.limiter.throttled} time(s)."
+        )
+        return total
+
+
+async def _aiter(items: AsyncIterable | Iterable) -> AsyncIterator:
+    """Iterates over a sync or async iterable asynchronously."""
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
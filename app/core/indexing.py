@@ -0,0 +1,310 @@
+# app/core/indexing.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, List, NamedTuple, Tuple
+
+from langchain_core.documents import Document
+
+# --- Constants ---
+
+# Name of the manifest file stored next to the Chroma database.
+INDEX_MANIFEST_FILENAME = "index_manifest.json"
+
+# Bumped whenever the manifest layout or the chunk ID scheme changes.
+INDEX_MANIFEST_VERSION = 2
+
+
+# --- Index Files ---
+
+def read_index_file(path: Path, version: int) -> dict | None:
+    """
+    Reads a JSON index file written by `write_index_file`.
+
+    Returns:
+        The file's data, or None if it is missing or was written with another
+        layout `version`.
+
+    Raises:
+        ValueError: If the file is not valid JSON.
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    return data
+
+
+def write_index_file(path: Path, data: dict, indent: int | None = None) -> None:
+    """Writes a JSON index file atomically, so an interrupted run never leaves a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=indent), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+# --- Hashing ---
+
+def file_sha256(path: Path) -> str:
+    """Returns the SHA-256 hash of a file's contents."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def make_chunk_ids(source: str, chunks: List[Document]) -> List[str]:
+    """
+    Builds deterministic IDs for the chunks of one knowledge-base file.
+
+    An ID is the hash of the file's relative path, the chunk text and the
+    occurrence number of that text within the file, so an unchanged chunk keeps
+    its ID when other parts of the file are edited.
+
+    Args:
+        source: The file path relative to the knowledge-base directory.
+        chunks: The file's chunks, in order.
+    """
+    seen: dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        occurrence = seen.get(chunk.page_content, 0)
+        seen[chunk.page_content] = occurrence + 1
+        digest = hashlib.sha256()
+        for part in (source, str(occurrence), chunk.page_content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        ids.append(digest.hexdigest())
+    return ids
+
+
+# --- Manifest ---
+
+class FileEntry(NamedTuple):
+    """What is indexed for one knowledge-base file."""
+
+    sha256: str
+    chunk_ids: List[str]
+
+
+class IndexManifest:
+    """
+    Record of what the vector store currently contains.
+
+    For every indexed file it keeps the file hash and the IDs of its chunks, so
+    re-indexing only has to embed new chunks and delete stale ones. It also
+    records the embedding model, because vectors from different models cannot
+    be mixed in one collection, and the chunker settings, because changing them
+    changes the chunks of every file.
+    """
+
+    def __init__(
+        self,
+        embedding_namespace: str,
+        chunker: str,
+        files: dict[str, FileEntry] | None = None,
+    ):
+        """
+        Initializes the manifest.
+
+        Args:
+            embedding_namespace: Identifies the model that produced the vectors.
+            chunker: Identifies the chunking settings that produced the chunks.
+            files: The indexed files, keyed by path relative to the knowledge base.
+        """
+        self.embedding_namespace = embedding_namespace
+        self.chunker = chunker
+        self.files: dict[str, FileEntry] = files or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest | None":
+        """Reads a manifest, returning None if it is missing, unreadable or outdated."""
+        try:
+            data = read_index_file(path, INDEX_MANIFEST_VERSION)
+            if data is None:
+                return None
+            files = {
+                source: FileEntry(entry["sha256"], list(entry["chunk_ids"]))
+                for source, entry in data["files"].items()
+            }
+            return cls(data["embedding_namespace"], data["chunker"], files)
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable index manifest '{path}': {e}")
+            return None
+
+    def save(self, path: Path) -> None:
+        """Writes the manifest (see `write_index_file`)."""
+        data = {
+            "version": INDEX_MANIFEST_VERSION,
+            "embedding_namespace": self.embedding_namespace,
+            "chunker": self.chunker,
+            "files": {
+                source: {"sha256": entry.sha256, "chunk_ids": entry.chunk_ids}
+                for source, entry in sorted(self.files.items())
+            },
+        }
+        write_index_file(path, data, indent=2)
+
+
+# --- Loading and Splitting ---
+
+async def aiter_split_files(
+    paths: Iterable[Path],
+    split_file: Callable[[Path], List[Document]],
+    executor: Executor | None = None,
+    max_pending: int = 4,
+) -> AsyncIterator[Tuple[Path, List[Document] | Exception]]:
+    """
+    Loads and splits files lazily, yielding each file's chunks in order.
+
+    At most `max_pending` files are being processed at a time, so memory use
+    does not grow with the size of the knowledge base. With a process pool,
+    files are read and split in parallel on several CPU cores; by default they
+    are processed in worker threads to keep the event loop responsive.
+
+    Args:
+        paths: The files to load.
+        split_file: Loads and splits one file. Must be picklable (a module-level
+            function) when a process pool is used.
+        executor: Where to run `split_file`. Defaults to the loop's thread pool.
+        max_pending: How many files may be processed ahead of the consumer.
+
+    Yields:
+        (path, chunks) pairs, or (path, exception) if the file could not be loaded.
+    """
+    loop = asyncio.get_running_loop()
+    pending: deque[Tuple[Path, asyncio.Future]] = deque()
+    paths = iter(paths)
+    try:
+        while True:
+            while len(pending) < max(1, max_pending):
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending.append((path, loop.run_in_executor(executor, split_file, path)))
+            if not pending:
+                return
+            path, future = pending.popleft()
+            try:
+                yield path, await future
+            except Exception as e:
+                yield path, e
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+# --- Planning ---
+
+class IndexPlan(NamedTuple):
+    """
+    The changes needed to bring the vector store in line with the knowledge base.
+
+    Only file hashes are compared when planning; changed files are split later,
+    while their chunks stream into the embedding stage (see `iter_new_chunks`),
+    which also fills in their manifest entries and stale chunk IDs.
+    """
+
+    changed_files: List[Path]
+    delete_ids: List[str]
+    manifest: IndexManifest
+    previous_files: dict[str, FileEntry]
+    unchanged_files: int
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.changed_files and not self.delete_ids
+
+
+def plan_index_update(
+    knowledge_base_dir: Path,
+    previous: IndexManifest | None,
+    embedding_namespace: str,
+    chunker: str,
+) -> IndexPlan:
+    """
+    Compares the knowledge base with the manifest of the last indexing run.
+
+    If the chunker settings have changed, every file is split again, but only
+    chunks whose IDs are new are embedded.
+
+    Args:
+        knowledge_base_dir: The directory with the markdown documents.
+        previous: The manifest of the last run, or None to index from scratch.
+        embedding_namespace: Identifies the embedding model of this run.
+        chunker: Identifies the chunking settings of this run.
+
+    Returns:
+        The plan, including the manifest to save once it has been applied.
+    """
+    previous_files = previous.files if previous is not None else {}
+    rechunk = previous is not None and previous.chunker != chunker
+    manifest = IndexManifest(embedding_namespace, chunker)
+    changed_files: List[Path] = []
+    seen_sources = set()
+    unchanged_files = 0
+
+    for doc_path in sorted(knowledge_base_dir.glob("**/*.md")):
+        source = doc_path.relative_to(knowledge_base_dir).as_posix()
+        seen_sources.add(source)
+        old_entry = previous_files.get(source)
+        if old_entry is not None and not rechunk and old_entry.sha256 == file_sha256(doc_path):
+            manifest.files[source] = old_entry
+            unchanged_files += 1
+        else:
+            changed_files.append(doc_path)
+
+    # Chunks of files that no longer exist.
+    delete_ids = [
+        chunk_id
+        for source, old_entry in previous_files.items()
+        if source not in seen_sources
+        for chunk_id in old_entry.chunk_ids
+    ]
+    return IndexPlan(changed_files, delete_ids, manifest, previous_files, unchanged_files)
+
+
+async def iter_new_chunks(
+    plan: IndexPlan,
+    knowledge_base_dir: Path,
+    split_file: Callable[[Path], List[Document]],
+    executor: Executor | None = None,
+) -> AsyncIterator[Tuple[str, Document]]:
+    """
+    Splits the plan's changed files and yields only chunks that are not indexed yet.
+
+    As a side effect, the plan's manifest gets an entry for every changed file,
+    and chunks that disappeared from edited files are added to `delete_ids`.
+    A file that fails to load keeps its previous manifest entry, so it is
+    retried on the next run.
+
+    Args:
+        plan: The plan returned by `plan_index_update`.
+        knowledge_base_dir: The directory with the markdown documents.
+        split_file: Loads and splits one file into chunks.
+        executor: Where to run `split_file` (see `aiter_split_files`).
+
+    Yields:
+        (chunk_id, chunk) pairs to embed.
+    """
+    async for doc_path, chunks in aiter_split_files(plan.changed_files, split_file, executor):
+        source = doc_path.relative_to(knowledge_base_dir).as_posix()
+        old_entry = plan.previous_files.get(source)
+        if isinstance(chunks, Exception):
+            logging.error(f"Error loading document {doc_path}: {chunks}")
+            if old_entry is not None:
+                plan.manifest.files[source] = old_entry
+            continue
+
+        chunk_ids = make_chunk_ids(source, chunks)
+        old_ids = set(old_entry.chunk_ids) if old_entry is not None else set()
+        plan.delete_ids.extend(sorted(old_ids - set(chunk_ids)))
+        plan.manifest.files[source] = FileEntry(file_sha256(doc_path), chunk_ids)
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            if chunk_id not in old_ids:
+                yield chunk_id, chunk
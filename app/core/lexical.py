@@ -0,0 +1,251 @@
+# app/core/lexical.py
+
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+from app.config import settings
+from app.core.indexing import read_index_file, write_index_file
+
+# --- Constants ---
+
+# Name of the lexical index file stored next to the Chroma database.
+LEXICAL_INDEX_FILENAME = "bm25_index.json"
+
+# Bumped whenever the file layout or the tokenizer changes.
+LEXICAL_INDEX_VERSION = 1
+
+# Words, including identifiers like "python-telegram-bot", "C++" or "asp.net".
+TOKEN_PATTERN = re.compile(r"\w+(?:[.+#-]\w*)*", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase terms for the lexical index.
+
+    Compound identifiers are kept whole and also split into their parts, so
+    "python-telegram-bot" matches both itself and "telegram".
+    """
+    terms: List[str] = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0).rstrip(".-")
+        if not token:
+            continue
+        terms.append(token)
+        parts = re.findall(r"\w+", token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+# --- BM25 Index ---
+
+class BM25Index:
+    """
+    An in-memory inverted index that ranks chunks with Okapi BM25.
+
+    It complements dense retrieval on exact terms such as technology or project
+    names, which embeddings tend to blur. The index holds term frequencies only,
+    keyed by the same chunk IDs as the vector store, and is kept in sync with it
+    during indexing.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initializes an empty index.
+
+        Args:
+            k1: Term frequency saturation.
+            b: Strength of the document length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+        self._documents: dict[str, dict[str, int]] = {}
+        self._lengths: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _add_terms(self, doc_id: str, term_counts: dict[str, int]) -> None:
+        self.remove([doc_id])
+        self._documents[doc_id] = term_counts
+        length = sum(term_counts.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Adds chunks to the index, replacing chunks with the same IDs."""
+        for doc_id, text in zip(ids, texts):
+            self._add_terms(doc_id, dict(Counter(tokenize(text))))
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Removes chunks from the index; unknown IDs are ignored."""
+        for doc_id in ids:
+            term_counts = self._documents.pop(doc_id, None)
+            if term_counts is None:
+                continue
+            self._total_length -= self._lengths.pop(doc_id)
+            for term in term_counts:
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Ranks the indexed chunks against a query.
+
+        Args:
+            query: The user's question.
+            k: The maximum number of results.
+
+        Returns:
+            (chunk_id, score) pairs, best first. Chunks sharing no term with the
+            query are not returned.
+        """
+        if not self._documents:
+            return []
+        count = len(self._documents)
+        average_length = self._total_length / count or 1.0
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    # --- Persistence ---
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index | None":
+        """Reads an index, returning None if it is missing, unreadable or outdated."""
+        try:
+            data = read_index_file(path, LEXICAL_INDEX_VERSION)
+            if data is None:
+                return None
+            index = cls(k1=data["k1"], b=data["b"])
+            for doc_id, term_counts in data["documents"].items():
+                index._add_terms(doc_id, {term: int(count) for term, count in term_counts.items()})
+            return index
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable lexical index '{path}': {e}")
+            return None
+
+    def save(self, path: Path) -> None:
+        """Writes the index (see `write_index_file`)."""
+        data = {
+            "version": LEXICAL_INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "documents": {doc_id: self._documents[doc_id] for doc_id in sorted(self._documents)},
+        }
+        write_index_file(path, data)
+
+
+# --- Index File ---
+
+class LexicalIndexFile:
+    """
+    The BM25 index written by the indexing script, reloaded when the file changes.
+
+    Re-indexing rewrites the file next to the Chroma database. The bot checks
+    the file's modification time at most every `check_interval` seconds and
+    loads the new index on a worker thread, so BM25 does not stay out of sync
+    with Chroma until the next restart.
+    """
+
+    def __init__(self, path: Path, check_interval: float = settings.LEXICAL_INDEX_CHECK_INTERVAL):
+        """
+        Initializes the holder; nothing is read until the first `load()` or `aload()`.
+
+        Args:
+            path: The index file.
+            check_interval: How often to look for a new file, in seconds.
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.index: BM25Index | None = None
+        self._stamp: Tuple[int, int] | None = None
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    def _read_stamp(self) -> Tuple[int, int] | None:
+        """Returns the file's modification time and size, or None if it does not exist."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> BM25Index | None:
+        """
+        Returns the current index, reloading it first if the file has changed.
+
+        Blocks on file I/O; on the event loop use `aload`.
+
+        Returns:
+            The index, or None if it has not been built yet, in which case
+            retrieval falls back to vector search only.
+        """
+        if self._is_fresh():
+            return self.index
+        with self._lock:
+            if self._is_fresh():
+                return self.index
+            stamp = self._read_stamp()
+            if self._checked_at is None or stamp != self._stamp:
+                self.index = BM25Index.load(self.path) if stamp is not None else None
+                self._stamp = stamp
+                if self.index is None:
+                    logging.warning("Lexical index not found; using vector search only. Re-run the indexing script.")
+                else:
+                    logging.info(f"Lexical index loaded ({len(self.index)} chunks).")
+            self._checked_at = time.monotonic()
+        return self.index
+
+    async def aload(self) -> BM25Index | None:
+        """Returns the current index like `load`, checking and reloading the file on a worker thread."""
+        if self._is_fresh():
+            return self.index
+        return await asyncio.to_thread(self.load)
+
+
+# --- Rank Fusion ---
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merges several rankings of chunk IDs with reciprocal rank fusion.
+
+    Each ranking contributes 1 / (k + rank) to the score of every ID it contains,
+    so IDs ranked high by several retrievers come first. Only ranks are used, so
+    BM25 scores and vector distances need not be comparable.
+
+    Args:
+        rankings: The rankings to merge, each best first.
+        k: Dampens the weight of the top ranks; 60 is the usual choice.
+
+    Returns:
+        The fused ranking, best first.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
@@ -0,0 +1,167 @@
+# app/core/local_embeddings.py
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.lexical import tokenize
+
+# --- Hashing Vectorizer ---
+
+class HashingEmbeddings(Embeddings):
+    """
+    A model-free embedding: words and character trigrams hashed into a fixed
+    number of dimensions, L2-normalized.
+
+    It needs no download and no network, and it is deterministic, which makes
+    it the backend for tests and offline runs. It only captures lexical
+    similarity, so answers are noticeably worse than with a real model.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        """
+        Initializes the vectorizer.
+
+        Args:
+            dimensions: The size of the vectors.
+        """
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        words = tokenize(text)
+        padded = f" {' '.join(words)} "
+        return words + [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single text."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            # The sign bit keeps colliding features from always adding up.
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a list of texts."""
+        return [self.embed_query(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+# --- ONNX Sentence Embeddings ---
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Runs a sentence-embedding model in-process on the CPU with ONNX Runtime.
+
+    The model is an ONNX export of a sentence-transformers model (a quantized
+    one is recommended), e.g. the `onnx/model_quantized.onnx` file of
+    "Xenova/multilingual-e5-small". Its `tokenizer.json` is looked up next to
+    the model file and in the parent directory. Token embeddings are mean-pooled
+    and L2-normalized, as sentence-transformers does.
+
+    `onnxruntime` and `tokenizers` are optional dependencies, imported when the
+    model is loaded. Loading happens on first use, or up front with `load()`.
+    """
+
+    def __init__(
+        self,
+        model_path: str | Path,
+        query_prefix: str = "",
+        document_prefix: str = "",
+        max_length: int = 512,
+        batch_size: int = 32,
+    ):
+        """
+        Initializes the model wrapper without loading the model.
+
+        Args:
+            model_path: The path to the `.onnx` model file.
+            query_prefix: Prepended to queries (e5 models expect "query: ").
+            document_prefix: Prepended to documents (e5 models expect "passage: ").
+            max_length: Texts are truncated to this many tokens.
+            batch_size: The number of texts per inference call.
+        """
+        self.model_path = Path(model_path)
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Loads the model and the tokenizer and runs a warm-up inference. Safe to call more than once."""
+        with self._lock:
+            if self._session is not None:
+                return
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+            except ImportError as e:
+                raise ImportError(
+                    "The 'onnx' embedding backend requires the 'onnxruntime' and 'tokenizers' packages."
+                ) from e
+
+            start = time.perf_counter()
+            candidates = [self.model_path.parent / "tokenizer.json", self.model_path.parent.parent / "tokenizer.json"]
+            tokenizer_path = next((path for path in candidates if path.is_file()), None)
+            if tokenizer_path is None:
+                raise FileNotFoundError(f"tokenizer.json not found next to the embedding model '{self.model_path}'")
+            tokenizer = Tokenizer.from_file(str(tokenizer_path))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+            session = onnxruntime.InferenceSession(str(self.model_path), providers=["CPUExecutionProvider"])
+            self._tokenizer, self._session = tokenizer, session
+        self._embed(["warm-up"])
+        logging.info(f"Local embedding model '{self.model_path.name}' loaded in {time.perf_counter() - start:.2f}s.")
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds texts in batches: tokenization, inference, mean pooling and normalization."""
+        if self._session is None:
+            self.load()
+        input_names = {model_input.name for model_input in self._session.get_inputs()}
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(texts[i:i + self.batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+            output = self._session.run(None, {name: inputs[name] for name in input_names})[0]
+            if output.ndim == 3:
+                # Mean of the token embeddings, ignoring padding.
+                mask = attention_mask[:, :, None].astype(output.dtype)
+                output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(output, axis=1, keepdims=True)
+            vectors.extend((output / np.clip(norms, 1e-12, None)).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds documents, prefixed with `document_prefix`."""
+        return self._embed([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a query, prefixed with `query_prefix`."""
+        return self._embed([self.query_prefix + text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Inference is CPU-bound; ONNX Runtime releases the GIL while it runs.
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
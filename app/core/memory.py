@@ -1,18 +1,30 @@
 # app/core/memory.py
 
 import json
+from collections import OrderedDict
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import aiosqlite
-from langchain.memory import ConversationBufferWindowMemory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import (
+    AIMessage,
     BaseMessage,
+    HumanMessage,
     _message_from_dict,
     message_to_dict,
 )
 
 from app.config import settings
+from app.core.database import get_pool
+from app.core.metrics import metrics
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it, message extras are stored as JSON.
+    msgpack = None
+
+if TYPE_CHECKING:
+    from langchain.memory import ConversationBufferWindowMemory
 
 # --- Constants ---
 
@@ -28,6 +40,216 @@ DB_DIR = ROOT_DIR / "app" / "db"
 CHAT_HISTORY_DB_PATH = DB_DIR / "chat_history.sqlite3"
 
 
+# --- Session Window Cache ---
+
+class SessionWindowCache:
+    """
+    Bounded in-process LRU cache of the most recent messages per session.
+
+    The bot is the only writer of the chat history, so the window can be kept
+    in memory and updated write-through: new messages are appended to a cached
+    window after they are committed, and `clear()` drops it. A cached window
+    is therefore always identical to the last messages in the database, and
+    steady-state history loads need no database round-trip.
+
+    Entries are evicted in least-recently-used order when either the entry
+    budget or the (approximate) byte budget is exceeded.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_entries: The maximum number of sessions to keep. 0 disables the cache.
+            max_bytes: The maximum total size of cached message contents, in bytes.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], tuple[list[BaseMessage], int]] = OrderedDict()
+        self._total_bytes = 0
+        # Incremented on every write and invalidation. A window loaded from the
+        # database is only stored if no write happened while it was being loaded.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything at all."""
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def _estimate_size(messages: list[BaseMessage]) -> int:
+        """Approximates the memory used by the messages from their content size."""
+        return sum(len(str(message.content).encode("utf-8")) for message in messages)
+
+    def get(self, key: tuple[str, str]) -> list[BaseMessage] | None:
+        """Returns the cached window for a session, counting the hit or miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: tuple[str, str], messages: list[BaseMessage], generation: int) -> None:
+        """
+        Stores a window loaded from the database.
+
+        Args:
+            key: The (db_path, session_id) pair.
+            messages: The most recent messages of the session.
+            generation: The value of `self.generation` before the window was loaded.
+                If a write happened since then, the window may be stale and is dropped.
+        """
+        if not self.enabled or generation != self.generation:
+            return
+        self._store(key, list(messages))
+
+    def append(self, key: tuple[str, str], messages: list[BaseMessage], capacity: int) -> None:
+        """
+        Write-through: appends committed messages to a cached window, if there is one.
+
+        Args:
+            key: The (db_path, session_id) pair.
+            messages: The messages that were just written to the database.
+            capacity: The maximum number of messages kept in a window.
+        """
+        self.generation += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        window = (entry[0] + list(messages))[-capacity:] if capacity > 0 else []
+        self._store(key, window)
+
+    def invalidate(self, key: tuple[str, str]) -> None:
+        """Drops the cached window for a session."""
+        self.generation += 1
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def clear(self) -> None:
+        """Drops all cached windows and resets the counters."""
+        self.generation += 1
+        self._entries.clear()
+        self._total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
+
+    def publish_metrics(self) -> None:
+        """Copies `stats()` into the process metrics as "history_cache_*" gauges, e.g. before they are logged."""
+        for name, value in self.stats().items():
+            metrics.set_gauge(f"history_cache_{name}", value)
+
+    def _store(self, key: tuple[str, str], window: list[BaseMessage]) -> None:
+        """Inserts or replaces an entry and evicts old entries to fit the budgets."""
+        size = self._estimate_size(window)
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self._total_bytes -= old_entry[1]
+        if size > self.max_bytes:
+            # A single window larger than the whole budget is never cached.
+            return
+
+        self._entries[key] = (window, size)
+        self._total_bytes += size
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            self.evictions += 1
+
+
+# Process-wide cache shared by all SQLiteChatMessageHistory instances.
+history_cache = SessionWindowCache(
+    max_entries=settings.HISTORY_CACHE_MAX_ENTRIES,
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+)
+
+
+def _window_capacity() -> int:
+    """The number of messages kept per cached window (k turns of two messages)."""
+    return max(settings.MEMORY_WINDOW_SIZE, 0) * 2
+
+
+# --- Message Encoding ---
+
+# Messages stored in the typed role/content columns, by role.
+_COMPACT_MESSAGE_CLASSES: dict[str, type[BaseMessage]] = {"human": HumanMessage, "ai": AIMessage}
+
+# Columns selected to decode a message with `decode_message`.
+MESSAGE_COLUMNS = "role, content, extras, message"
+
+# First byte of the extras blob, telling how the rest is encoded.
+_EXTRAS_MSGPACK = b"m"
+_EXTRAS_JSON = b"j"
+
+
+def _encode_extras(extras: dict) -> bytes:
+    """Packs the non-default fields of a message, with msgpack if it is installed."""
+    if msgpack is not None:
+        return _EXTRAS_MSGPACK + msgpack.packb(extras, use_bin_type=True)
+    return _EXTRAS_JSON + json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_extras(blob: bytes) -> dict:
+    """Unpacks the fields packed by `_encode_extras`."""
+    tag, data = blob[:1], blob[1:]
+    if tag == _EXTRAS_JSON:
+        return json.loads(data)
+    if msgpack is None:
+        raise ImportError("Reading this chat history requires the 'msgpack' package.")
+    return msgpack.unpackb(data, raw=False)
+
+
+def encode_message(message: BaseMessage) -> tuple[str | None, str | None, bytes | None, str | None]:
+    """
+    Converts a message to the values of the (role, content, extras, message) columns.
+
+    Human and AI messages with text content are stored compactly: the role and
+    the content in their own columns, plus any non-default fields (e.g. an
+    id or response metadata) in the extras blob. Any other message is stored
+    as LangChain's JSON dict in the `message` column, as all messages were
+    before.
+    """
+    role = message.type
+    if type(message) is _COMPACT_MESSAGE_CLASSES.get(role) and isinstance(message.content, str):
+        # Every default value is empty, so only what is set needs to be kept.
+        extras = {
+            key: value for key, value in message_to_dict(message)["data"].items()
+            if value and key not in ("content", "type")
+        }
+        return role, message.content, _encode_extras(extras) if extras else None, None
+    return None, None, None, json.dumps(message_to_dict(message), ensure_ascii=False)
+
+
+def decode_message(
+    role: str | None, content: str | None, extras: bytes | None, message: str | None
+) -> BaseMessage:
+    """Restores a message from the columns written by `encode_message` or from the legacy JSON."""
+    if role is None:
+        return _message_from_dict(json.loads(message))
+    message_class = _COMPACT_MESSAGE_CLASSES[role]
+    if extras is None:
+        # Fast path: the row was written from a valid message, so validation can be skipped.
+        return message_class.construct(content=content)
+    return message_class(content=content, **_decode_extras(extras))
+
+
 # --- Chat History Store ---
 
 class SQLiteChatMessageHistory(BaseChatMessageHistory):
@@ -36,6 +258,8 @@ class SQLiteChatMessageHistory(BaseChatMessageHistory):
 
     This class provides an async interface to store, retrieve, and manage
     chat messages, conforming to the LangChain's BaseChatMessageHistory interface.
+    The 'chat_history' table is created by the schema migrations in
+    `app.core.migrations` when the connection pool is opened.
     """
 
     def __init__(self, session_id: str, db_path: str = str(CHAT_HISTORY_DB_PATH)):
@@ -49,22 +273,10 @@ class SQLiteChatMessageHistory(BaseChatMessageHistory):
         self.db_path = db_path
         self.session_id = session_id
 
-    async def _create_table_if_not_exists(self) -> None:
-        """
-        Asynchronously creates the 'chat_history' table if it doesn't exist.
-        The table stores session ID and the serialized message content.
-        """
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    message TEXT NOT NULL
-                );
-                """
-            )
-            await db.commit()
+    @property
+    def _cache_key(self) -> tuple[str, str]:
+        """The key of this session in the shared window cache."""
+        return (str(self.db_path), self.session_id)
 
     @property
     async def messages(self) -> list[BaseMessage]:
@@ -74,18 +286,61 @@ class SQLiteChatMessageHistory(BaseChatMessageHistory):
         Returns:
             A list of BaseMessage objects, ordered by their insertion time.
         """
-        await self._create_table_if_not_exists()
-        async with aiosqlite.connect(self.db_path) as db:
+        pool = await get_pool(self.db_path)
+        async with pool.reader() as db:
             cursor = await db.execute(
-                "SELECT message FROM chat_history WHERE session_id = ? ORDER BY id ASC",
+                f"SELECT {MESSAGE_COLUMNS} FROM chat_history WHERE session_id = ? ORDER BY id ASC",
                 (self.session_id,),
             )
             rows = await cursor.fetchall()
-            if not rows:
-                return []
 
-            # Deserialize JSON strings back into LangChain message objects
-            return [_message_from_dict(json.loads(row[0])) for row in rows]
+        # Deserialize the rows back into LangChain message objects
+        return [decode_message(*row) for row in rows]
+
+    async def get_last_messages(self, limit: int) -> list[BaseMessage]:
+        """
+        Asynchronously retrieve only the most recent messages for the current session.
+
+        Windows of up to `MEMORY_WINDOW_SIZE` turns are served from the shared
+        in-process cache when possible. Otherwise the window is selected in SQL
+        (`ORDER BY id DESC LIMIT ?` on the session index), so only the returned
+        rows are read and deserialized, no matter how long the session history is.
+
+        Args:
+            limit: The maximum number of messages to return.
+
+        Returns:
+            Up to `limit` BaseMessage objects, ordered by their insertion time.
+        """
+        if limit <= 0:
+            return []
+
+        capacity = _window_capacity()
+        if not history_cache.enabled or limit > capacity:
+            return await self._fetch_last_messages(limit)
+
+        cached = history_cache.get(self._cache_key)
+        if cached is not None:
+            return cached[-limit:]
+
+        # Load the full window, so later calls with any limit can be served from the cache.
+        generation = history_cache.generation
+        window = await self._fetch_last_messages(capacity)
+        history_cache.put(self._cache_key, window, generation)
+        return window[-limit:]
+
+    async def _fetch_last_messages(self, limit: int) -> list[BaseMessage]:
+        """Reads the last `limit` messages of the session from the database."""
+        pool = await get_pool(self.db_path)
+        async with pool.reader() as db:
+            cursor = await db.execute(
+                f"SELECT {MESSAGE_COLUMNS} FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, limit),
+            )
+            rows = await cursor.fetchall()
+
+        # Rows come newest first; restore chronological order.
+        return [decode_message(*row) for row in reversed(rows)]
 
     async def add_message(self, message: BaseMessage) -> None:
         """
@@ -94,16 +349,8 @@ class SQLiteChatMessageHistory(BaseChatMessageHistory):
         Args:
             message: The BaseMessage object to add.
         """
-        await self._create_table_if_not_exists()
-        # Serialize the LangChain message object to a JSON string
-        serialized_message = json.dumps(message_to_dict(message), ensure_ascii=False)
-
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO chat_history (session_id, message) VALUES (?, ?)",
-                (self.session_id, serialized_message),
-            )
-            await db.commit()
+        # Same write path as a batch, including the cache update.
+        await self.add_messages([message])
 
     async def add_messages(self, messages: list[BaseMessage]) -> None:
         """
@@ -117,35 +364,37 @@ class SQLiteChatMessageHistory(BaseChatMessageHistory):
         if not messages:
             return
 
-        await self._create_table_if_not_exists()
-
         # Serialize all messages and prepare them for batch insertion
-        serialized_messages = [
-            (self.session_id, json.dumps(message_to_dict(msg), ensure_ascii=False))
-            for msg in messages
-        ]
+        serialized_messages = [(self.session_id, *encode_message(msg)) for msg in messages]
 
-        async with aiosqlite.connect(self.db_path) as db:
+        pool = await get_pool(self.db_path)
+        async with pool.writer() as db:
             await db.executemany(
-                "INSERT INTO chat_history (session_id, message) VALUES (?, ?)",
+                "INSERT INTO chat_history (session_id, role, content, extras, message, created_at) "
+                "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
                 serialized_messages,
             )
-            await db.commit()
+        # The write is committed, so the cached window can be updated.
+        history_cache.append(self._cache_key, messages, _window_capacity())
 
     async def clear(self) -> None:
         """
         Asynchronously clears all message history for the current session.
+
+        This is the path used by `/reset` and the "reset_chat" button, and it
+        also drops the session's cached window.
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        pool = await get_pool(self.db_path)
+        async with pool.writer() as db:
             await db.execute(
                 "DELETE FROM chat_history WHERE session_id = ?", (self.session_id,)
             )
-            await db.commit()
+        history_cache.invalidate(self._cache_key)
 
 
 # --- Memory Factory ---
 
-def get_chat_memory(session_id: str) -> ConversationBufferWindowMemory:
+def get_chat_memory(session_id: str) -> "ConversationBufferWindowMemory":
     """
     Factory function to create and return a memory object for a given session.
 
@@ -159,6 +408,10 @@ def get_chat_memory(session_id: str) -> ConversationBufferWindowMemory:
         An instance of ConversationBufferWindowMemory configured with
         SQLite-backed history.
     """
+    # Imported here: `langchain` takes about a second to import, and the
+    # handlers that import this module must not wait for it at startup.
+    from langchain.memory import ConversationBufferWindowMemory
+
     chat_history = SQLiteChatMessageHistory(session_id=session_id)
 
     return ConversationBufferWindowMemory(
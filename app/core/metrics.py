@@ -0,0 +1,94 @@
+# app/core/metrics.py
+
+import threading
+from collections import defaultdict, deque
+
+
+class _Timing:
+    """Running statistics of one timed operation, with a window of recent samples."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> dict:
+        recent = sorted(self.recent)
+
+        def percentile(fraction: float) -> float:
+            return round(recent[min(len(recent) - 1, int(fraction * len(recent)))], 4)
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: counters, gauges and timings.
+
+    The bot runs as a single process, so the metrics are kept in memory and
+    logged on shutdown; `snapshot()` returns everything in a JSON-friendly form.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initializes an empty registry.
+
+        Args:
+            window: The number of recent samples kept per timing for percentiles.
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._timings: dict[str, _Timing] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Adds `value` to a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Sets a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Records the duration of an operation, in seconds."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = _Timing(self.window)
+            timing.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Returns the current values of all metrics."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {name: timing.summary() for name, timing in self._timings.items()},
+            }
+
+    def reset(self) -> None:
+        """Clears all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+# The process-wide metrics registry.
+metrics = Metrics()
@@ -0,0 +1,207 @@
+# app/core/migrations.py
+
+import logging
+from typing import NamedTuple
+
+import aiosqlite
+
+
+class Migration(NamedTuple):
+    """A single schema change, applied once and recorded in `PRAGMA user_version`."""
+
+    version: int
+    description: str
+    statements: tuple[str, ...]
+
+
+# --- Schema Migrations ---
+
+# Migrations for the main application database (chat history and statistics).
+# Append new migrations to the end with the next version number; never edit
+# a migration that has already been released.
+SCHEMA_MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        description="Create chat_history and query_stats with lookup indexes",
+        statements=(
+            # IF NOT EXISTS lets databases created before migrations existed be adopted as-is.
+            """
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS query_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                query_text TEXT NOT NULL,
+                retrieved_context TEXT,
+                llm_response TEXT,
+                timestamp DATETIME NOT NULL
+            )
+            """,
+            # History reads filter by session and order by id.
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_session_id ON chat_history (session_id, id)",
+            # Per-user analytics filter by user and time range.
+            "CREATE INDEX IF NOT EXISTS idx_query_stats_user_timestamp ON query_stats (user_id, timestamp)",
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Create canned_answers for precomputed menu answers",
+        statements=(
+            """
+            CREATE TABLE canned_answers (
+                action TEXT NOT NULL,
+                kb_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                context TEXT,
+                generation_seconds REAL NOT NULL,
+                created_at DATETIME NOT NULL,
+                PRIMARY KEY (action, kb_version)
+            )
+            """,
+        ),
+    ),
+    Migration(
+        version=3,
+        description="Store query_stats contexts as shared chunks and allow compressed responses",
+        statements=(
+            # Each distinct piece of retrieved context is stored once, keyed by its hash.
+            """
+            CREATE TABLE stats_chunks (
+                id INTEGER PRIMARY KEY,
+                hash BLOB NOT NULL UNIQUE,
+                content TEXT NOT NULL
+            )
+            """,
+            # The pieces of a row's context, in order.
+            """
+            CREATE TABLE query_stats_chunks (
+                stats_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                PRIMARY KEY (stats_id, position)
+            ) WITHOUT ROWID
+            """,
+            # Set instead of llm_response when the response is stored zlib-compressed.
+            "ALTER TABLE query_stats ADD COLUMN llm_response_zlib BLOB",
+            # Set instead of retrieved_context when the context is stored in query_stats_chunks.
+            "ALTER TABLE query_stats ADD COLUMN context_chunks INTEGER",
+        ),
+    ),
+    Migration(
+        version=4,
+        description="Record when chat_history messages were written, for the retention policy",
+        statements=(
+            "ALTER TABLE chat_history ADD COLUMN created_at DATETIME",
+            # The age of existing messages is unknown; they start to age from the upgrade.
+            "UPDATE chat_history SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL",
+        ),
+    ),
+    Migration(
+        version=5,
+        description="Store chat_history messages in typed role/content columns",
+        statements=(
+            # The table is rebuilt because `message`, now only used by messages
+            # that have no compact form and by older rows, must become nullable.
+            """
+            CREATE TABLE chat_history_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                created_at DATETIME,
+                role TEXT,
+                content TEXT,
+                extras BLOB,
+                message TEXT
+            )
+            """,
+            """
+            INSERT INTO chat_history_new (id, session_id, created_at, message)
+            SELECT id, session_id, created_at, message FROM chat_history
+            """,
+            # Keep the id sequence, so ids of archived messages are never reused.
+            "DELETE FROM sqlite_sequence WHERE name = 'chat_history_new'",
+            """
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'chat_history_new', seq FROM sqlite_sequence WHERE name = 'chat_history'
+            """,
+            "DROP TABLE chat_history",
+            "ALTER TABLE chat_history_new RENAME TO chat_history",
+            "CREATE INDEX idx_chat_history_session_id ON chat_history (session_id, id)",
+        ),
+    ),
+)
+
+# Migrations for the chat history archive (see `app.core.retention`).
+ARCHIVE_MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        description="Create archived_chat_history",
+        statements=(
+            # One row per archived run of a session's messages, stored as
+            # zlib-compressed JSON lines.
+            """
+            CREATE TABLE archived_chat_history (
+                session_id TEXT NOT NULL,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                message_count INTEGER NOT NULL,
+                first_created_at DATETIME,
+                last_created_at DATETIME,
+                archived_at DATETIME NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (session_id, first_id)
+            )
+            """,
+        ),
+    ),
+)
+
+
+# --- Migration Runner ---
+
+async def run_migrations(
+    db: aiosqlite.Connection, migrations: tuple[Migration, ...] = SCHEMA_MIGRATIONS
+) -> int:
+    """
+    Applies all pending migrations to the database behind `db`.
+
+    The current schema version is stored in `PRAGMA user_version`. Each pending
+    migration runs in its own transaction together with the version bump, so a
+    failed migration leaves the database at the previous version.
+
+    Args:
+        db: An open connection that is allowed to write (the pool's writer).
+        migrations: The ordered migrations to apply.
+
+    Returns:
+        The schema version after all migrations have been applied.
+    """
+    cursor = await db.execute("PRAGMA user_version")
+    current_version = (await cursor.fetchone())[0]
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= current_version:
+            continue
+
+        logging.info(f"Applying database migration {migration.version}: {migration.description}")
+        # DDL does not open a transaction implicitly, so begin one explicitly.
+        await db.execute("BEGIN")
+        try:
+            for statement in migration.statements:
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {int(migration.version)}")
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+        current_version = migration.version
+
+    return current_version
@@ -0,0 +1,11 @@
+# app/core/predefined_questions.py
+
+# The literal questions behind the main menu buttons, keyed by callback action.
+# Kept free of heavy imports: the handlers need them before the RAG stack is loaded.
+PREDEFINED_QUESTIONS: dict[str, str] = {
+    "about_me": "Представься локанично как человек",
+    "show_project_primenet": "Расскажи кратко о проекте PrimeNetworking.",
+    "show_project_portfolio_ai": "Расскажи кратко о работе Portfolio AI бота.",
+    "hard_skills": "Составь только структурированный список своих хардскилов, исключая конкретную информацию о проектах.",
+    "soft_skills": "Составь только структурированный список своих софтскилов, исключая конкретную информацию о проектах.",
+}
@@ -1,19 +1,27 @@
 # app/core/rag.py
 
 import asyncio
+import hashlib
 import sys
 import logging
 import httpx
-from typing import List, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List
 import time
 
 from langchain_community.document_loaders import TextLoader # Keep for now, will be replaced later
 from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 
 from app.config import settings
+from app.core.chunking import MarkdownChunker
+from app.core.embedding_cache import CachedEmbeddings, close_embedding_cache, get_embedding_cache
+from app.core.embedding_pipeline import EmbeddingPipeline
+from app.core.indexing import INDEX_MANIFEST_FILENAME, IndexManifest, iter_new_chunks, plan_index_update
+from app.core.lexical import LEXICAL_INDEX_FILENAME, BM25Index
+from app.core.local_embeddings import HashingEmbeddings, OnnxEmbeddings
+from app.core.vector_store import AsyncVectorStore
 
 from pathlib import Path
 
@@ -31,9 +39,39 @@ KNOWLEDGE_BASE_DIR = Path(__file__).parent.parent / "knowledge_base"
 # Directory where the local ChromaDB vector store will be persisted.
 CHROMA_PERSIST_DIR = ROOT_DIR / "chroma_db"
 
-# --- Batching Constants for Indexing ---
-EMBEDDING_BATCH_SIZE = 16  # Number of documents to process in one batch
-EMBEDDING_BATCH_DELAY = 1  # Delay in seconds between batches
+# --- Knowledge Base Version ---
+
+def compute_knowledge_base_version() -> str:
+    """
+    Returns a short fingerprint of everything that shapes generated answers.
+
+    It covers what is actually indexed, the system prompt and the chat models,
+    so any cached answer tagged with an older version is known to be stale.
+    The index is identified by the files `create_vector_store` writes at the
+    end of a run (the manifest and the lexical index), not by the markdown
+    sources: edits to the sources change nothing until they are indexed, and
+    answers generated in between would be tagged with a version the index
+    does not have.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        settings.SYSTEM_PROMPT,
+        settings.OPENROUTER_CHAT_MODEL,
+        settings.OPENROUTER_FALLBACK_MODEL,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+
+    for filename in (INDEX_MANIFEST_FILENAME, LEXICAL_INDEX_FILENAME):
+        digest.update(filename.encode("utf-8"))
+        digest.update(b"\0")
+        try:
+            digest.update((CHROMA_PERSIST_DIR / filename).read_bytes())
+        except FileNotFoundError:
+            pass
+        digest.update(b"\0")
+
+    return digest.hexdigest()[:16]
 
 
 # --- Custom Embedding Client ---
@@ -47,18 +85,16 @@ class ApiServiceEmbeddings(Embeddings):
     interface, making it compatible with ChromaDB and other components.
     """
 
-    def __init__(self, api_url: str, async_client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+    def __init__(self, api_url: str, async_client: httpx.AsyncClient):
         """
         Initializes the embedding service client.
 
         Args:
             api_url: The full URL of the `/embed` endpoint.
             async_client: An instance of httpx.AsyncClient for making API calls.
-            loop: The running asyncio event loop.
         """
         self.api_url = api_url
         self.async_client = async_client
-        self.loop = loop
 
     async def _send_request(self, texts: List[str]) -> List[List[float]]:
         """Sends a request to the embedding API and processes the response."""
@@ -66,31 +102,45 @@ class ApiServiceEmbeddings(Embeddings):
             response = await self.async_client.post(
                 self.api_url, json={"texts": texts}, timeout=60.0
             )
-            response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-            data = response.json()
-            return data["embeddings"]
-        except httpx.HTTPStatusError as e:
-            logging.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}")
+            return self._parse_response(response)
+        except Exception as e:
+            self._log_error(e)
             raise
+
+    def _send_request_sync(self, texts: List[str]) -> List[List[float]]:
+        """
+        Sends a request to the embedding API from a synchronous context.
+
+        Used when Chroma or a script calls the sync embeddings API. The request
+        blocks only the calling thread and never touches the event loop.
+        """
+        try:
+            response = httpx.post(self.api_url, json={"texts": texts}, timeout=60.0)
+            return self._parse_response(response)
         except Exception as e:
-            logging.error(f"An error occurred while calling the embedding API: {e}")
+            self._log_error(e)
             raise
 
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> List[List[float]]:
+        response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
+        data = response.json()
+        return data["embeddings"]
+
+    @staticmethod
+    def _log_error(e: Exception) -> None:
+        if isinstance(e, httpx.HTTPStatusError):
+            logging.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}")
+        else:
+            logging.error(f"An error occurred while calling the embedding API: {e}")
+
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
         """Asynchronously generates embeddings for a list of documents."""
         return await self._send_request(texts)
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """
-        Generates embeddings for a list of documents in a synchronous context.
-
-        This method is a thread-safe bridge to the async version. It submits
-        the async task to the running event loop from the current thread
-        (which is likely a worker thread from ChromaDB's executor) and waits
-        for the result.
-        """
-        future = asyncio.run_coroutine_threadsafe(self.aembed_documents(texts), self.loop)
-        return future.result()
+        """Generates embeddings for a list of documents in a synchronous context."""
+        return self._send_request_sync(texts)
 
     async def aembed_query(self, text: str) -> List[float]:
         """Asynchronously generates an embedding for a single query text."""
@@ -98,88 +148,226 @@ class ApiServiceEmbeddings(Embeddings):
         return embeddings[0]
 
     def embed_query(self, text: str) -> List[float]:
-        """
-        Generates an embedding for a single query in a synchronous context.
-        This is a sync-over-async bridge for compatibility.
-        """
-        future = asyncio.run_coroutine_threadsafe(self.aembed_query(text), self.loop)
-        return future.result()
+        """Generates an embedding for a single query text in a synchronous context."""
+        return self._send_request_sync([text])[0]
 
 
 # --- Embedding Model Initialization ---
 
-def get_embedding_model() -> Embeddings:
-    """Initializes and returns the embedding model client."""
-    # This function assumes it's called within a context where an event
-    # loop is running, which is true for our `create_vector_store` script.
-    loop = asyncio.get_running_loop()
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Creates the shared HTTP client used to talk to the embedding service.
+
+    The caller owns the client and is responsible for closing it with `aclose()`.
+    """
     # Configure a transport with retry logic for transient errors (e.g., 429, 5xx)
     transport = httpx.AsyncHTTPTransport(retries=5)
-    async_client = httpx.AsyncClient(transport=transport)
+    return httpx.AsyncClient(transport=transport)
+
 
-    embeddings = ApiServiceEmbeddings(api_url=settings.EMBEDDING_SERVICE_URL, async_client=async_client, loop=loop)
+def get_embedding_model(async_client: httpx.AsyncClient | None = None) -> Embeddings:
+    """
+    Initializes and returns the embedding model selected by EMBEDDING_BACKEND.
+
+    - "api": the self-hosted embedding service at EMBEDDING_SERVICE_URL.
+    - "onnx": an ONNX model run in-process (EMBEDDING_MODEL_PATH), loaded on
+      first use or by `preload_embedding_model`.
+    - "hashing": a model-free vectorizer for tests and offline runs.
+
+    If the embedding cache is enabled, the model is wrapped in `CachedEmbeddings`,
+    so repeated texts (e.g. predefined questions, unchanged chunks) skip the model.
+
+    Args:
+        async_client: An existing HTTP client to reuse for the "api" backend. If
+            omitted, a new one is created and the caller becomes responsible
+            for closing it.
+
+    Raises:
+        ValueError: If the selected backend is not configured.
+    """
+    backend = settings.EMBEDDING_BACKEND
+    embeddings: Embeddings
+    if backend == "api":
+        if not settings.EMBEDDING_SERVICE_URL:
+            raise ValueError("EMBEDDING_SERVICE_URL must be set for the 'api' embedding backend.")
+        if async_client is None:
+            async_client = create_http_client()
+        embeddings = ApiServiceEmbeddings(api_url=settings.EMBEDDING_SERVICE_URL, async_client=async_client)
+    elif backend == "onnx":
+        if not settings.EMBEDDING_MODEL_PATH:
+            raise ValueError("EMBEDDING_MODEL_PATH must be set for the 'onnx' embedding backend.")
+        embeddings = OnnxEmbeddings(
+            settings.EMBEDDING_MODEL_PATH,
+            query_prefix=settings.EMBEDDING_QUERY_PREFIX,
+            document_prefix=settings.EMBEDDING_DOCUMENT_PREFIX,
+            max_length=settings.EMBEDDING_MAX_LENGTH,
+        )
+    else:
+        embeddings = HashingEmbeddings(settings.EMBEDDING_DIMENSIONS)
+
+    if settings.EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(embeddings, get_embedding_cache(), namespace=get_embedding_namespace())
     return embeddings
 
 
+def get_embedding_namespace() -> str:
+    """
+    Returns the identifier of the embedding model, e.g. the embedding service URL.
+
+    Vectors of different namespaces are never mixed: the cache keys include it,
+    and the vector store is rebuilt when it changes.
+    """
+    if settings.EMBEDDING_CACHE_NAMESPACE:
+        return settings.EMBEDDING_CACHE_NAMESPACE
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return f"onnx:{settings.EMBEDDING_MODEL_PATH}"
+    if settings.EMBEDDING_BACKEND == "hashing":
+        return f"hashing:{settings.EMBEDDING_DIMENSIONS}"
+    return settings.EMBEDDING_SERVICE_URL or ""
+
+
+async def preload_embedding_model(embeddings: Embeddings) -> None:
+    """
+    Loads a local embedding model ahead of time, so the first question does not
+    wait for it. Remote and model-free backends have nothing to load.
+
+    Args:
+        embeddings: The model returned by `get_embedding_model`.
+    """
+    model = embeddings.embeddings if isinstance(embeddings, CachedEmbeddings) else embeddings
+    if isinstance(model, OnnxEmbeddings):
+        await asyncio.to_thread(model.load)
+
+
 # --- Vector Store Initialization ---
 
-def get_vector_store() -> Chroma:
+def get_vector_store(embeddings: Embeddings | None = None) -> Chroma:
     """
     Initializes and returns the Chroma vector store.
 
-    It uses the embedding model created by get_embedding_model and sets up
-    a persistent directory to save the database on disk.
+    It uses the embedding model created by get_embedding_model (unless one is
+    passed in) and sets up a persistent directory to save the database on disk.
+
+    Args:
+        embeddings: An already initialized embedding model to attach to the store.
     """
-    embeddings = get_embedding_model()
+    if embeddings is None:
+        embeddings = get_embedding_model()
     vector_store = Chroma(
         persist_directory=str(CHROMA_PERSIST_DIR), embedding_function=embeddings
     )
     return vector_store
 
 
+def get_async_vector_store(embeddings: Embeddings | None = None) -> AsyncVectorStore:
+    """
+    Returns the Chroma vector store wrapped for fully asynchronous use.
+
+    The caller owns the wrapper's thread pool and should close it with `aclose()`.
+
+    Args:
+        embeddings: An already initialized embedding model to attach to the store.
+    """
+    return AsyncVectorStore(get_vector_store(embeddings=embeddings))
+
+
 # --- Main Indexing Function ---
 
 async def create_vector_store():
     """
-    Orchestrates the entire process of creating the vector store:
-    1. Loads and splits documents from the knowledge base.
-    2. Initializes the vector store.
-    3. Adds the documents to the store, triggering vectorization.
+    Orchestrates the incremental indexing of the knowledge base:
+    1. Compares the knowledge base with the manifest of the last run.
+    2. Initializes the vector store, resetting it if there is no usable manifest.
+    3. Streams new chunks of changed files into the embedding pipeline and
+       the BM25 lexical index.
+    4. Deletes the chunks of removed or edited files from both indexes.
+    5. Saves the lexical index and the manifest for the next run.
+
+    Chunk IDs are deterministic, so an unchanged knowledge base is detected from
+    file hashes alone and finishes without any embedding calls. Files are loaded
+    and split lazily, so memory use does not grow with the knowledge base.
     """
     logging.info("Starting to create vector store...")
 
-    # 1. Load and split documents
-    chunked_documents = _load_and_split_documents()
+    # Pre-flight check to ensure the knowledge base directory exists.
+    if not KNOWLEDGE_BASE_DIR.is_dir():
+        logging.error(f"Knowledge base directory not found: '{KNOWLEDGE_BASE_DIR}'")
+        logging.error("Please create it and add your markdown documents before running the script.")
+        return
 
-    if not chunked_documents:
+    # 1. Plan the update. Without a manifest (or after an embedding model change)
+    # the existing vectors cannot be trusted, so everything is re-indexed.
+    manifest_path = CHROMA_PERSIST_DIR / INDEX_MANIFEST_FILENAME
+    namespace = get_embedding_namespace()
+    previous = IndexManifest.load(manifest_path)
+    rebuild = previous is None or previous.embedding_namespace != namespace
+    plan = plan_index_update(
+        KNOWLEDGE_BASE_DIR, None if rebuild else previous, namespace, MarkdownChunker().signature
+    )
+    lexical_path = CHROMA_PERSIST_DIR / LEXICAL_INDEX_FILENAME
+    lexical_index = None if rebuild else BM25Index.load(lexical_path)
+
+    if not rebuild and plan.is_empty and lexical_index is not None:
+        logging.info(f"Vector store is up to date ({plan.unchanged_files} unchanged file(s)).")
+        return
+    if rebuild and not plan.changed_files:
         logging.warning(
             "No documents found or processed. Vector store not created."
         )
         return
 
-    logging.info(f"Loaded and split {len(chunked_documents)} document chunks.")
+    logging.info(
+        f"{len(plan.changed_files)} new or changed file(s), {plan.unchanged_files} unchanged file(s)."
+    )
 
     # 2. Get the vector store instance
-    vector_store = get_vector_store()
-
-    # 3. Add documents to the vector store in batches to avoid rate limiting
-    logging.info("Adding documents to the vector store in batches...")
-    total_chunks = len(chunked_documents)
-    num_batches = (total_chunks + EMBEDDING_BATCH_SIZE - 1) // EMBEDDING_BATCH_SIZE
-
-    for i in range(0, total_chunks, EMBEDDING_BATCH_SIZE):
-        batch = chunked_documents[i:i + EMBEDDING_BATCH_SIZE]
-        batch_num = (i // EMBEDDING_BATCH_SIZE) + 1
-        logging.info(f"Processing batch {batch_num}/{num_batches}...")
-
-        await vector_store.aadd_documents(documents=batch)
-
-        # Add a delay between batches to avoid rate limiting, but not after the last batch
-        if i + EMBEDDING_BATCH_SIZE < total_chunks:
-            logging.info(
-                f"Waiting for {EMBEDDING_BATCH_DELAY} second(s) before next batch..."
-            )
-            await asyncio.sleep(EMBEDDING_BATCH_DELAY)
+    http_client = create_http_client()
+    embeddings = get_embedding_model(async_client=http_client)
+    vector_store = get_async_vector_store(embeddings=embeddings)
+    # Large knowledge bases can be split on several CPU cores.
+    executor = ProcessPoolExecutor(settings.INDEXING_WORKERS) if settings.INDEXING_WORKERS > 1 else None
+
+    try:
+        if rebuild:
+            logging.info("No usable index manifest found; rebuilding the collection from scratch.")
+            await vector_store.areset()
+            lexical_index = BM25Index()
+        elif lexical_index is None:
+            # Stores indexed before the lexical index existed: build it from the stored chunks.
+            logging.info("Building the lexical index from the vector store...")
+            lexical_index = BM25Index()
+            stored = await vector_store.aget()
+            lexical_index.add([doc_id for doc_id, _ in stored], [doc.page_content for _, doc in stored])
+
+        # 3. Embed the new chunks with concurrent requests. The batch size and the
+        # number of requests in flight adapt to the service's latency and 429s,
+        # and the vectors are written to Chroma by a separate writer task.
+        async def write_batch(ids: List[str], documents: List[Document], vectors: List[List[float]]) -> None:
+            await vector_store.aupsert(ids, documents, vectors)
+            lexical_index.add(ids, [doc.page_content for doc in documents])
+
+        logging.info("Adding documents to the vector store...")
+        pipeline = EmbeddingPipeline(embed=embeddings.aembed_documents, write=write_batch)
+        await pipeline.run(iter_new_chunks(plan, KNOWLEDGE_BASE_DIR, _split_file, executor))
+
+        # 4. Remove chunks that are no longer in the knowledge base. Stale chunks of
+        # edited files are only known once the files have been split.
+        if plan.delete_ids:
+            logging.info(f"Deleting {len(plan.delete_ids)} stale chunk(s)...")
+            await vector_store.adelete(plan.delete_ids)
+            lexical_index.remove(plan.delete_ids)
+
+        # 5. Record what is indexed now. Writing the manifest last means an
+        # interrupted run is simply repeated; deterministic IDs make it idempotent.
+        lexical_index.save(lexical_path)
+        plan.manifest.save(manifest_path)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        await vector_store.aclose()
+        # The HTTP client was created for this run only, so release its sockets.
+        await http_client.aclose()
+        close_embedding_cache()
 
     logging.info("Vector store created and documents indexed successfully.")
 
@@ -191,44 +379,67 @@ def _load_and_split_documents() -> List[Document]:
     Loads documents from the knowledge base directory and splits them into
     manageable chunks for vectorization.
 
+    Prefer `_iter_split_documents` for large knowledge bases; this list
+    version holds every chunk in memory.
+
     Returns:
         A list of Document objects, each representing a chunk.
     """
+    chunked_documents = list(_iter_split_documents())
+    if not chunked_documents:
+        logging.error("Could not load any documents. Aborting.")
+    return chunked_documents
+
+
+def _iter_split_documents() -> Iterator[Document]:
+    """
+    Lazily loads the documents from the knowledge base directory, one file at
+    a time, and yields their chunks.
+
+    Yields:
+        Document objects, each representing a chunk.
+    """
     # Pre-flight check to ensure the knowledge base directory exists.
     if not KNOWLEDGE_BASE_DIR.is_dir():
         logging.error(f"Knowledge base directory not found: '{KNOWLEDGE_BASE_DIR}'")
         logging.error("Please create it and add your markdown documents before running the script.")
-        return []
+        return
 
-    # 1. Find and load all markdown documents from the directory
-    md_files = list(KNOWLEDGE_BASE_DIR.glob("**/*.md"))
+    # 1. Find all markdown documents in the directory
+    md_files = sorted(KNOWLEDGE_BASE_DIR.glob("**/*.md"))
     if not md_files:
         logging.warning(f"No markdown files (.md) found in '{KNOWLEDGE_BASE_DIR}'.")
-        return []
+        return
 
     logging.info(f"Found {len(md_files)} document(s) to load.")
 
-    all_documents: List[Document] = []
+    # 2. Load and split each document into chunks
     for doc_path in md_files:
         try:
-            loader = TextLoader(str(doc_path), encoding="utf-8")
-            all_documents.extend(loader.load())
+            chunks = _split_file(doc_path)
         except Exception as e:
             logging.error(f"Error loading document {doc_path}: {e}")
+            continue
+        yield from chunks
 
-    if not all_documents:
-        logging.error("Could not load any documents. Aborting.")
-        return []
 
-    # 2. Initialize a text splitter for chunking
-    # chunk_size: The maximum number of characters in a chunk.
-    # chunk_overlap: The number of characters to overlap between chunks to maintain context.
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+def _split_file(doc_path: Path) -> List[Document]:
+    """
+    Loads one markdown document and splits it into chunks along its headings.
 
-    # 3. Split the loaded documents into chunks
-    chunked_documents = text_splitter.split_documents(all_documents)
+    This is a module-level function, so it can run in a process pool.
 
-    return chunked_documents
+    Args:
+        doc_path: The path to the document.
+
+    Returns:
+        A list of Document objects, each representing a chunk, with the
+        breadcrumb of its section titles in the metadata.
+    """
+    loader = TextLoader(str(doc_path), encoding="utf-8")
+    # The chunk size is a token budget (CHUNK_MAX_TOKENS); tiny sections are
+    # merged and oversized ones are split by paragraphs and sentences.
+    return MarkdownChunker().split_documents(loader.load())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,335 @@
+# app/core/retention.py
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from langchain_core.messages import BaseMessage, _message_from_dict, message_to_dict
+
+from app.config import settings
+from app.core.database import close_all_pools, get_pool, vacuum
+from app.core.memory import (
+    CHAT_HISTORY_DB_PATH,
+    DB_DIR,
+    MESSAGE_COLUMNS,
+    _window_capacity,
+    decode_message,
+    history_cache,
+)
+from app.core.metrics import metrics
+from app.core.migrations import ARCHIVE_MIGRATIONS
+
+# --- Constants ---
+
+# Path to the SQLite database file that holds archived chat messages.
+CHAT_ARCHIVE_DB_PATH = DB_DIR / "chat_archive.sqlite3"
+
+# zlib compression level of archived messages; they are written once and rarely read.
+ARCHIVE_COMPRESSION_LEVEL = 9
+
+# SQLite's CURRENT_TIMESTAMP format, so the cutoff compares correctly with `created_at`.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class RetentionReport(NamedTuple):
+    """The outcome of one `apply_retention` run."""
+
+    sessions: int
+    archived: int
+    pages_freed: int
+
+
+# --- Archive ---
+
+def _encode_payload(rows: list[tuple]) -> bytes:
+    """
+    Packs (id, created_at, *MESSAGE_COLUMNS) rows as zlib-compressed JSON
+    lines, with each message as LangChain's dict whatever its stored form.
+    """
+    lines = (
+        json.dumps(
+            {"id": row_id, "created_at": created_at, "message": message_to_dict(decode_message(*columns))},
+            ensure_ascii=False,
+        )
+        for row_id, created_at, *columns in rows
+    )
+    return zlib.compress("\n".join(lines).encode("utf-8"), ARCHIVE_COMPRESSION_LEVEL)
+
+
+def _decode_payload(payload: bytes) -> list[dict]:
+    """Unpacks the entries written by `_encode_payload`."""
+    return [json.loads(line) for line in zlib.decompress(payload).decode("utf-8").split("\n")]
+
+
+async def load_archived_messages(
+    session_id: str, archive_path: str | Path = CHAT_ARCHIVE_DB_PATH
+) -> list[BaseMessage]:
+    """
+    Reads the archived messages of a session.
+
+    Args:
+        session_id: The chat session.
+        archive_path: The archive database.
+
+    Returns:
+        The archived messages, ordered by their insertion time.
+    """
+    pool = await get_pool(archive_path, migrations=ARCHIVE_MIGRATIONS)
+    async with pool.reader() as db:
+        cursor = await db.execute(
+            "SELECT payload FROM archived_chat_history WHERE session_id = ? ORDER BY first_id",
+            (session_id,),
+        )
+        rows = await cursor.fetchall()
+    return [_message_from_dict(entry["message"]) for (payload,) in rows for entry in _decode_payload(payload)]
+
+
+# --- Retention ---
+
+async def _find_boundaries(
+    db_path: str | Path, max_messages: int, cutoff: str | None, window: int
+) -> list[tuple[str, int]]:
+    """
+    Finds, per session, the id of the newest message to archive.
+
+    Both rules select the oldest messages of a session, so everything up to
+    and including that id is archived. The age rule skips the newest `window`
+    messages, so an idle session keeps its memory window.
+    """
+    conditions, params = [], []
+    if max_messages > 0:
+        conditions.append("newer > ?")
+        params.append(max_messages)
+    if cutoff is not None:
+        conditions.append("(created_at < ? AND newer > ?)")
+        params += [cutoff, window]
+    if not conditions:
+        return []
+
+    pool = await get_pool(db_path)
+    async with pool.reader() as db:
+        cursor = await db.execute(
+            f"""
+            SELECT session_id, MAX(id) FROM (
+                SELECT session_id, id, created_at,
+                       ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id DESC) AS newer
+                FROM chat_history
+            )
+            WHERE {" OR ".join(conditions)}
+            GROUP BY session_id
+            """,
+            params,
+        )
+        return await cursor.fetchall()
+
+
+async def _archive_session(
+    db_path: str | Path, archive_path: str | Path, session_id: str, boundary: int, batch_size: int
+) -> int:
+    """
+    Moves a session's messages up to `boundary` to the archive, one batch at a time.
+
+    A batch is committed to the archive before it is deleted from the hot
+    table. If the process dies in between, the next run finds the batch
+    already archived and only deletes it, so no message is archived twice.
+
+    Returns:
+        The number of messages archived.
+    """
+    pool = await get_pool(db_path)
+    archive = await get_pool(archive_path, migrations=ARCHIVE_MIGRATIONS)
+    async with archive.reader() as db:
+        cursor = await db.execute(
+            "SELECT MAX(last_id) FROM archived_chat_history WHERE session_id = ?", (session_id,)
+        )
+        archived_up_to = (await cursor.fetchone())[0] or 0
+
+    archived = 0
+    while True:
+        # 1. Read the next batch of the session's oldest messages.
+        async with pool.reader() as db:
+            cursor = await db.execute(
+                f"SELECT id, created_at, {MESSAGE_COLUMNS} FROM chat_history "
+                "WHERE session_id = ? AND id <= ? ORDER BY id LIMIT ?",
+                (session_id, boundary, batch_size),
+            )
+            rows = await cursor.fetchall()
+        if not rows:
+            return archived
+
+        # 2. Archive the messages that are not in the archive yet.
+        new_rows = [row for row in rows if row[0] > archived_up_to]
+        if new_rows:
+            async with archive.writer() as db:
+                await db.execute(
+                    """
+                    INSERT OR IGNORE INTO archived_chat_history (
+                        session_id, first_id, last_id, message_count,
+                        first_created_at, last_created_at, archived_at, payload
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+                    """,
+                    (session_id, new_rows[0][0], new_rows[-1][0], len(new_rows),
+                     new_rows[0][1], new_rows[-1][1], _encode_payload(new_rows)),
+                )
+            archived += len(new_rows)
+
+        # 3. Delete the batch from the hot table.
+        async with pool.writer() as db:
+            await db.execute(
+                "DELETE FROM chat_history WHERE session_id = ? AND id <= ?", (session_id, rows[-1][0])
+            )
+
+
+async def incremental_vacuum(db_path: str | Path) -> int:
+    """
+    Returns the database's free pages to the file system.
+
+    Only files with `auto_vacuum=INCREMENTAL` can do this; an older file is
+    converted by a full VACUUM, e.g. with `python -m app.core.retention --full-vacuum`.
+
+    Returns:
+        The number of pages freed.
+    """
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        mode = (await (await db.execute("PRAGMA auto_vacuum")).fetchone())[0]
+        if mode != 2:
+            logging.warning(
+                f"Database '{db_path}' does not use incremental auto-vacuum; "
+                f"run `python -m app.core.retention --full-vacuum` once to convert it."
+            )
+            return 0
+        before = (await (await db.execute("PRAGMA freelist_count")).fetchone())[0]
+        # The pragma frees one page per step, and `execute` only takes the first
+        # step; `executescript` runs it to completion.
+        await db.executescript("PRAGMA incremental_vacuum")
+        after = (await (await db.execute("PRAGMA freelist_count")).fetchone())[0]
+    return before - after
+
+
+async def apply_retention(
+    db_path: str | Path = CHAT_HISTORY_DB_PATH,
+    archive_path: str | Path = CHAT_ARCHIVE_DB_PATH,
+    max_age_days: int = settings.HISTORY_RETENTION_DAYS,
+    max_messages: int = settings.HISTORY_RETENTION_MAX_MESSAGES,
+    batch_size: int = settings.HISTORY_RETENTION_BATCH_SIZE,
+    now: datetime | None = None,
+) -> RetentionReport:
+    """
+    Moves old chat messages from chat_history to the compressed archive.
+
+    A message is archived if it is older than `max_age_days`, or if its
+    session has more than `max_messages` newer messages. Neither rule touches
+    the memory window (the last MEMORY_WINDOW_SIZE turns of every session):
+    the age rule skips it and the count limit is never lower than it, so the
+    messages the chain reads stay in the hot table even in idle sessions.
+    Afterwards the freed pages are returned to the file system.
+
+    Args:
+        db_path: The database with the chat_history table.
+        archive_path: The archive database; created if missing.
+        max_age_days: The age limit in days; 0 disables it.
+        max_messages: The per-session limit; 0 disables it.
+        batch_size: The maximum number of messages archived per transaction.
+        now: The current time (UTC), for tests.
+
+    Returns:
+        How many sessions and messages were archived and pages freed.
+    """
+    start = time.perf_counter()
+    if max_messages > 0:
+        max_messages = max(max_messages, _window_capacity())
+    cutoff = None
+    if max_age_days > 0:
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=max_age_days)).strftime(TIMESTAMP_FORMAT)
+
+    boundaries = await _find_boundaries(db_path, max_messages, cutoff, _window_capacity())
+    archived = 0
+    for session_id, boundary in boundaries:
+        archived += await _archive_session(db_path, archive_path, session_id, boundary, batch_size)
+        # The cached window may contain archived messages.
+        history_cache.invalidate((str(db_path), session_id))
+
+    pages_freed = await incremental_vacuum(db_path) if boundaries else 0
+    metrics.increment("history_archived", archived)
+    metrics.observe("history_retention_seconds", time.perf_counter() - start)
+    report = RetentionReport(len(boundaries), archived, pages_freed)
+    logging.info(
+        f"Chat history retention archived {archived} messages of {len(boundaries)} sessions "
+        f"and freed {pages_freed} pages in {time.perf_counter() - start:.2f}s."
+    )
+    return report
+
+
+# --- Background Task ---
+
+_retention_task: asyncio.Task | None = None
+
+
+async def _retain_forever(interval: float) -> None:
+    """Applies the retention policy now and then every `interval` seconds."""
+    while True:
+        try:
+            await apply_retention()
+        except Exception as e:
+            logging.error(f"Chat history retention failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+def start_retention(interval: float = settings.HISTORY_RETENTION_INTERVAL) -> None:
+    """Starts applying the retention policy in a background task. Does nothing if it is running."""
+    global _retention_task
+    if _retention_task is None or _retention_task.done():
+        _retention_task = asyncio.create_task(_retain_forever(interval))
+
+
+async def stop_retention() -> None:
+    """Stops the background task, if any. Safe to call more than once."""
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        try:
+            await _retention_task
+        except asyncio.CancelledError:
+            pass
+        _retention_task = None
+
+
+# --- Command Line ---
+
+async def main(db_path: Path, archive_path: Path, max_age_days: int, max_messages: int, run_full_vacuum: bool) -> None:
+    size_before = os.path.getsize(db_path)
+    try:
+        await apply_retention(db_path, archive_path, max_age_days, max_messages)
+        if run_full_vacuum:
+            await vacuum(db_path)
+    finally:
+        await close_all_pools()
+    size_after = os.path.getsize(db_path)
+    logging.info(f"Database size {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB.")
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.core.retention [--db PATH] [--archive PATH] [--days 30] [--max-messages 200] [--full-vacuum]
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    parser = argparse.ArgumentParser(description="Archives old chat_history messages and prunes the table.")
+    parser.add_argument("--db", type=Path, default=CHAT_HISTORY_DB_PATH, help="The chat history database.")
+    parser.add_argument("--archive", type=Path, default=CHAT_ARCHIVE_DB_PATH, help="The archive database.")
+    parser.add_argument("--days", type=int, default=settings.HISTORY_RETENTION_DAYS,
+                        help="Archive messages older than this many days (0 disables).")
+    parser.add_argument("--max-messages", type=int, default=settings.HISTORY_RETENTION_MAX_MESSAGES,
+                        help="Keep at most this many messages per session (0 disables).")
+    parser.add_argument("--full-vacuum", action="store_true",
+                        help="Rebuild the file afterwards; converts older files to incremental auto-vacuum.")
+    args = parser.parse_args()
+    asyncio.run(main(args.db, args.archive, args.days, args.max_messages, args.full_vacuum))
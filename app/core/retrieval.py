@@ -0,0 +1,112 @@
+# app/core/retrieval.py
+
+import time
+from typing import Iterator, List
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.config import settings
+from app.core.lexical import BM25Index, LexicalIndexFile, reciprocal_rank_fusion
+from app.core.metrics import metrics
+from app.core.vector_store import AsyncVectorStore
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves chunks with both dense (vector) and lexical (BM25) search.
+
+    Each search returns its `fetch_k` best chunk IDs, and the two rankings are
+    merged with reciprocal rank fusion. Dense search finds paraphrases, while
+    BM25 catches exact names like "aiogram" or "PrimeNetworking" that the
+    embeddings rank too low. Without a lexical index it is a plain dense
+    retriever.
+
+    The bot uses the async API (`ainvoke`): it goes through `AsyncVectorStore`,
+    so a query never blocks the event loop or pins a thread while it is
+    embedded. The sync API (`invoke`) embeds with the sync embeddings API and
+    blocks only the calling thread.
+    """
+
+    vector_store: AsyncVectorStore
+    """The vector store; chunks are matched with the lexical index by ID."""
+    lexical_index: BM25Index | LexicalIndexFile | None = None
+    """The BM25 index over the same chunks, if it has been built; a file is reloaded when re-indexed."""
+    k: int = settings.RETRIEVAL_K
+    """The number of chunks to return."""
+    fetch_k: int = settings.RETRIEVAL_FETCH_K
+    """The number of candidates taken from each search."""
+    rrf_k: int = settings.RETRIEVAL_RRF_K
+    """The rank fusion constant."""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _rank(self, query: str, dense: List[tuple[str, Document]], lexical_index: BM25Index | None) -> List[str]:
+        """Merges the dense ranking with the BM25 ranking, if there is an index."""
+        rankings = [[doc_id for doc_id, _ in dense]]
+        if lexical_index is not None:
+            rankings.append([doc_id for doc_id, _ in lexical_index.search(query, self.fetch_k)])
+        return reciprocal_rank_fusion(rankings, k=self.rrf_k)
+
+    def _candidates(self, fused_ids: List[str], top_ids: List[str]) -> Iterator[List[str]]:
+        """
+        Yields the next fused IDs needed to fill `top_ids` up to `k`.
+
+        Only the chunks that make the cut are loaded. If one is missing from
+        Chroma (the two indexes are briefly out of sync), the next ones fill in.
+        """
+        position = 0
+        while len(top_ids) < self.k and position < len(fused_ids):
+            candidates = fused_ids[position: position + self.k - len(top_ids)]
+            position += len(candidates)
+            yield candidates
+
+    def _fuse_sync(self, query: str, dense: List[tuple[str, Document]]) -> List[Document]:
+        """Synchronous version of `_fuse`."""
+        documents = dict(dense)
+        lexical_index = self.lexical_index
+        if isinstance(lexical_index, LexicalIndexFile):
+            lexical_index = lexical_index.load()
+        top_ids: List[str] = []
+        for candidates in self._candidates(self._rank(query, dense, lexical_index), top_ids):
+            missing = [doc_id for doc_id in candidates if doc_id not in documents]
+            if missing:
+                documents.update(self.vector_store.get(missing))
+            top_ids.extend(doc_id for doc_id in candidates if doc_id in documents)
+        return [documents[doc_id] for doc_id in top_ids]
+
+    async def _fuse(self, query: str, dense: List[tuple[str, Document]]) -> List[Document]:
+        """Merges the dense ranking with the BM25 ranking and loads the top chunks found by BM25 only."""
+        documents = dict(dense)
+        lexical_index = self.lexical_index
+        if isinstance(lexical_index, LexicalIndexFile):
+            lexical_index = await lexical_index.aload()
+        top_ids: List[str] = []
+        for candidates in self._candidates(self._rank(query, dense, lexical_index), top_ids):
+            missing = [doc_id for doc_id in candidates if doc_id not in documents]
+            if missing:
+                documents.update(await self.vector_store.aget(missing))
+            top_ids.extend(doc_id for doc_id in candidates if doc_id in documents)
+        return [documents[doc_id] for doc_id in top_ids]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        start = time.perf_counter()
+        vector = self.vector_store.embeddings.embed_query(query)
+        dense = self.vector_store.query(vector, self.fetch_k)
+        fused = self._fuse_sync(query, dense)
+        metrics.observe("retrieval_seconds", time.perf_counter() - start)
+        return fused
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        start = time.perf_counter()
+        vector = await self.vector_store.embeddings.aembed_query(query)
+        dense = await self.vector_store.aquery(vector, self.fetch_k)
+        fused = await self._fuse(query, dense)
+        metrics.observe("retrieval_seconds", time.perf_counter() - start)
+        return fused
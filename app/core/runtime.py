@@ -0,0 +1,216 @@
+# app/core/runtime.py
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from app.config import settings
+from app.core.concurrency import ConcurrencyLimiter
+from app.core.lexical import LEXICAL_INDEX_FILENAME, LexicalIndexFile
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain_core.runnables import Runnable
+
+    from app.core.canned_answers import CannedAnswerStore
+    from app.core.semantic_cache import SemanticResponseCache
+    from app.core.vector_store import AsyncVectorStore
+
+# The modules behind the RAG stack (LangChain, the OpenAI client, Chroma).
+# Importing them takes seconds, so this module and the handlers do not import
+# them at load time; `RAGRuntime.create()` imports them on a worker thread
+# while the bot is already serving static commands.
+RAG_MODULES = (
+    "langchain.memory",
+    "app.core.rag",
+    "app.core.chain",
+    "app.core.canned_answers",
+    "app.core.semantic_cache",
+    "app.core.embedding_cache",
+)
+
+
+def _import_rag_modules() -> None:
+    """Imports the RAG stack, logging how long it took."""
+    start = time.perf_counter()
+    for name in RAG_MODULES:
+        importlib.import_module(name)
+    logging.info(f"RAG modules imported in {time.perf_counter() - start:.2f}s.")
+
+
+class RAGRuntime:
+    """
+    Process-wide container for the heavy RAG components.
+
+    Building the LLM clients, the Chroma instance and the HTTP client for the
+    embedding service is expensive, so it is done once at startup. All handlers
+    share the same runtime, and its resources are released on shutdown.
+    """
+
+    def __init__(
+        self,
+        http_client: "httpx.AsyncClient",
+        vector_store: "AsyncVectorStore",
+        rag_chain: "Runnable",
+        canned_answers: "CannedAnswerStore | None" = None,
+        semantic_cache: "SemanticResponseCache | None" = None,
+        llm: "Runnable | None" = None,
+    ):
+        """
+        Initializes the runtime with already constructed components.
+
+        Args:
+            http_client: The HTTP client used by the embedding model.
+            vector_store: The vector store used for retrieval.
+            rag_chain: The conversational RAG chain built on top of the store.
+            canned_answers: The store of precomputed menu answers. Defaults to
+                a new, empty store backed by `rag_chain`.
+            semantic_cache: The semantic cache used by `rag_chain`, if enabled.
+            llm: The chat model used by `rag_chain`.
+        """
+        from app.core.canned_answers import CannedAnswerStore
+
+        self.http_client = http_client
+        self.vector_store = vector_store
+        self.rag_chain = rag_chain
+        # Caps the chain runs, and so the LLM calls, of all chats and the canned answers together.
+        self.llm_limiter = ConcurrencyLimiter(settings.LLM_MAX_CONCURRENCY, "llm")
+        self.canned_answers = canned_answers or CannedAnswerStore(rag_chain, llm_limiter=self.llm_limiter)
+        self.semantic_cache = semantic_cache
+        self.llm = llm
+
+    @classmethod
+    async def create(cls) -> "RAGRuntime":
+        """
+        Builds all RAG components. Must be called from a running event loop.
+
+        The RAG modules are imported first, on a worker thread, so the event
+        loop keeps serving updates while they load.
+
+        Returns:
+            A fully initialized RAGRuntime instance.
+        """
+        await asyncio.to_thread(_import_rag_modules)
+        from app.core.chain import get_llm, get_rag_chain
+        from app.core.rag import (
+            create_http_client,
+            get_async_vector_store,
+            get_embedding_model,
+            preload_embedding_model,
+        )
+        from app.core.semantic_cache import SemanticResponseCache
+
+        http_client = create_http_client()
+        embeddings = get_embedding_model(async_client=http_client)
+        if settings.EMBEDDING_PRELOAD:
+            await preload_embedding_model(embeddings)
+        vector_store = get_async_vector_store(embeddings=embeddings)
+        semantic_cache = SemanticResponseCache() if settings.SEMANTIC_CACHE_ENABLED else None
+        lexical_index = await load_lexical_index() if settings.HYBRID_RETRIEVAL_ENABLED else None
+        llm = get_llm()
+        rag_chain = get_rag_chain(
+            vector_store=vector_store, semantic_cache=semantic_cache, lexical_index=lexical_index, llm=llm
+        )
+        return cls(
+            http_client=http_client,
+            vector_store=vector_store,
+            rag_chain=rag_chain,
+            semantic_cache=semantic_cache,
+            llm=llm,
+        )
+
+    async def aclose(self) -> None:
+        """Stops background work and releases the network resources and caches held by the runtime."""
+        from app.core.embedding_cache import close_embedding_cache
+
+        await self.canned_answers.stop()
+        if self.semantic_cache is not None:
+            logging.info(f"Semantic cache stats: {self.semantic_cache.stats()}")
+        await self.vector_store.aclose()
+        await self.http_client.aclose()
+        close_embedding_cache()
+
+
+async def load_lexical_index() -> LexicalIndexFile:
+    """
+    Loads the BM25 index written by the indexing script.
+
+    Returns:
+        The index file, reloaded by retrieval whenever the indexing script
+        rewrites it. Until the index has been built, retrieval falls back to
+        vector search only.
+    """
+    from app.core.rag import CHROMA_PERSIST_DIR
+
+    lexical_index = LexicalIndexFile(CHROMA_PERSIST_DIR / LEXICAL_INDEX_FILENAME)
+    await lexical_index.aload()
+    return lexical_index
+
+
+# --- Process-wide Instance ---
+
+_runtime: RAGRuntime | None = None
+
+# The build of the runtime in progress, shared by everyone waiting for it.
+_runtime_task: "asyncio.Task[RAGRuntime] | None" = None
+
+
+async def _build_runtime() -> RAGRuntime:
+    """Builds the process-wide runtime; a failed build can be retried by the next caller."""
+    global _runtime, _runtime_task
+    try:
+        _runtime = await RAGRuntime.create()
+    except BaseException:
+        _runtime_task = None
+        raise
+    logging.info("RAG runtime initialized.")
+    return _runtime
+
+
+async def init_runtime() -> RAGRuntime:
+    """
+    Creates the process-wide runtime if it does not exist yet.
+
+    The runtime is built once: concurrent callers, e.g. the background startup
+    task and a question that arrived before it finished, all wait for the same
+    build. A caller that is cancelled while waiting does not cancel the build.
+
+    Returns:
+        The shared RAGRuntime instance.
+    """
+    global _runtime_task
+    if _runtime is not None:
+        return _runtime
+    if _runtime_task is None:
+        _runtime_task = asyncio.create_task(_build_runtime())
+    return await asyncio.shield(_runtime_task)
+
+
+def get_runtime() -> RAGRuntime:
+    """
+    Returns the process-wide runtime.
+
+    Raises:
+        RuntimeError: If `init_runtime()` has not completed yet.
+    """
+    if _runtime is None:
+        raise RuntimeError("RAG runtime is not initialized. Call init_runtime() at startup.")
+    return _runtime
+
+
+async def close_runtime() -> None:
+    """Closes the process-wide runtime, if any, stopping a build in progress. Safe to call more than once."""
+    global _runtime, _runtime_task
+    if _runtime_task is not None and not _runtime_task.done():
+        _runtime_task.cancel()
+        try:
+            await _runtime_task
+        except asyncio.CancelledError:
+            pass
+    _runtime_task = None
+    if _runtime is not None:
+        await _runtime.aclose()
+        _runtime = None
+        logging.info("RAG runtime closed.")
@@ -0,0 +1,164 @@
+# app/core/semantic_cache.py
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple
+
+import numpy as np
+
+from app.config import settings
+from app.core.rag import compute_knowledge_base_version
+
+
+def fingerprint_context(context: str) -> str:
+    """Returns a stable fingerprint of the retrieved context sent to the LLM."""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class _Entry(NamedTuple):
+    """A cached answer together with what it was generated from."""
+
+    vector: np.ndarray
+    context_fingerprint: str
+    answer: str
+    created_at: float
+
+
+class SemanticResponseCache:
+    """
+    Cache of LLM answers for free-text questions, looked up by meaning.
+
+    A stored answer is reused when a new question's embedding is close enough
+    to a previous one (cosine similarity above `threshold`) and exactly the
+    same context was retrieved for it. Comparing the context fingerprint makes
+    sure the answer is grounded in the same knowledge-base chunks.
+
+    Entries expire after `ttl_seconds`, the least recently used entries are
+    evicted beyond `max_entries`, and the whole cache is dropped when the
+    knowledge-base version changes. Callers must bypass the cache for sessions
+    with chat history, since the history can change the answer.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = settings.SEMANTIC_CACHE_TTL,
+        max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        kb_check_interval: float = settings.SEMANTIC_CACHE_KB_CHECK_INTERVAL,
+    ):
+        """
+        Initializes an empty cache.
+
+        Args:
+            threshold: The minimum cosine similarity between two questions.
+            ttl_seconds: How long an answer may be reused, in seconds.
+            max_entries: The maximum number of cached answers.
+            kb_check_interval: How often to recompute the knowledge-base
+                version, in seconds.
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.kb_check_interval = kb_check_interval
+        self.kb_version: str | None = None
+        self._kb_checked_at: float | None = None
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    async def current_kb_version(self) -> str:
+        """
+        Returns the knowledge-base version, recomputing it at most once every
+        `kb_check_interval` seconds so lookups do not hash the knowledge base each time.
+        """
+        now = time.monotonic()
+        if self._kb_checked_at is None or now - self._kb_checked_at >= self.kb_check_interval:
+            self._kb_checked_at = now
+            self._sync_kb_version(await asyncio.to_thread(compute_knowledge_base_version))
+        return self.kb_version
+
+    def _sync_kb_version(self, kb_version: str) -> None:
+        """Drops every entry if the knowledge base has changed since they were stored."""
+        if kb_version != self.kb_version:
+            self._entries.clear()
+            self.kb_version = kb_version
+
+    def _expire(self, now: float) -> None:
+        """Removes entries older than the TTL."""
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if now - entry.created_at >= self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(self, vector: List[float], context_fingerprint: str, kb_version: str) -> str | None:
+        """
+        Returns a stored answer for a semantically equivalent question, if any.
+
+        Args:
+            vector: The embedding of the new question.
+            context_fingerprint: The fingerprint of the context retrieved for it.
+            kb_version: The current knowledge-base version.
+        """
+        self._sync_kb_version(kb_version)
+        self._expire(time.monotonic())
+
+        candidates = [
+            (entry_id, entry)
+            for entry_id, entry in self._entries.items()
+            if entry.context_fingerprint == context_fingerprint
+        ]
+        if candidates:
+            query = self._normalize(vector)
+            similarities = np.stack([entry.vector for _, entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry_id, entry = candidates[best]
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return entry.answer
+
+        self.misses += 1
+        return None
+
+    def store(self, vector: List[float], context_fingerprint: str, kb_version: str, answer: str) -> None:
+        """
+        Stores a freshly generated answer. Answers generated for a knowledge-base
+        version that has been superseded in the meantime are discarded.
+        """
+        if self.max_entries <= 0 or kb_version != self.kb_version:
+            return
+        self._entries[self._next_id] = _Entry(
+            self._normalize(vector), context_fingerprint, answer, time.monotonic()
+        )
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_bypass(self) -> None:
+        """Counts a lookup skipped because the session has chat history."""
+        self.bypasses += 1
+
+    def stats(self) -> dict:
+        """Returns the hit/miss/bypass counters of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "kb_version": self.kb_version,
+        }
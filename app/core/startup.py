@@ -0,0 +1,140 @@
+# app/core/startup.py
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.config import settings
+from app.core.database import get_pool
+from app.core.memory import CHAT_HISTORY_DB_PATH
+from app.core.metrics import metrics
+from app.core.retention import start_retention
+from app.core.runtime import RAGRuntime, init_runtime
+from app.core.stats import start_stats_writer
+
+# Text embedded and searched for by the warm-up steps.
+WARM_UP_QUERY = "warm-up"
+
+# Set once the first user question has been answered.
+_first_query_recorded = False
+
+
+@asynccontextmanager
+async def _step(name: str, timings: dict[str, float], required: bool = True) -> AsyncIterator[None]:
+    """
+    Times one startup step and records it as the "startup_<name>_seconds" gauge.
+
+    A failed optional step is logged and skipped; the bot can still serve
+    requests, the first of which will simply be slower.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if required:
+            raise
+        logging.warning(f"Startup step '{name}' failed: {e}")
+    finally:
+        timings[name] = time.perf_counter() - start
+        metrics.set_gauge(f"startup_{name}_seconds", timings[name])
+
+
+async def prepare_bot() -> None:
+    """
+    Brings up what the bot needs before it receives updates: the shared SQLite
+    connections, with migrations applied, the background writer of the query
+    statistics and the chat history retention task.
+
+    This is all the static commands and the menu need, so updates are served
+    right after it; the RAG stack is loaded in the background by
+    `prepare_rag()`. The duration is exported as the "startup_seconds" gauge.
+    """
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+
+    async with _step("database", timings):
+        await get_pool(CHAT_HISTORY_DB_PATH)
+        # Query statistics are written in the background from now on.
+        start_stats_writer()
+        # Old chat messages are archived periodically, so chat_history stays small.
+        if settings.HISTORY_RETENTION_INTERVAL > 0:
+            start_retention()
+
+    total = time.perf_counter() - start
+    metrics.set_gauge("startup_seconds", total)
+    logging.info(f"Bot is ready to receive updates in {total:.2f}s.")
+
+
+async def prepare_rag() -> RAGRuntime | None:
+    """
+    Loads and warms up the RAG stack while the bot is already serving updates.
+
+    1. rag_runtime: imports the RAG modules and builds the runtime (Chroma
+       client, embedding model, lexical index, LLM clients and chain).
+    2. warm_up_embedding: embeds one query, which opens the connection to the
+       embedding service or runs a local model once.
+    3. warm_up_retrieval: runs one vector search, which makes Chroma load the
+       collection's index into memory.
+    4. llm_ping (optional, STARTUP_PING_LLM): sends a one-token request, which
+       checks the API key and opens the connection to OpenRouter.
+    5. Starts precomputing the canned answers, if CANNED_ANSWERS_ENABLED.
+
+    Questions that arrive before step 1 finishes wait for it (see
+    `init_runtime()`). Steps 2-4 can be disabled with STARTUP_WARM_UP. A failure
+    is logged but does not stop the bot: a failed build is retried by the next
+    question. The duration of every step is logged and exported as a gauge,
+    together with the total "rag_ready_seconds".
+
+    Returns:
+        The process-wide RAG runtime, or None if it could not be built.
+    """
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+
+    runtime = None
+    async with _step("rag_runtime", timings, required=False):
+        runtime = await init_runtime()
+    if runtime is None:
+        return None
+
+    if settings.STARTUP_WARM_UP:
+        from app.core.embedding_cache import CachedEmbeddings
+
+        # Bypass the embedding cache, so the model or the service is actually reached.
+        embeddings = runtime.vector_store.embeddings
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings = embeddings.embeddings
+
+        vector = None
+        async with _step("warm_up_embedding", timings, required=False):
+            vector = await embeddings.aembed_query(WARM_UP_QUERY)
+        if vector is not None:
+            async with _step("warm_up_retrieval", timings, required=False):
+                await runtime.vector_store.aquery(vector, k=1)
+
+        if settings.STARTUP_PING_LLM and runtime.llm is not None:
+            async with _step("llm_ping", timings, required=False):
+                await runtime.llm.ainvoke("ping", max_tokens=1)
+
+    # Precompute answers to the predefined menu questions in the background.
+    if settings.CANNED_ANSWERS_ENABLED:
+        runtime.canned_answers.start()
+
+    total = time.perf_counter() - start
+    metrics.set_gauge("rag_ready_seconds", total)
+    breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+    logging.info(f"RAG stack is ready in {total:.2f}s ({breakdown}).")
+    return runtime
+
+
+def record_first_query(seconds: float) -> None:
+    """
+    Keeps how long the first question after startup took to answer as the
+    "first_query_seconds" gauge, to show how well startup warmed up. Later
+    calls are ignored.
+    """
+    global _first_query_recorded
+    if not _first_query_recorded:
+        _first_query_recorded = True
+        metrics.set_gauge("first_query_seconds", seconds)
@@ -1,34 +1,192 @@
 # app/core/stats.py
 
+import asyncio
+import logging
+import time
 from datetime import datetime, timezone
+from pathlib import Path
 
-import aiosqlite
-
+from app.config import settings
+from app.core.database import get_pool
 from app.core.memory import CHAT_HISTORY_DB_PATH
+from app.core.metrics import metrics
+from app.core.stats_storage import insert_query_stats
+
+# Marks the end of the queue on shutdown.
+_STOP = object()
 
 
-async def _create_table_if_not_exists() -> None:
+# --- Batched Writer ---
+
+class StatsWriter:
     """
-    Asynchronously creates the 'query_stats' table if it doesn't exist.
-    This table is designed to store statistics about user queries.
+    Writes query statistics in the background, in batches.
+
+    Handlers only put a row on an in-memory queue, which involves no I/O. A
+    background task takes rows off the queue and writes up to `batch_size` of
+    them in a single transaction, at most `flush_interval` seconds after the
+    first of them arrived.
+
+    Backpressure policy: the queue holds at most `max_queue_size` rows. When it
+    is full, e.g. because the database is locked for a long time, new rows are
+    dropped and counted as "stats_dropped"; a handler never waits for the
+    statistics. A batch that fails to be written is dropped as well, with an
+    error in the log. On shutdown, `stop()` writes every queued row.
     """
-    async with aiosqlite.connect(CHAT_HISTORY_DB_PATH) as db:
-        await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS query_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                query_text TEXT NOT NULL,
-                retrieved_context TEXT,
-                llm_response TEXT,
-                timestamp DATETIME NOT NULL
-            );
-            """
-        )
-        await db.commit()
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        max_queue_size: int = settings.STATS_QUEUE_MAX_SIZE,
+        batch_size: int = settings.STATS_BATCH_SIZE,
+        flush_interval: float = settings.STATS_FLUSH_INTERVAL,
+    ):
+        """
+        Initializes a stopped writer.
+
+        Args:
+            db_path: The SQLite database with the query_stats table.
+            max_queue_size: The number of rows that may wait to be written.
+            batch_size: The maximum number of rows written per transaction.
+            flush_interval: How long a row may wait for more rows, in seconds.
+        """
+        self.db_path = str(db_path)
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Unbounded, so the stop marker always fits; the size limit is applied in `submit`.
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._dropping = False
+        # Set once `stop()` has queued the stop marker; rows behind it would never be written.
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        """Whether rows submitted now will be written by the background task."""
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self) -> None:
+        """Starts the background task. Does nothing if it is already running."""
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, row: tuple) -> bool:
+        """
+        Queues a row for writing, without waiting.
+
+        Returns:
+            False if the row was dropped because the queue is full or the
+            writer is stopping.
+        """
+        if self._closing:
+            metrics.increment("stats_dropped")
+            return False
+        if self._queue.qsize() >= self.max_queue_size:
+            metrics.increment("stats_dropped")
+            if not self._dropping:
+                self._dropping = True
+                logging.warning(f"Stats queue is full ({self.max_queue_size} rows); dropping new rows.")
+            return False
+        self._dropping = False
+        self._queue.put_nowait(row)
+        metrics.set_gauge("stats_queue_size", self._queue.qsize())
+        return True
+
+    async def _run(self) -> None:
+        """Takes batches off the queue and writes them until the stop marker is reached."""
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            try:
+                # Gather what else arrives within the flush interval, up to a full batch.
+                async with asyncio.timeout(self.flush_interval):
+                    while len(batch) < self.batch_size:
+                        row = await self._queue.get()
+                        if row is _STOP:
+                            stopping = True
+                            break
+                        batch.append(row)
+            except TimeoutError:
+                pass
+            metrics.set_gauge("stats_queue_size", self._queue.qsize())
+            await self._write(batch)
+
+    async def _write(self, batch: list[tuple]) -> None:
+        """Writes a batch in one transaction; a failed batch is logged and dropped."""
+        start = time.perf_counter()
+        try:
+            pool = await get_pool(self.db_path)
+            async with pool.writer() as db:
+                await insert_query_stats(db, batch)
+        except Exception as e:
+            metrics.increment("stats_write_errors")
+            metrics.increment("stats_dropped", len(batch))
+            logging.error(f"Failed to write {len(batch)} stats rows: {e}")
+            return
+        metrics.increment("stats_written", len(batch))
+        metrics.observe("stats_flush_seconds", time.perf_counter() - start)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Writes the queued rows and stops the background task.
+
+        Args:
+            timeout: How long to wait for the queued rows to be written, in
+                seconds; rows still queued after that are dropped.
+        """
+        if not self.running:
+            return
+        self._closing = True
+        self._queue.put_nowait(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except TimeoutError:
+            logging.warning(f"Stats writer did not finish in {timeout}s.")
+        # Whatever is still queued after the task ended will not be written.
+        dropped = sum(1 for row in self._drain() if row is not _STOP)
+        if dropped:
+            metrics.increment("stats_dropped", dropped)
+            logging.warning(f"Dropped {dropped} queued stats rows on shutdown.")
+        self._task = None
+
+    def _drain(self) -> list:
+        """Empties the queue and returns what was in it."""
+        items = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+
+# --- Process-wide Writer ---
+
+_writer: StatsWriter | None = None
+
+
+def start_stats_writer() -> StatsWriter:
+    """
+    Starts the process-wide background writer used by `log_query`.
+
+    Returns:
+        The running writer.
+    """
+    global _writer
+    if _writer is None:
+        _writer = StatsWriter(CHAT_HISTORY_DB_PATH)
+    _writer.start()
+    return _writer
+
+
+async def stop_stats_writer() -> None:
+    """Writes the queued rows and stops the process-wide writer, if any. Safe to call more than once."""
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
 
 
 async def log_query(
@@ -43,6 +201,10 @@ async def log_query(
     """
     Asynchronously logs the details of a user's query to the database.
 
+    While the background writer is running (see `start_stats_writer`), the row
+    is only queued and this returns without any I/O. Otherwise, e.g. in
+    scripts and tests, the row is written directly.
+
     Args:
         user_id: The Telegram user ID.
         username: The Telegram username (can be None).
@@ -52,26 +214,19 @@ async def log_query(
         retrieved_context: The context retrieved from the RAG system (optional).
         llm_response: The final response generated by the LLM (optional).
     """
-    await _create_table_if_not_exists()
-
-    async with aiosqlite.connect(CHAT_HISTORY_DB_PATH) as db:
-        await db.execute(
-            """
-            INSERT INTO query_stats (
-                user_id, username, first_name, last_name, query_text,
-                retrieved_context, llm_response, timestamp
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                user_id,
-                username,
-                first_name,
-                last_name,
-                query_text,
-                retrieved_context,
-                llm_response,
-                datetime.now(timezone.utc),
-            ),
-        )
-        await db.commit()
\ No newline at end of file
+    row = (
+        user_id,
+        username,
+        first_name,
+        last_name,
+        query_text,
+        retrieved_context,
+        llm_response,
+        datetime.now(timezone.utc),
+    )
+    if _writer is not None and _writer.running:
+        _writer.submit(row)
+        return
+    pool = await get_pool(CHAT_HISTORY_DB_PATH)
+    async with pool.writer() as db:
+        await insert_query_stats(db, [row])
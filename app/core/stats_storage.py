@@ -0,0 +1,265 @@
+# app/core/stats_storage.py
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import zlib
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import aiosqlite
+
+from app.config import settings
+from app.core.database import close_all_pools, get_pool, vacuum
+from app.core.memory import CHAT_HISTORY_DB_PATH
+
+# --- Constants ---
+
+# The retrieved context is stored in pieces split at blank lines. The same
+# knowledge-base paragraphs are retrieved over and over, so most pieces are
+# already stored, and joining them back gives the original text exactly.
+CONTEXT_SEPARATOR = "\n\n"
+
+# zlib compression level of stored responses.
+COMPRESSION_LEVEL = 6
+
+# Columns of a row as passed to `insert_query_stats`, in order.
+ROW_COLUMNS = (
+    "user_id", "username", "first_name", "last_name", "query_text",
+    "retrieved_context", "llm_response", "timestamp",
+)
+
+
+# --- Encoding ---
+
+def chunk_hash(text: str) -> bytes:
+    """Returns the content address of a context piece."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def compress_response(text: str | None) -> tuple[str | None, bytes | None]:
+    """
+    Chooses how to store a response.
+
+    Returns:
+        (llm_response, llm_response_zlib): the text as is, or compressed if it
+        is at least STATS_COMPRESS_MIN_BYTES long and compression is enabled.
+    """
+    if text is None or not settings.STATS_COMPRESS_RESPONSES:
+        return text, None
+    data = text.encode("utf-8")
+    if len(data) < settings.STATS_COMPRESS_MIN_BYTES:
+        return text, None
+    return None, zlib.compress(data, COMPRESSION_LEVEL)
+
+
+def decompress_response(text: str | None, compressed: bytes | None) -> str | None:
+    """Returns the response stored by `compress_response`."""
+    if compressed is not None:
+        return zlib.decompress(compressed).decode("utf-8")
+    return text
+
+
+async def _store_chunks(db: aiosqlite.Connection, contexts: dict[int, str]) -> dict[int, int]:
+    """
+    Stores the pieces of contexts, reusing those already stored, and
+    references them from their rows.
+
+    Args:
+        db: A connection that may write.
+        contexts: Non-empty contexts by the id of their query_stats row.
+
+    Returns:
+        The number of pieces of each context, by row id.
+    """
+    pieces = {stats_id: context.split(CONTEXT_SEPARATOR) for stats_id, context in contexts.items()}
+    unique = {chunk_hash(piece): piece for parts in pieces.values() for piece in parts}
+    await db.executemany(
+        "INSERT OR IGNORE INTO stats_chunks (hash, content) VALUES (?, ?)", unique.items()
+    )
+    chunk_ids: dict[bytes, int] = {}
+    digests = list(unique)
+    # Stay well below SQLite's limit on the number of parameters.
+    for start in range(0, len(digests), 500):
+        batch = digests[start:start + 500]
+        cursor = await db.execute(
+            f"SELECT hash, id FROM stats_chunks WHERE hash IN ({', '.join('?' * len(batch))})", batch
+        )
+        chunk_ids.update(await cursor.fetchall())
+    await db.executemany(
+        "INSERT INTO query_stats_chunks (stats_id, position, chunk_id) VALUES (?, ?, ?)",
+        (
+            (stats_id, position, chunk_ids[chunk_hash(piece)])
+            for stats_id, parts in pieces.items()
+            for position, piece in enumerate(parts)
+        ),
+    )
+    return {stats_id: len(parts) for stats_id, parts in pieces.items()}
+
+
+async def insert_query_stats(db: aiosqlite.Connection, rows: Iterable[Sequence]) -> None:
+    """
+    Inserts statistics rows in their compact form.
+
+    The caller owns the transaction (e.g. the pool's writer), so a batch is
+    written atomically.
+
+    Args:
+        db: A connection that may write.
+        rows: Rows with the values of ROW_COLUMNS.
+    """
+    contexts: dict[int, str] = {}
+    for user_id, username, first_name, last_name, query_text, context, response, timestamp in rows:
+        response_text, response_zlib = compress_response(response)
+        cursor = await db.execute(
+            """
+            INSERT INTO query_stats (
+                user_id, username, first_name, last_name, query_text,
+                retrieved_context, llm_response, llm_response_zlib, context_chunks, timestamp
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id
+            """,
+            (user_id, username, first_name, last_name, query_text,
+             # An empty context is cheaper to keep inline than as references.
+             context if not context else None, response_text, response_zlib,
+             len(context.split(CONTEXT_SEPARATOR)) if context else None, timestamp),
+        )
+        stats_id = (await cursor.fetchone())[0]
+        if context:
+            contexts[stats_id] = context
+    if contexts:
+        await _store_chunks(db, contexts)
+
+
+# --- Reading ---
+
+async def fetch_query_stats(
+    db: aiosqlite.Connection, user_id: int | None = None, limit: int | None = None
+) -> list[dict]:
+    """
+    Reads statistics rows with the context and the response restored to text.
+
+    Rows written before the compact format are returned as they are.
+
+    Args:
+        db: An open connection.
+        user_id: Only return this user's rows, if given.
+        limit: Return at most this many rows, newest first.
+
+    Returns:
+        One dict per row with the "id" and the ROW_COLUMNS.
+    """
+    where = "WHERE user_id = ?" if user_id is not None else ""
+    params: list = [user_id] if user_id is not None else []
+    query = (
+        "SELECT id, user_id, username, first_name, last_name, query_text, retrieved_context, "
+        "llm_response, timestamp, llm_response_zlib, context_chunks "
+        f"FROM query_stats {where} ORDER BY id DESC"
+    )
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    cursor = await db.execute(query, params)
+    rows = await cursor.fetchall()
+
+    chunked_ids = [row[0] for row in rows if row[10]]
+    pieces: dict[int, list[str]] = {}
+    # Stay well below SQLite's limit on the number of parameters.
+    for start in range(0, len(chunked_ids), 500):
+        ids = chunked_ids[start:start + 500]
+        cursor = await db.execute(
+            "SELECT r.stats_id, c.content FROM query_stats_chunks AS r "
+            "JOIN stats_chunks AS c ON c.id = r.chunk_id "
+            f"WHERE r.stats_id IN ({', '.join('?' * len(ids))}) ORDER BY r.stats_id, r.position",
+            ids,
+        )
+        for stats_id, content in await cursor.fetchall():
+            pieces.setdefault(stats_id, []).append(content)
+
+    result = []
+    for row in rows:
+        stats_id, *values, response_zlib, context_chunks = row
+        record = dict(zip(("id",) + ROW_COLUMNS, [stats_id, *values]))
+        if context_chunks:
+            record["retrieved_context"] = CONTEXT_SEPARATOR.join(pieces.get(stats_id, []))
+        record["llm_response"] = decompress_response(record["llm_response"], response_zlib)
+        result.append(record)
+    return result
+
+
+# --- Compaction ---
+
+async def compact_query_stats(db_path: str | Path = CHAT_HISTORY_DB_PATH, batch_size: int = 500) -> int:
+    """
+    Converts rows written before the compact format: their contexts are moved
+    into shared chunks and their long responses are compressed.
+
+    Rows are converted in batches, one transaction each, so the bot can keep
+    writing in between.
+
+    Args:
+        db_path: The database to compact.
+        batch_size: The number of rows converted per transaction.
+
+    Returns:
+        The number of rows converted.
+    """
+    pool = await get_pool(db_path)
+    converted = 0
+    last_id = 0
+    while True:
+        async with pool.writer() as db:
+            cursor = await db.execute(
+                "SELECT id, retrieved_context, llm_response FROM query_stats "
+                "WHERE id > ? AND ((retrieved_context IS NOT NULL AND retrieved_context != '') "
+                "OR (llm_response IS NOT NULL AND length(CAST(llm_response AS BLOB)) >= ?)) "
+                "ORDER BY id LIMIT ?",
+                (last_id, settings.STATS_COMPRESS_MIN_BYTES, batch_size),
+            )
+            rows = await cursor.fetchall()
+            counts = await _store_chunks(db, {stats_id: context for stats_id, context, _ in rows if context})
+            updates = []
+            for stats_id, context, response in rows:
+                response_text, response_zlib = compress_response(response)
+                count = counts.get(stats_id)
+                updates.append((None if count else context, count, response_text, response_zlib, stats_id))
+            await db.executemany(
+                "UPDATE query_stats SET retrieved_context = ?, context_chunks = ?, "
+                "llm_response = ?, llm_response_zlib = ? WHERE id = ?",
+                updates,
+            )
+        if not rows:
+            break
+        converted += len(rows)
+        last_id = rows[-1][0]
+        logging.info(f"Compacted {converted} query_stats rows...")
+    return converted
+
+
+async def main(db_path: Path, batch_size: int, run_vacuum: bool) -> None:
+    size_before = os.path.getsize(db_path)
+    try:
+        converted = await compact_query_stats(db_path, batch_size)
+        if run_vacuum:
+            await vacuum(db_path)
+    finally:
+        await close_all_pools()
+    size_after = os.path.getsize(db_path)
+    logging.info(
+        f"Compacted {converted} rows; database size {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB."
+    )
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.core.stats_storage [--db PATH] [--batch-size 500] [--no-vacuum]
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    parser = argparse.ArgumentParser(description="Converts query_stats rows to the compact storage format.")
+    parser.add_argument("--db", type=Path, default=CHAT_HISTORY_DB_PATH, help="The database to compact.")
+    parser.add_argument("--batch-size", type=int, default=500, help="The number of rows per transaction.")
+    parser.add_argument("--no-vacuum", action="store_true", help="Do not rebuild the file afterwards.")
+    args = parser.parse_args()
+    asyncio.run(main(args.db, args.batch_size, not args.no_vacuum))
@@ -0,0 +1,164 @@
+# app/core/vector_store.py
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence, Tuple
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.core.metrics import metrics
+
+
+class AsyncVectorStore:
+    """
+    Fully asynchronous access to the Chroma vector store.
+
+    Texts are embedded with the async embeddings API on the event loop, and
+    Chroma is only given ready-made vectors, so no sync-over-async bridge is
+    ever needed. Chroma's own client is synchronous; its calls run on a
+    dedicated thread pool with explicit backpressure:
+
+    - at most `max_workers` calls run at a time, each on its own thread;
+    - at most `max_pending` more are queued for a thread;
+    - any further caller waits on the event loop, without holding a thread,
+      until a slot is free.
+
+    The number of waiting calls is reported as the "vector_store_waiting" gauge.
+
+    Synchronous callers (LangChain's sync retriever API, scripts) use `query`
+    and `get`, which go through the same executor. They wait on their own
+    thread, with the same limit on queued calls, and never touch the loop.
+    """
+
+    def __init__(
+        self,
+        store: Chroma,
+        max_workers: int = settings.VECTOR_STORE_WORKERS,
+        max_pending: int = settings.VECTOR_STORE_MAX_PENDING,
+    ):
+        """
+        Initializes the wrapper.
+
+        Args:
+            store: The Chroma vector store. Its embedding function must
+                implement the async embeddings API.
+            max_workers: The number of threads running Chroma calls.
+            max_pending: The number of calls that may queue for a thread.
+        """
+        self.store = store
+        self.embeddings = store.embeddings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chroma")
+        self._slots = asyncio.Semaphore(max_workers + max_pending)
+        self._sync_slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._waiting = 0
+
+    async def _run(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+        """Runs a synchronous Chroma call on the dedicated executor, waiting for a free slot first."""
+        self._waiting += 1
+        metrics.set_gauge("vector_store_waiting", self._waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+            metrics.set_gauge("vector_store_waiting", self._waiting)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    def _run_sync(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+        """Runs a Chroma call on the dedicated executor from a synchronous context, blocking the calling thread."""
+        with self._sync_slots:
+            return self._executor.submit(fn, *args, **kwargs).result()
+
+    @staticmethod
+    def _to_documents(ids: List[str], texts: List[str], metadatas: List[dict | None]) -> List[Tuple[str, Document]]:
+        return [
+            (doc_id, Document(page_content=text, metadata=metadata or {}))
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+
+    # --- Search ---
+
+    async def aquery(self, vector: List[float], k: int) -> List[Tuple[str, Document]]:
+        """
+        Finds the chunks nearest to a query vector.
+
+        Returns:
+            (chunk_id, chunk) pairs, nearest first.
+        """
+        result = await self._run(
+            self.store._collection.query,
+            query_embeddings=[vector],
+            n_results=k,
+            include=["documents", "metadatas"],
+        )
+        return self._to_documents(result["ids"][0], result["documents"][0], result["metadatas"][0])
+
+    def query(self, vector: List[float], k: int) -> List[Tuple[str, Document]]:
+        """Synchronous version of `aquery`."""
+        result = self._run_sync(
+            self.store._collection.query,
+            query_embeddings=[vector],
+            n_results=k,
+            include=["documents", "metadatas"],
+        )
+        return self._to_documents(result["ids"][0], result["documents"][0], result["metadatas"][0])
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Embeds a query with the async API and returns the `k` nearest chunks."""
+        vector = await self.embeddings.aembed_query(query)
+        return [doc for _, doc in await self.aquery(vector, k)]
+
+    async def aget(self, ids: Sequence[str] | None = None) -> List[Tuple[str, Document]]:
+        """Returns the stored chunks with the given IDs (all chunks if omitted); unknown IDs are skipped."""
+        result = await self._run(
+            self.store._collection.get,
+            ids=list(ids) if ids is not None else None,
+            include=["documents", "metadatas"],
+        )
+        return self._to_documents(result["ids"], result["documents"], result["metadatas"])
+
+    def get(self, ids: Sequence[str] | None = None) -> List[Tuple[str, Document]]:
+        """Synchronous version of `aget`."""
+        result = self._run_sync(
+            self.store._collection.get,
+            ids=list(ids) if ids is not None else None,
+            include=["documents", "metadatas"],
+        )
+        return self._to_documents(result["ids"], result["documents"], result["metadatas"])
+
+    # --- Writes ---
+
+    async def aupsert(self, ids: List[str], documents: List[Document], vectors: List[List[float]]) -> None:
+        """Writes chunks with already computed vectors, replacing chunks with the same IDs."""
+        await self._run(
+            self.store._collection.upsert,
+            ids=ids,
+            embeddings=vectors,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+        )
+
+    async def aadd_documents(self, ids: List[str], documents: List[Document]) -> None:
+        """Embeds chunks with the async API and writes them."""
+        vectors = await self.embeddings.aembed_documents([doc.page_content for doc in documents])
+        await self.aupsert(ids, documents, vectors)
+
+    async def adelete(self, ids: List[str]) -> None:
+        """Deletes chunks by ID."""
+        if ids:
+            await self._run(self.store._collection.delete, ids=ids)
+
+    async def areset(self) -> None:
+        """Deletes every chunk by recreating the collection."""
+        await self._run(self.store.reset_collection)
+
+    async def aclose(self) -> None:
+        """Waits for running Chroma calls to finish and stops the executor's threads."""
+        await asyncio.to_thread(self._executor.shutdown)
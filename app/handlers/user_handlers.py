@@ -1,17 +1,22 @@
 # app/handlers/user_handlers.py
 
 import logging
+import time
 from pathlib import Path
 
 from aiogram import Bot, F, Router
 from aiogram.filters import Command, CommandStart
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.types import CallbackQuery, FSInputFile, Message, InlineKeyboardMarkup, InputMediaPhoto, User
 from langchain_core.messages import AIMessage, HumanMessage
 
 from app.config import settings
-from app.core.chain import FallbackLoggingCallbackHandler, get_rag_chain
+from app.core.concurrency import KeyedLocks, SingleFlight
 from app.core.memory import get_chat_memory
+from app.core.metrics import metrics
+from app.core.predefined_questions import PREDEFINED_QUESTIONS
+from app.core.runtime import init_runtime
+from app.core.startup import record_first_query
 from app.core.stats import log_query
 from app.keyboards import (
     MainMenuCallback,
@@ -70,6 +75,15 @@ RESET_CONFIRMATION_TEXT = (
     "\n```"
 )
 
+# Telegram's limit on the length of a message text.
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Serializes the turns of each chat.
+chat_turns = KeyedLocks("chat_turns")
+
+# Questions being answered, keyed by chat and text, so duplicates are coalesced.
+in_flight_questions = SingleFlight("questions")
+
 
 
 @router.message(CommandStart())
@@ -144,51 +158,114 @@ async def handle_reset(message: Message) -> None:
     )
     session_id = str(message.chat.id)
     memory = get_chat_memory(session_id=session_id)
-    await memory.chat_memory.clear()
+    # Waits for the chat's turns in flight, so none of them writes its answer after the reset.
+    async with chat_turns.hold(message.chat.id):
+        await memory.chat_memory.clear()
     await message.answer(RESET_CONFIRMATION_TEXT)
 
 
 async def process_query(
-    chat_id: int, user_question: str, bot: Bot, message_to_answer: Message, user: User
+    chat_id: int,
+    user_question: str,
+    bot: Bot,
+    message_to_answer: Message,
+    user: User,
+    canned_action: str | None = None,
 ) -> None:
     """A reusable function to process a user's query through the RAG chain.
 
+    Turns of the same chat are answered one at a time, in arrival order, so
+    each one sees the history written by the previous one. A question that is
+    identical to one from the same chat still being answered, e.g. after a
+    double click on a menu button, is not run again: it shares the answer
+    already on its way. Chain runs of all chats together are capped by the
+    runtime's LLM limiter.
+
     Args:
         chat_id: The user's chat ID for session management.
         user_question: The question to be processed.
         bot: The Bot instance to send 'typing' action.
         message_to_answer: The Message object to reply to or edit.
         user: The User object of the person who initiated the query.
+        canned_action: The menu action behind a predefined question. If a
+            precomputed answer exists for it, it is sent without calling the LLM.
     """
-    # 1. Provide user feedback that the request is being processed
-    await bot.send_chat_action(chat_id=chat_id, action="typing")
+    await in_flight_questions.run(
+        (chat_id, user_question),
+        lambda: _answer_turn(chat_id, user_question, bot, message_to_answer, user, canned_action),
+    )
 
-    # 3. Get the RAG chain and invoke it with the user's question
-    rag_chain = get_rag_chain()
-    # Create an instance of the callback handler to log fallbacks
-    fallback_logger = FallbackLoggingCallbackHandler()
-    try:
-        result = await rag_chain.ainvoke(
-            {"session_id": str(chat_id), "question": user_question},
-            # Pass the callback handler to the chain invocation
-            config={"callbacks": [fallback_logger]},
-        )
-        ai_response = result["answer"]
-        retrieved_context = result["context"]
 
-        # 4. Send the generated response based on the configuration setting
+async def _answer_turn(
+    chat_id: int,
+    user_question: str,
+    bot: Bot,
+    message_to_answer: Message,
+    user: User,
+    canned_action: str | None,
+) -> None:
+    """Answers one question once the chat's previous turns are done; see `process_query`."""
+    async with chat_turns.hold(chat_id):
+        await _answer(chat_id, user_question, bot, message_to_answer, user, canned_action)
+
+
+async def _answer(
+    chat_id: int,
+    user_question: str,
+    bot: Bot,
+    message_to_answer: Message,
+    user: User,
+    canned_action: str | None,
+) -> None:
+    """Runs the question through the RAG chain, sends the answer and saves the turn to the history."""
+    # The message being progressively edited when the answer is streamed
+    placeholder = None
+    try:
+        # Waits for the RAG stack if a question arrives while it is still loading
+        runtime = await init_runtime()
+        chain_input = {"session_id": str(chat_id), "question": user_question}
+        start = time.perf_counter()
+
+        # 1. Serve a precomputed answer for predefined questions, if available
+        canned_answer = runtime.canned_answers.get(canned_action) if canned_action else None
+        if canned_answer is not None:
+            ai_response = canned_answer.answer
+            retrieved_context = canned_answer.context
+        elif settings.STREAM_RESPONSES:
+            # 2-3. Stream the answer into a placeholder message as it is generated
+            placeholder = await message_to_answer.answer(settings.STREAM_PLACEHOLDER_TEXT, parse_mode=None)
+            async with runtime.llm_limiter:
+                ai_response, retrieved_context = await _stream_answer(
+                    runtime.rag_chain, chain_input, placeholder, start
+                )
+        else:
+            # 2. Provide user feedback that the request is being processed
+            await bot.send_chat_action(chat_id=chat_id, action="typing")
+
+            # 3. Invoke the shared RAG chain with the user's question, waiting
+            # for a free slot if too many questions are being answered
+            async with runtime.llm_limiter:
+                result = await runtime.rag_chain.ainvoke(chain_input)
+            ai_response = result["answer"]
+            retrieved_context = result["context"]
+        if canned_answer is None:
+            metrics.observe("llm_response_seconds", time.perf_counter() - start)
+        record_first_query(time.perf_counter() - start)
+
+        # 4. Send the generated response based on the configuration setting.
+        # A streamed answer replaces the plain-text preview in the placeholder.
         if settings.RESPONSE_AS_CODE_BLOCK:
             # Sanitize the response to prevent breaking the code block and wrap it.
             safe_response = ai_response.replace("```", "`` ` ``")
             formatted_response = f"```\n{safe_response}\n```"
             # Send as a code block, which doesn't need Markdown parsing.
-            await message_to_answer.answer(formatted_response, parse_mode=None)
+            await _deliver(formatted_response, message_to_answer, placeholder, parse_mode=None)
         elif settings.SANITIZE_RESPONSE:
             # Proactively sanitize the response to make it compatible with MarkdownV2.
             sanitized_response = sanitize_for_telegram_markdown(ai_response)
             try:
                 # Attempt to send the sanitized message.
-                await message_to_answer.answer(sanitized_response)
+                await _deliver(sanitized_response, message_to_answer, placeholder)
             except TelegramBadRequest as e:
                 # If the sanitized version fails, log the error and fall back to sending without parsing.
                 logging.error(
@@ -197,17 +274,17 @@ async def process_query(
                 logging.error(f"Original AI response: {ai_response}")
                 logging.error(f"Sanitized response that failed: {sanitized_response}")
                 # Send the original, unescaped response without any parsing.
-                await message_to_answer.answer(ai_response, parse_mode=None)
+                await _deliver(ai_response, message_to_answer, placeholder, parse_mode=None)
         else:
             # If sanitization is disabled, try sending with default MarkdownV2,
             # then fall back to no parsing on error.
             try:
-                await message_to_answer.answer(ai_response)
+                await _deliver(ai_response, message_to_answer, placeholder)
             except TelegramBadRequest as e:
                 logging.warning(
                     f"MarkdownV2 parsing failed: {e}. Sending with parse_mode=None."
                 )
-                await message_to_answer.answer(ai_response, parse_mode=None)
+                await _deliver(ai_response, message_to_answer, placeholder, parse_mode=None)
 
         # 5. Log the query and response to the statistics database
         await log_query(
@@ -236,7 +313,92 @@ async def process_query(
             "Пожалуйста, попробуйте еще раз позже.\n"
             "```"
         )
-        await message_to_answer.answer(error_text)
+        await _deliver(error_text, message_to_answer, placeholder)
+
+
+async def _stream_answer(
+    rag_chain,
+    chain_input: dict,
+    placeholder: Message,
+    start: float,
+) -> tuple[str, str | None]:
+    """
+    Streams the RAG chain's answer into a placeholder message.
+
+    The accumulated text is shown as plain text, because a partial answer is
+    rarely valid MarkdownV2. Edits are spaced at least STREAM_EDIT_INTERVAL
+    seconds apart to stay within Telegram's edit limits; the final formatted
+    version is sent by the caller.
+
+    Args:
+        rag_chain: The conversational RAG chain.
+        chain_input: The chain input with the session ID and the question.
+        placeholder: The message to edit with the partial answer.
+        start: The `time.perf_counter()` value when the query was received.
+
+    Returns:
+        The complete answer and the retrieved context.
+    """
+    answer_parts: list[str] = []
+    retrieved_context = None
+    next_edit_at = time.perf_counter() + settings.STREAM_EDIT_INTERVAL
+    shown_length = 0
+
+    async for chunk in rag_chain.astream(chain_input):
+        if "context" in chunk:
+            retrieved_context = chunk["context"]
+        token = chunk.get("answer")
+        if not token:
+            continue
+        if not answer_parts:
+            metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - start)
+        answer_parts.append(token)
+
+        now = time.perf_counter()
+        if now < next_edit_at:
+            continue
+        preview = "".join(answer_parts)[:TELEGRAM_MESSAGE_LIMIT]
+        if len(preview) == shown_length:
+            continue
+        next_edit_at = now + settings.STREAM_EDIT_INTERVAL
+        try:
+            await placeholder.edit_text(preview, parse_mode=None)
+            shown_length = len(preview)
+            metrics.increment("stream_edits")
+        except TelegramRetryAfter as e:
+            # Flood control: wait as long as Telegram asks before the next edit.
+            next_edit_at = now + e.retry_after
+            metrics.increment("stream_edits_throttled")
+        except TelegramBadRequest as e:
+            logging.warning(f"Failed to update the streamed message: {e}")
+
+    return "".join(answer_parts), retrieved_context
+
+
+async def _deliver(
+    text: str,
+    message_to_answer: Message,
+    placeholder: Message | None = None,
+    **kwargs,
+) -> None:
+    """
+    Sends the final text as a reply, or puts it into the streamed placeholder.
+
+    Args:
+        text: The text to send.
+        message_to_answer: The message to reply to.
+        placeholder: The streamed message to edit instead, if any.
+        **kwargs: Extra arguments for the Telegram call, e.g. `parse_mode`.
+    """
+    if placeholder is None:
+        await message_to_answer.answer(text, **kwargs)
+        return
+    try:
+        await placeholder.edit_text(text, **kwargs)
+    except TelegramBadRequest as e:
+        # The preview may already show exactly the final text.
+        if "message is not modified" not in str(e):
+            raise
 
 
 async def _edit_message(
@@ -341,14 +503,16 @@ async def handle_main_menu_button(
                 else:
                     # Re-raise any other TelegramBadRequest errors for debugging.
                     raise
-        case "about_me":
-            predefined_question = "Представься локанично как человек"
+        case action if action in PREDEFINED_QUESTIONS:
+            # Predefined questions (about me, projects, skills) go through the RAG
+            # pipeline, but a precomputed answer is served instantly when available.
             await process_query(
                 chat_id=query.message.chat.id,
-                user_question=predefined_question,
+                user_question=PREDEFINED_QUESTIONS[action],
                 bot=bot,
                 message_to_answer=query.message,
                 user=query.from_user,
+                canned_action=action,
             )
         case "skills":
             await log_query(
@@ -398,42 +562,6 @@ async def handle_main_menu_button(
                 reply_markup=get_main_keyboard(),
                 photo_path=settings.WELCOME_PHOTO_PATH,
             )
-        case "show_project_primenet":
-            predefined_question = "Расскажи кратко о проекте PrimeNetworking."
-            await process_query(
-                chat_id=query.message.chat.id,
-                user_question=predefined_question,
-                bot=bot,
-                message_to_answer=query.message,
-                user=query.from_user,
-            )
-        case "show_project_portfolio_ai":
-            predefined_question = "Расскажи кратко о работе Portfolio AI бота."
-            await process_query(
-                chat_id=query.message.chat.id,
-                user_question=predefined_question,
-                bot=bot,
-                message_to_answer=query.message,
-                user=query.from_user,
-            )
-        case "hard_skills":
-            predefined_question = "Составь только структурированный список своих хардскилов, исключая конкретную информацию о проектах."
-            await process_query(
-                chat_id=query.message.chat.id,
-                user_question=predefined_question,
-                bot=bot,
-                message_to_answer=query.message,
-                user=query.from_user,
-            )
-        case "soft_skills":
-            predefined_question = "Составь только структурированный список своих софтскилов, исключая конкретную информацию о проектах."
-            await process_query(
-                chat_id=query.message.chat.id,
-                user_question=predefined_question,
-                bot=bot,
-                message_to_answer=query.message,
-                user=query.from_user,
-            )
         case "restart_session":
             await log_query(
                 user_id=query.from_user.id,
@@ -455,7 +583,9 @@ async def handle_main_menu_button(
             )
             session_id = str(query.message.chat.id)
             memory = get_chat_memory(session_id=session_id)
-            await memory.chat_memory.clear()
+            # Waits for the chat's turns in flight, so none of them writes its answer after the reset.
+            async with chat_turns.hold(query.message.chat.id):
+                await memory.chat_memory.clear()
             # Send a new message to confirm the action.
             await query.message.answer(RESET_CONFIRMATION_TEXT)
             # Edit the original /help message to remove the keyboard,
@@ -0,0 +1,153 @@
+# app/webhook.py
+
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import settings
+from app.core.runtime import get_runtime
+
+# Header Telegram puts the webhook's secret token in.
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Path of the health endpoint for the load balancer and the container orchestrator.
+HEALTH_PATH = "/healthz"
+
+
+class GracefulRequestHandler(SimpleRequestHandler):
+    """
+    Feeds webhook updates to the dispatcher, finishing in-flight ones on shutdown.
+
+    Telegram gets its response as soon as an update is accepted, and the update
+    is handled in a background task, because answering a question can take
+    longer than Telegram waits. On shutdown, the running tasks are given
+    `shutdown_timeout` seconds to finish before the bot's session is closed, so
+    a restart or a scale-down does not drop the answers being generated.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str | None, shutdown_timeout: float):
+        """
+        Initializes the handler.
+
+        Args:
+            dispatcher: The dispatcher with the bot's routers.
+            bot: The bot the updates are for.
+            secret_token: The token Telegram must send with every update.
+            shutdown_timeout: How long to wait for in-flight updates on shutdown, in seconds.
+        """
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, secret_token=secret_token)
+        self.shutdown_timeout = shutdown_timeout
+
+    async def close(self) -> None:
+        """Waits for the updates being handled, then closes the bot's session."""
+        pending = set(self._background_feed_update_tasks)
+        if pending:
+            logging.info(f"Waiting for {len(pending)} in-flight update(s) to finish...")
+            _, not_done = await asyncio.wait(pending, timeout=self.shutdown_timeout)
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                logging.warning(f"Cancelled {len(not_done)} update(s) still running after {self.shutdown_timeout}s.")
+        await super().close()
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """
+    Reports that the process is up and serving updates.
+
+    The response is always 200, because static commands are served while the
+    RAG stack is still loading; "rag_ready" tells whether questions are
+    answered without waiting for it.
+    """
+    try:
+        get_runtime()
+        rag_ready = True
+    except RuntimeError:
+        rag_ready = False
+    return web.json_response({"status": "ok", "rag_ready": rag_ready})
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """
+    Builds the aiohttp application that receives updates from Telegram.
+
+    Args:
+        bot: The bot the updates are for.
+        dp: The dispatcher with the bot's routers.
+
+    Returns:
+        An application serving the webhook at WEBHOOK_PATH and the health
+        endpoint at HEALTH_PATH.
+
+    Raises:
+        ValueError: If WEBHOOK_SECRET is not set; without it anyone who finds
+            the URL could send the bot fake updates.
+    """
+    if not settings.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET must be set in webhook mode.")
+    app = web.Application()
+    app.router.add_get(HEALTH_PATH, handle_health)
+    GracefulRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET,
+        shutdown_timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    # Emits the dispatcher's startup and shutdown events with the application's.
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """
+    Serves updates over a webhook until the process receives SIGINT or SIGTERM.
+
+    1. Registers the webhook with Telegram, if WEBHOOK_BASE_URL is set. Behind a
+       load balancer only one replica needs to, or it can be done once by hand.
+    2. Starts the aiohttp server on WEBHOOK_HOST:WEBHOOK_PORT.
+    3. On a stop signal, stops accepting connections, lets in-flight updates
+       finish (see `GracefulRequestHandler`) and closes the bot's session.
+       The webhook is left registered, so other replicas keep receiving updates.
+
+    Args:
+        bot: The bot the updates are for.
+        dp: The dispatcher with the bot's routers.
+    """
+    app = create_webhook_app(bot, dp)
+
+    if settings.WEBHOOK_BASE_URL:
+        url = settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH
+        await bot.set_webhook(
+            url=url,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logging.info(f"Webhook registered at {url}.")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Not supported on Windows; Ctrl+C still cancels the task.
+            pass
+
+    runner = web.AppRunner(app, shutdown_timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+        logging.info(f"Serving webhook on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}.")
+        await stop.wait()
+        logging.info("Stop signal received, shutting down the webhook server...")
+    finally:
+        await runner.cleanup()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except NotImplementedError:
+                pass
@@ -0,0 +1,102 @@
+# benchmarks/bench_document_loader.py
+
+"""
+Measures peak memory and time of loading and splitting a synthetic knowledge
+base of growing size.
+
+"List" is `_load_and_split_documents`, which holds every chunk in memory.
+"Stream" plans an index update and consumes `iter_new_chunks` one chunk at a
+time, as `create_vector_store` does; its peak should stay roughly flat.
+"Stream xN" is the same with a process pool of N workers.
+
+Peak memory is measured with tracemalloc in the main process only. Splitting
+is CPU-bound, so the process pool only pays off with several free cores.
+
+Usage:
+    python -m benchmarks.bench_document_loader [--files 100 500] [--file-kb 20] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from app.core import rag  # noqa: E402
+from app.core.indexing import iter_new_chunks, plan_index_update  # noqa: E402
+
+
+def populate(kb_dir: Path, files: int, file_kb: int) -> None:
+    """Writes `files` markdown documents of about `file_kb` KiB each."""
+    paragraph = "Опыт разработки асинхронных сервисов на Python, интеграции с LLM и работа с данными. "
+    for i in range(files):
+        body = f"# Документ {i}\n\n" + (paragraph * (file_kb * 1024 // len(paragraph.encode("utf-8")))) + "\n"
+        (kb_dir / f"doc_{i:05d}.md").write_text(body, encoding="utf-8")
+
+
+def measure(fn) -> tuple[float, float, int]:
+    """
+    Returns (seconds, peak MiB, chunks) for a function returning a chunk count.
+    Time is measured on a separate run, because tracemalloc slows Python down.
+    """
+    start = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, chunks
+
+
+def load_list() -> int:
+    return len(rag._load_and_split_documents())
+
+
+def load_stream(kb_dir: Path, workers: int) -> int:
+    async def consume() -> int:
+        plan = plan_index_update(kb_dir, None, "benchmark", "benchmark")
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            count = 0
+            async for _ in iter_new_chunks(plan, kb_dir, rag._split_file, executor):
+                count += 1
+            return count
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    return asyncio.run(consume())
+
+
+def main(file_counts: list[int], file_kb: int, workers: int) -> None:
+    print(f"{'files':>6} | {'mode':>10} | {'seconds':>8} | {'peak MiB':>9} | {'chunks':>7}")
+    for files in file_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            kb_dir = Path(tmp_dir)
+            populate(kb_dir, files, file_kb)
+            rag.KNOWLEDGE_BASE_DIR = kb_dir
+
+            modes = [("list", load_list), ("stream", lambda: load_stream(kb_dir, 0))]
+            if workers > 1:
+                modes.append((f"stream x{workers}", lambda: load_stream(kb_dir, workers)))
+            for name, fn in modes:
+                elapsed, peak, chunks = measure(fn)
+                print(f"{files:>6} | {name:>10} | {elapsed:>8.2f} | {peak:>9.1f} | {chunks:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--file-kb", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    main(args.files, args.file_kb, args.workers)
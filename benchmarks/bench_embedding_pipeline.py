@@ -0,0 +1,118 @@
+# benchmarks/bench_embedding_pipeline.py
+
+"""
+Compares the indexing throughput of the original sequential loop with the
+adaptive, concurrent embedding pipeline against a local stub `/embed` server.
+
+The stub server answers after `base latency + per-text latency * len(texts)`
+and returns 429 with Retry-After when more than `--capacity` requests are in
+flight, roughly like a small self-hosted embedding service.
+
+"Sequential" sends fixed batches of 16 one at a time with a fixed delay between
+them, as `create_vector_store` did originally. "Pipeline" is `EmbeddingPipeline`.
+Vectors are written to a no-op writer, so only embedding throughput is measured.
+
+Usage:
+    python -m benchmarks.bench_embedding_pipeline [--chunks 500] [--capacity 4] [--delay 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from aiohttp import web  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from app.core.embedding_pipeline import EmbeddingPipeline  # noqa: E402
+from app.core.rag import ApiServiceEmbeddings, create_http_client  # noqa: E402
+
+
+class StubEmbeddingServer:
+    """A local `/embed` endpoint with latency and a concurrency limit."""
+
+    def __init__(self, base_latency: float, per_text_latency: float, capacity: int):
+        self.base_latency = base_latency
+        self.per_text_latency = per_text_latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+
+    async def embed(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        texts = (await request.json())["texts"]
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            return web.json_response({"detail": "busy"}, status=429, headers={"Retry-After": "0.2"})
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.base_latency + self.per_text_latency * len(texts))
+        finally:
+            self.in_flight -= 1
+        return web.json_response({"embeddings": [[float(len(text)), 1.0] for text in texts]})
+
+    async def start(self) -> tuple[web.AppRunner, str]:
+        app = web.Application()
+        app.router.add_post("/embed", self.embed)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://127.0.0.1:{port}/embed"
+
+
+async def sequential(embeddings: ApiServiceEmbeddings, documents: list[Document], delay: float) -> None:
+    """The original indexing loop: fixed batches of 16, one at a time, with a fixed delay."""
+    for i in range(0, len(documents), 16):
+        await embeddings.aembed_documents([doc.page_content for doc in documents[i:i + 16]])
+        if i + 16 < len(documents):
+            await asyncio.sleep(delay)
+
+
+async def main(chunks: int, capacity: int, delay: float, base_latency: float, per_text_latency: float) -> None:
+    documents = [Document(page_content=f"Фрагмент базы знаний номер {i}. " * 20) for i in range(chunks)]
+    ids = [str(i) for i in range(chunks)]
+
+    async def write(ids, documents, vectors) -> None:
+        pass
+
+    print(f"{chunks} chunks, server capacity {capacity}, latency {base_latency}s + {per_text_latency}s/text")
+    print(f"{'mode':>10} | {'seconds':>8} | {'chunks/s':>9} | {'requests':>8} | {'429s':>5}")
+
+    for mode in ("sequential", "pipeline"):
+        server = StubEmbeddingServer(base_latency, per_text_latency, capacity)
+        runner, url = await server.start()
+        http_client = create_http_client()
+        embeddings = ApiServiceEmbeddings(url, async_client=http_client)
+        try:
+            start = time.perf_counter()
+            if mode == "sequential":
+                await sequential(embeddings, documents, delay)
+            else:
+                await EmbeddingPipeline(embeddings.aembed_documents, write).run(zip(ids, documents))
+            elapsed = time.perf_counter() - start
+        finally:
+            await http_client.aclose()
+            await runner.cleanup()
+        print(
+            f"{mode:>10} | {elapsed:>8.2f} | {chunks / elapsed:>9.1f} | "
+            f"{server.requests:>8} | {server.rejected:>5}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=1.0, help="Delay between batches in sequential mode.")
+    parser.add_argument("--base-latency", type=float, default=0.05)
+    parser.add_argument("--per-text-latency", type=float, default=0.002)
+    args = parser.parse_args()
+    asyncio.run(main(args.chunks, args.capacity, args.delay, args.base_latency, args.per_text_latency))
@@ -0,0 +1,98 @@
+# benchmarks/bench_history_window.py
+
+"""
+Measures the cost of loading the chat-history window for sessions of
+different lengths.
+
+"Full load" reads every message of the session and slices the window in
+Python, as `_get_async_chat_history` did originally. "SQL window" selects only
+the window in SQL. "Cached" is `SQLiteChatMessageHistory.get_last_messages`
+in steady state, served from the in-process window cache.
+
+Usage:
+    python -m benchmarks.bench_history_window [--sizes 10 1000 100000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core.database import close_all_pools, get_pool  # noqa: E402
+from app.core.memory import SQLiteChatMessageHistory, encode_message  # noqa: E402
+
+
+async def populate(db_path: str, session_id: str, size: int) -> None:
+    """Inserts `size` alternating question/answer messages for one session."""
+    rows = []
+    for i in range(size):
+        message_cls = HumanMessage if i % 2 == 0 else AIMessage
+        message = message_cls(content=f"Сообщение номер {i}. " * 10)
+        rows.append((session_id, *encode_message(message)))
+
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.executemany(
+            "INSERT INTO chat_history (session_id, role, content, extras, message) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+
+async def timed(coro_fn, repeat: int) -> float:
+    """Returns the mean duration of `coro_fn()` in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await coro_fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    window = settings.MEMORY_WINDOW_SIZE * 2
+    print(f"Window: {window} messages, repeat: {repeat}")
+    print(f"{'session size':>12} | {'full load (ms)':>14} | {'SQL window (ms)':>15} | {'cached (ms)':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "history.sqlite3")
+        # A noisy neighbour session, so the table is not just the measured session.
+        await populate(db_path, "other", 10_000)
+
+        for size in sizes:
+            session_id = f"session_{size}"
+            await populate(db_path, session_id, size)
+            history = SQLiteChatMessageHistory(session_id=session_id, db_path=db_path)
+
+            async def full_load():
+                messages = await history.messages
+                return messages[-window:]
+
+            async def sql_window():
+                return await history._fetch_last_messages(window)
+
+            async def cached():
+                return await history.get_last_messages(window)
+
+            assert [m.content for m in await full_load()] == [m.content for m in await cached()]
+
+            full = await timed(full_load, repeat)
+            sql = await timed(sql_window, repeat)
+            hit = await timed(cached, repeat)
+            print(f"{size:>12} | {full:>14.3f} | {sql:>15.3f} | {hit:>11.4f}")
+
+        await close_all_pools()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
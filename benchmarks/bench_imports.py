@@ -0,0 +1,95 @@
+# benchmarks/bench_imports.py
+
+"""
+Measures how long the bot's modules take to import, with `python -X importtime`.
+
+Each target module is imported in a fresh interpreter. The total import time
+and the slowest top-level packages are reported, and the run fails if a
+module that must stay lightweight pulls in any part of the RAG stack
+(LangChain, the OpenAI client, Chroma), which is loaded in the background
+after polling starts. Use it as a regression check after changing imports.
+
+Usage:
+    python -m benchmarks.bench_imports [--top 10] [--runs 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Modules imported before polling starts; they must not import the RAG stack.
+LIGHTWEIGHT_MODULES = ("main", "app.handlers.user_handlers")
+
+# Modules imported in the background, measured for comparison.
+HEAVY_MODULES = ("app.core.chain",)
+
+# Top-level packages that only the background RAG loading may import.
+FORBIDDEN_PACKAGES = ("langchain", "langchain_community", "langchain_openai", "langchain_chroma", "chromadb", "openai")
+
+# A line of `-X importtime` output: "import time: self [us] | cumulative | imported package".
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def measure(module: str) -> tuple[float, dict[str, float]]:
+    """
+    Imports a module in a fresh interpreter.
+
+    Returns:
+        The total import time in seconds and the self time in seconds of
+        every top-level package that was imported.
+    """
+    env = dict(os.environ)
+    # Dummy settings so the modules import without a real .env file.
+    env.setdefault("BOT_TOKEN", "123456:benchmark")
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+    env.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    packages: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+        if not indent:
+            total += int(cumulative_us) / 1e6
+    return total, packages
+
+
+def main(top: int, runs: int) -> int:
+    failed = False
+    for module in LIGHTWEIGHT_MODULES + HEAVY_MODULES:
+        # The fastest run is the least disturbed by the rest of the machine.
+        total, packages = min((measure(module) for _ in range(runs)), key=lambda result: result[0])
+        print(f"{module}: {total:.2f}s")
+        for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"    {package:<28} {seconds:6.2f}s")
+
+        if module in LIGHTWEIGHT_MODULES:
+            forbidden = sorted(set(packages) & set(FORBIDDEN_PACKAGES))
+            if forbidden:
+                failed = True
+                print(f"    FAIL: imports the RAG stack at load time: {', '.join(forbidden)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=10, help="The number of slowest packages to show per module.")
+    parser.add_argument("--runs", type=int, default=3, help="The number of fresh imports per module.")
+    args = parser.parse_args()
+    sys.exit(main(args.top, args.runs))
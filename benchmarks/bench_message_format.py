@@ -0,0 +1,124 @@
+# benchmarks/bench_message_format.py
+
+"""
+Compares the legacy and the compact storage format of chat messages.
+
+"Legacy" stores every message as `json.dumps(message_to_dict(msg))` in the
+`message` column and reads it back through `_message_from_dict`. "Compact"
+is the current format (`encode_message` / `decode_message`): the role and
+the content in typed columns, and a HumanMessage or AIMessage built
+directly on read.
+
+Reported per format:
+- bytes/message: the database file size divided by the number of messages;
+- payload bytes/message: only the stored message columns;
+- decode/window: turning the rows of one memory window into messages;
+- fetch/window: `_fetch_last_messages`, i.e. the SQL query plus decoding.
+
+Usage:
+    python -m benchmarks.bench_message_format [--messages 20000] [--repeat 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core.database import close_all_pools, get_pool  # noqa: E402
+from app.core.memory import MESSAGE_COLUMNS, SQLiteChatMessageHistory, decode_message, encode_message  # noqa: E402
+
+SESSIONS = 100
+
+
+def make_messages(count: int) -> list:
+    """Alternating short questions and longer answers, like a real conversation."""
+    return [
+        HumanMessage(content=f"Расскажите о проекте номер {i}?")
+        if i % 2 == 0
+        else AIMessage(content=f"Проект {i} был написан на Python с FastAPI и PostgreSQL. " * 8)
+        for i in range(count)
+    ]
+
+
+def legacy_row(session_id: str, message) -> tuple:
+    return (session_id, None, None, None, json.dumps(message_to_dict(message), ensure_ascii=False))
+
+
+def compact_row(session_id: str, message) -> tuple:
+    return (session_id, *encode_message(message))
+
+
+async def populate(db_path: str, messages: list, to_row) -> None:
+    rows = [to_row(f"session_{i % SESSIONS}", message) for i, message in enumerate(messages)]
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.executemany(
+            "INSERT INTO chat_history (session_id, role, content, extras, message) VALUES (?, ?, ?, ?, ?)", rows
+        )
+    async with pool.writer() as db:
+        await db.commit()
+        await db.execute("VACUUM")
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+async def measure(db_path: str, count: int, repeat: int) -> tuple[float, float, float, float]:
+    window = settings.MEMORY_WINDOW_SIZE * 2
+    pool = await get_pool(db_path)
+    async with pool.reader() as db:
+        cursor = await db.execute(
+            "SELECT SUM(COALESCE(length(CAST(role AS BLOB)), 0) + COALESCE(length(CAST(content AS BLOB)), 0) "
+            "+ COALESCE(length(extras), 0) + COALESCE(length(CAST(message AS BLOB)), 0)) FROM chat_history"
+        )
+        payload = (await cursor.fetchone())[0] / count
+        cursor = await db.execute(
+            f"SELECT {MESSAGE_COLUMNS} FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            ("session_0", window),
+        )
+        rows = await cursor.fetchall()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        [decode_message(*row) for row in rows]
+    decode = (time.perf_counter() - start) / repeat * 1000
+
+    history = SQLiteChatMessageHistory("session_0", db_path=db_path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await history._fetch_last_messages(window)
+    fetch = (time.perf_counter() - start) / repeat * 1000
+    return os.path.getsize(db_path) / count, payload, decode, fetch
+
+
+async def main(count: int, repeat: int) -> None:
+    messages = make_messages(count)
+    print(f"Messages: {count} in {SESSIONS} sessions, window: {settings.MEMORY_WINDOW_SIZE * 2}, repeat: {repeat}")
+    print(
+        f"{'format':>8} | {'bytes/message':>13} | {'payload bytes/message':>21} | "
+        f"{'decode/window (ms)':>18} | {'fetch/window (ms)':>17}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, to_row in (("legacy", legacy_row), ("compact", compact_row)):
+            db_path = str(Path(tmp_dir) / f"{name}.sqlite3")
+            await populate(db_path, messages, to_row)
+            size, payload, decode, fetch = await measure(db_path, count, repeat)
+            print(f"{name:>8} | {size:>13.0f} | {payload:>21.0f} | {decode:>18.3f} | {fetch:>17.3f}")
+        await close_all_pools()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.repeat))
@@ -0,0 +1,192 @@
+# benchmarks/bench_retrieval.py
+
+"""
+Compares dense, BM25 and hybrid retrieval on a fixed evaluation set.
+
+The evaluation corpus is a small portfolio knowledge base (`CORPUS`) and a
+list of questions (`QUESTIONS`), each with the section that answers it. Half
+of the questions name a technology or project, half paraphrase. The corpus is
+chunked with `MarkdownChunker` and indexed into a temporary Chroma store and
+a `BM25Index`, exactly as `create_vector_store` does.
+
+For each retriever the benchmark reports recall@k (the share of questions
+whose section is among the first k chunks) and the mean and p95 latency.
+
+By default the embeddings come from the configured embedding backend
+(EMBEDDING_BACKEND). `--embeddings hashing` uses the model-free
+hashing vectorizer instead, so the benchmark also runs offline; its dense
+scores are much weaker than a real model's.
+
+Usage:
+    python -m benchmarks.bench_retrieval [--embeddings configured|hashing] [--k 1 3 4] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from langchain_chroma import Chroma  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from app.core.chunking import MarkdownChunker  # noqa: E402
+from app.core.indexing import make_chunk_ids  # noqa: E402
+from app.core.lexical import BM25Index  # noqa: E402
+from app.core.local_embeddings import HashingEmbeddings  # noqa: E402
+from app.core.rag import create_http_client, get_embedding_model  # noqa: E402
+from app.core.retrieval import HybridRetriever  # noqa: E402
+from app.core.vector_store import AsyncVectorStore  # noqa: E402
+
+CORPUS = {
+    "about.md": """# Обо мне
+
+## Кто я
+Python backend-разработчик. Пишу асинхронные сервисы и ботов, внедряю LLM в бизнес-процессы.
+
+## Образование
+Окончил технический университет по специальности «Прикладная информатика». Регулярно прохожу курсы по машинному обучению.
+
+## Контакты
+Связаться со мной проще всего в Telegram или по электронной почте. Отвечаю в течение дня.
+""",
+    "projects.md": """# Проекты
+
+## PrimeNetworking
+Автоматизация бизнес-процессов для сети клиник: синхронизация расписаний, уведомления пациентам и отчёты для руководства. Интеграция с amoCRM через вебхуки.
+
+## Portfolio AI
+Telegram-бот на aiogram 3, который отвечает на вопросы о моём опыте. Ответы генерирует LLM через OpenRouter, контекст берётся из базы знаний.
+
+## Price Watcher
+Сервис мониторинга цен маркетплейсов. Парсинг на httpx и selectolax, очередь задач на Redis, хранение истории в PostgreSQL.
+
+## Docs Search
+Внутренний поиск по документации компании: гибридный поиск, эмбеддинги на sentence-transformers, интерфейс на FastAPI.
+""",
+    "skills.md": """# Навыки
+
+## Языки
+Python 3.12 — основной язык. Читаю код на Go и TypeScript.
+
+## Асинхронность
+asyncio, aiohttp, httpx, очереди задач и ограничение параллелизма. Люблю профилировать и ускорять медленные сервисы.
+
+## Базы данных
+PostgreSQL, SQLite, Redis, ChromaDB. Проектирую схемы и миграции, оптимизирую запросы.
+
+## Инфраструктура
+Docker, docker-compose, GitHub Actions, деплой на VPS с systemd и nginx.
+
+## Работа с LLM
+Промпт-инжиниринг, RAG, LangChain, оценка качества ответов и кэширование.
+""",
+}
+
+# (question, title of the section that answers it)
+QUESTIONS = [
+    ("Что такое PrimeNetworking?", "PrimeNetworking"),
+    ("Где ты использовал aiogram?", "Portfolio AI"),
+    ("Работал ли ты с amoCRM?", "PrimeNetworking"),
+    ("Для чего тебе нужен selectolax?", "Price Watcher"),
+    ("Какие проекты на sentence-transformers?", "Docs Search"),
+    ("Знаешь ли ты systemd и nginx?", "Инфраструктура"),
+    ("Какой у тебя опыт с ChromaDB?", "Базы данных"),
+    ("Где ты учился?", "Образование"),
+    ("Как с тобой связаться?", "Контакты"),
+    ("Делал ли ты бота, который рассказывает о тебе?", "Portfolio AI"),
+    ("Умеешь ли ты ускорять медленные программы?", "Асинхронность"),
+    ("Ты следил за стоимостью товаров в интернет-магазинах?", "Price Watcher"),
+]
+
+
+class LexicalRetriever(HybridRetriever):
+    """BM25 alone: the hybrid retriever without the dense ranking."""
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        return await self._fuse(query, [])
+
+
+def split_corpus() -> tuple[List[str], List[Document]]:
+    """Chunks the evaluation corpus like the indexer does, with the same chunk IDs."""
+    chunker = MarkdownChunker(max_tokens=96, min_tokens=8)
+    ids, chunks = [], []
+    for source, text in CORPUS.items():
+        file_chunks = chunker.split_documents([Document(page_content=text, metadata={"source": source})])
+        ids.extend(make_chunk_ids(source, file_chunks))
+        chunks.extend(file_chunks)
+    return ids, chunks
+
+
+def is_relevant(doc: Document, section: str) -> bool:
+    return section in doc.metadata.get("breadcrumb", "") or f"## {section}" in doc.page_content
+
+
+async def evaluate(name: str, retriever, ks: List[int], repeat: int) -> None:
+    """Runs every question `repeat` times and prints recall@k and latency."""
+    latencies: List[float] = []
+    hits = {k: 0 for k in ks}
+    for question, section in QUESTIONS:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = await retriever.ainvoke(question)
+            latencies.append(time.perf_counter() - start)
+        for k in ks:
+            hits[k] += any(is_relevant(doc, section) for doc in docs[:k])
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    recalls = " | ".join(f"{hits[k] / len(QUESTIONS):>8.2f}" for k in ks)
+    print(f"{name:>8} | {recalls} | {statistics.mean(latencies) * 1000:>8.1f} | {p95 * 1000:>7.1f}")
+
+
+async def main(embedding_mode: str, ks: List[int], repeat: int) -> None:
+    # Chroma warns on every query that asks for more results than the tiny corpus has.
+    logging.getLogger("chromadb").setLevel(logging.CRITICAL)
+    http_client = None
+    if embedding_mode == "configured":
+        http_client = create_http_client()
+        embeddings = get_embedding_model(async_client=http_client)
+    else:
+        embeddings = HashingEmbeddings()
+
+    ids, chunks = split_corpus()
+    max_k = max(ks)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vector_store = AsyncVectorStore(Chroma(persist_directory=tmp_dir, embedding_function=embeddings))
+            await vector_store.aadd_documents(ids, chunks)
+            lexical_index = BM25Index()
+            lexical_index.add(ids, [chunk.page_content for chunk in chunks])
+
+            retrievers = {
+                "dense": HybridRetriever(vector_store=vector_store, k=max_k),
+                "bm25": LexicalRetriever(vector_store=vector_store, lexical_index=lexical_index, k=max_k),
+                "hybrid": HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=max_k),
+            }
+
+            print(f"{len(chunks)} chunks, {len(QUESTIONS)} questions, {embedding_mode} embeddings")
+            header = " | ".join(f"{f'recall@{k}':>8}" for k in ks)
+            print(f"{'mode':>8} | {header} | {'mean ms':>8} | {'p95 ms':>7}")
+            for name, retriever in retrievers.items():
+                await evaluate(name, retriever, ks, repeat)
+            await vector_store.aclose()
+    finally:
+        if http_client is not None:
+            await http_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", choices=["configured", "hashing"], default="configured")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 4])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.embeddings, args.k, args.repeat))
@@ -0,0 +1,71 @@
+# benchmarks/bench_runtime.py
+
+"""
+Measures the per-query overhead of obtaining the RAG chain.
+
+Compares the old behaviour (building the chain, LLM clients, Chroma and a new
+HTTP client for every message) with the shared process-wide runtime.
+No network calls are made: only construction cost is measured.
+
+Usage:
+    python -m benchmarks.bench_runtime [--iterations 20]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from app.core import rag  # noqa: E402
+from app.core.chain import get_rag_chain  # noqa: E402
+from app.core.runtime import close_runtime, get_runtime, init_runtime  # noqa: E402
+
+
+async def bench_per_query_build(iterations: int) -> float:
+    """Returns the mean time in ms to build a fresh chain, as done per message before."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        get_rag_chain()
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1000
+
+
+async def bench_shared_runtime(iterations: int) -> tuple[float, float]:
+    """Returns (startup ms, mean per-query ms) for the shared runtime."""
+    start = time.perf_counter()
+    await init_runtime()
+    startup = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        get_runtime().rag_chain
+    per_query = (time.perf_counter() - start) / iterations * 1000
+
+    await close_runtime()
+    return startup, per_query
+
+
+async def main(iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rag.CHROMA_PERSIST_DIR = rag.Path(tmp_dir)
+
+        before = await bench_per_query_build(iterations)
+        startup, after = await bench_shared_runtime(iterations)
+
+    print(f"Iterations:                 {iterations}")
+    print(f"Before (build per query):   {before:10.3f} ms/query (+1 leaked HTTP client each)")
+    print(f"After  (shared runtime):    {after:10.6f} ms/query")
+    print(f"After  (one-time startup):  {startup:10.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,138 @@
+# benchmarks/bench_sqlite_pool.py
+
+"""
+Measures chat-history throughput (messages per second) with and without the
+shared SQLite connection pool.
+
+Each simulated turn does what the bot does for one user message: read the
+session history, write the question/answer pair and log a stats row.
+"Before" opens a new aiosqlite connection for every operation, as the code
+did originally; "after" uses `app.core.database.get_pool`.
+
+Usage:
+    python -m benchmarks.bench_sqlite_pool [--turns 500] [--sessions 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+import aiosqlite  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from app.core import stats  # noqa: E402
+from app.core.database import close_all_pools  # noqa: E402
+from app.core.memory import SQLiteChatMessageHistory  # noqa: E402
+
+CREATE_CHAT_HISTORY = """
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        message TEXT NOT NULL
+    );
+"""
+CREATE_QUERY_STATS = """
+    CREATE TABLE IF NOT EXISTS query_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        query_text TEXT NOT NULL,
+        retrieved_context TEXT,
+        llm_response TEXT,
+        timestamp DATETIME NOT NULL
+    );
+"""
+
+
+async def _legacy_execute(db_path: str, sql: str, params=(), fetch: bool = False):
+    """Opens a fresh connection for a single statement, like the original code."""
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(sql, params)
+        rows = await cursor.fetchall() if fetch else None
+        await db.commit()
+        return rows
+
+
+async def legacy_turn(db_path: str, session_id: str, turn: int) -> None:
+    """One user message with a connection per operation (the original behaviour)."""
+    await _legacy_execute(db_path, CREATE_CHAT_HISTORY)
+    await _legacy_execute(
+        db_path,
+        "SELECT message FROM chat_history WHERE session_id = ? ORDER BY id ASC",
+        (session_id,),
+        fetch=True,
+    )
+    await _legacy_execute(db_path, CREATE_QUERY_STATS)
+    await _legacy_execute(
+        db_path,
+        "INSERT INTO query_stats (user_id, query_text, timestamp) VALUES (?, ?, datetime('now'))",
+        (turn, f"question {turn}"),
+    )
+    await _legacy_execute(db_path, CREATE_CHAT_HISTORY)
+    for content in (f"question {turn}", f"answer {turn}"):
+        await _legacy_execute(
+            db_path,
+            "INSERT INTO chat_history (session_id, message) VALUES (?, ?)",
+            (session_id, json.dumps({"type": "human", "data": {"content": content}})),
+        )
+
+
+async def pooled_turn(db_path: str, session_id: str, turn: int) -> None:
+    """One user message through the shared pool."""
+    history = SQLiteChatMessageHistory(session_id=session_id, db_path=db_path)
+    await history.messages
+    await stats.log_query(
+        user_id=turn, username=None, first_name=None, last_name=None, query_text=f"question {turn}"
+    )
+    await history.add_messages(
+        [HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")]
+    )
+
+
+async def run(turn_fn, db_path: str, turns: int, sessions: int) -> float:
+    """Runs `turns` turns spread over `sessions` concurrent sessions; returns messages/sec."""
+
+    async def session_worker(index: int) -> None:
+        for turn in range(index, turns, sessions):
+            await turn_fn(db_path, f"session_{index}", turn)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session_worker(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    # Every turn stores a question and an answer.
+    return turns * 2 / elapsed
+
+
+async def main(turns: int, sessions: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_db = str(Path(tmp_dir) / "legacy.sqlite3")
+        pooled_db = str(Path(tmp_dir) / "pooled.sqlite3")
+        stats.CHAT_HISTORY_DB_PATH = pooled_db
+
+        before = await run(legacy_turn, legacy_db, turns, sessions)
+        after = await run(pooled_turn, pooled_db, turns, sessions)
+        await close_all_pools()
+
+    print(f"Turns: {turns}, concurrent sessions: {sessions}")
+    print(f"Before (connection per operation): {before:10.1f} messages/s")
+    print(f"After  (shared connection pool):   {after:10.1f} messages/s")
+    print(f"Speed-up:                          {after / before:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.sessions))
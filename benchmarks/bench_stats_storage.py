@@ -0,0 +1,121 @@
+# benchmarks/bench_stats_storage.py
+
+"""
+Compares the size and scan time of the query_stats table in the legacy and
+the compact storage format.
+
+"Legacy" stores every row's retrieved context and response inline, as
+`log_query` did originally. "Compact" is `insert_query_stats`: contexts are
+split into content-addressed chunks shared between rows and long responses
+are zlib-compressed. The contexts are drawn from a small pool of paragraphs,
+the way a knowledge base keeps returning the same sections.
+
+"Analytics" is a typical aggregate over the row metadata (questions and users
+per day); "full read" restores every row's context and response as text.
+
+Usage:
+    python -m benchmarks.bench_stats_storage [--rows 20000] [--paragraphs 200] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+# Dummy settings so the benchmark runs without a real .env file.
+os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_SERVICE_URL", "http://127.0.0.1:9/embed")
+
+from app.config import settings  # noqa: E402
+from app.core.database import close_all_pools, get_pool  # noqa: E402
+from app.core.database import vacuum  # noqa: E402
+from app.core.stats_storage import fetch_query_stats, insert_query_stats  # noqa: E402
+
+
+def make_rows(count: int, paragraphs: int) -> list[tuple]:
+    """Builds rows whose contexts are `RETRIEVAL_K` paragraphs out of a pool of `paragraphs`."""
+    rng = random.Random(0)
+    pool = [f"Раздел {i}. " + "Опыт работы с Python, FastAPI и PostgreSQL. " * 12 for i in range(paragraphs)]
+    rows = []
+    for i in range(count):
+        context = "\n\n".join(rng.sample(pool, settings.RETRIEVAL_K))
+        response = f"Ответ {i}.\n\n" + "Я работал над несколькими проектами, где использовал асинхронный Python. " * 15
+        timestamp = f"2024-01-{i % 28 + 1:02d} 12:00:00"
+        rows.append((i % 500, "user", "First", None, f"Вопрос {i}", context, response, timestamp))
+    return rows
+
+
+async def write_legacy(db_path: str, rows: list[tuple]) -> None:
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.executemany(
+            "INSERT INTO query_stats (user_id, username, first_name, last_name, query_text, "
+            "retrieved_context, llm_response, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+async def write_compact(db_path: str, rows: list[tuple]) -> None:
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await insert_query_stats(db, rows)
+
+
+ANALYTICS_QUERY = (
+    "SELECT date(timestamp), COUNT(*), COUNT(DISTINCT user_id), AVG(length(query_text)) "
+    "FROM query_stats GROUP BY date(timestamp)"
+)
+
+
+async def timed(db_path: str, read, repeat: int) -> float:
+    """Returns the mean duration of `read(db)` in milliseconds."""
+    pool = await get_pool(db_path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        async with pool.reader() as db:
+            await read(db)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def analytics(db) -> None:
+    cursor = await db.execute(ANALYTICS_QUERY)
+    await cursor.fetchall()
+
+
+async def main(row_count: int, paragraphs: int, repeat: int) -> None:
+    rows = make_rows(row_count, paragraphs)
+    print(f"Rows: {row_count}, distinct paragraphs: {paragraphs}, repeat: {repeat}")
+    print(
+        f"{'format':>8} | {'write (s)':>9} | {'file (MB)':>9} | {'bytes/row':>9} | "
+        f"{'analytics (ms)':>14} | {'full read (ms)':>14}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, write in (("legacy", write_legacy), ("compact", write_compact)):
+            db_path = str(Path(tmp_dir) / f"{name}.sqlite3")
+            start = time.perf_counter()
+            await write(db_path, rows)
+            write_seconds = time.perf_counter() - start
+            await vacuum(db_path)
+            size = os.path.getsize(db_path)
+            scan = await timed(db_path, analytics, repeat)
+            full_read = await timed(db_path, fetch_query_stats, repeat)
+            print(
+                f"{name:>8} | {write_seconds:>9.2f} | {size / 1e6:>9.2f} | "
+                f"{size / row_count:>9.0f} | {scan:>14.1f} | {full_read:>14.1f}"
+            )
+
+        await close_all_pools()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.paragraphs, args.repeat))
@@ -8,8 +8,16 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 
 from app.config import settings
+from app.core.database import close_all_pools
+from app.core.memory import history_cache
+from app.core.metrics import metrics
+from app.core.retention import stop_retention
+from app.core.runtime import close_runtime
+from app.core.startup import prepare_bot, prepare_rag
+from app.core.stats import stop_stats_writer
 from app.handlers import user_handlers
 from app.ui_commands import set_ui_commands
+from app.webhook import run_webhook
 
 
 class TelemetryFilter(logging.Filter):
@@ -24,8 +32,9 @@ class TelemetryFilter(logging.Filter):
 async def main() -> None:
     """
     Initializes and starts the Telegram bot.
-    This function sets up the bot and dispatcher, registers handlers (in the future),
-    and starts polling for updates from Telegram.
+    This function sets up the bot and dispatcher, registers handlers, and
+    receives updates from Telegram by long polling or, with BOT_MODE=webhook,
+    over a webhook.
     """
     # Configure logging first to ensure handlers and filters are set up correctly.
     logging.basicConfig(level=logging.INFO, stream=sys.stdout)
@@ -46,12 +55,38 @@ async def main() -> None:
     # Include the router in the dispatcher. This registers all handlers from the router.
     dp.include_router(user_handlers.router)
 
-    # Set the bot's UI commands (e.g., /start, /help) in the Telegram menu.
-    await set_ui_commands(bot)
+    rag_task = None
+    try:
+        # Open the databases; this is all the static commands need.
+        await prepare_bot()
 
-    # Start the polling process to receive updates from Telegram.
-    # This will run indefinitely until the process is stopped.
-    await dp.start_polling(bot)
+        # Load and warm up the RAG stack in the background, so updates are served
+        # right away. Questions that arrive before it is ready wait for it.
+        rag_task = asyncio.create_task(prepare_rag())
+
+        # Set the bot's UI commands (e.g., /start, /help) in the Telegram menu.
+        await set_ui_commands(bot)
+
+        # Receive updates from Telegram.
+        # This will run indefinitely until the process is stopped.
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            # Telegram refuses to serve getUpdates while a webhook is registered.
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        if rag_task is not None:
+            rag_task.cancel()
+            await asyncio.gather(rag_task, return_exceptions=True)
+        # Release the shared HTTP client, database connections and other resources.
+        await close_runtime()
+        await stop_retention()
+        # Write the queued query statistics before the connections are closed.
+        await stop_stats_writer()
+        await close_all_pools()
+        history_cache.publish_metrics()
+        logging.info(f"Metrics: {metrics.snapshot()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+# tests/conftest.py
+
+import pytest
+
+from app.core.database import close_all_pools
+from app.core.memory import history_cache
+
+
+@pytest.fixture(autouse=True)
+async def close_db_pools():
+    """
+    Closes the shared SQLite pools after every test.
+
+    Each test uses its own temporary database, and aiosqlite connections run on
+    non-daemon threads, so leaving them open would leak threads between tests.
+    """
+    yield
+    await close_all_pools()
+
+
+@pytest.fixture(autouse=True)
+def reset_history_cache():
+    """Starts every test with an empty history window cache and fresh counters."""
+    history_cache.clear()
+    yield
+    history_cache.clear()
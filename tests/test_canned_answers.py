@@ -0,0 +1,114 @@
+# tests/test_canned_answers.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.canned_answers import PREDEFINED_QUESTIONS, CannedAnswerStore
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Returns the path to a temporary database file."""
+    return str(tmp_path / "test_canned.sqlite3")
+
+
+@pytest.fixture
+def kb_version(monkeypatch):
+    """Controls the knowledge-base version seen by the store."""
+    state = {"version": "v1"}
+    monkeypatch.setattr(
+        "app.core.canned_answers.compute_knowledge_base_version", lambda: state["version"]
+    )
+    return state
+
+
+@pytest.fixture
+def rag_chain():
+    """A mock RAG chain that answers with the question it received."""
+    chain = MagicMock()
+    chain.ainvoke = AsyncMock(
+        side_effect=lambda inputs, config=None: {
+            "answer": f"answer to {inputs['question']}",
+            "context": "context",
+        }
+    )
+    return chain
+
+
+async def test_refresh_generates_every_answer_without_history(rag_chain, db_path, kb_version):
+    """Tests that warming generates one stateless answer per predefined question."""
+    store = CannedAnswerStore(rag_chain, db_path=db_path)
+
+    await store.refresh()
+
+    assert rag_chain.ainvoke.await_count == len(PREDEFINED_QUESTIONS)
+    for call in rag_chain.ainvoke.await_args_list:
+        assert call.args[0]["session_id"] is None
+    answer = store.get("about_me")
+    assert answer.answer == f"answer to {PREDEFINED_QUESTIONS['about_me']}"
+
+
+async def test_answers_are_persisted_across_restarts(rag_chain, db_path, kb_version):
+    """Tests that a new store reuses persisted answers instead of calling the LLM."""
+    await CannedAnswerStore(rag_chain, db_path=db_path).refresh()
+    rag_chain.ainvoke.reset_mock()
+
+    store = CannedAnswerStore(rag_chain, db_path=db_path)
+    await store.refresh()
+
+    rag_chain.ainvoke.assert_not_awaited()
+    assert store.get("hard_skills") is not None
+
+
+async def test_knowledge_base_change_invalidates_answers(rag_chain, db_path, kb_version):
+    """Tests that answers from an older knowledge-base version are not served."""
+    store = CannedAnswerStore(rag_chain, db_path=db_path)
+    await store.refresh()
+    rag_chain.ainvoke.reset_mock()
+
+    kb_version["version"] = "v2"
+    await store.refresh()
+
+    assert rag_chain.ainvoke.await_count == len(PREDEFINED_QUESTIONS)
+    assert store.get("soft_skills").kb_version == "v2"
+
+
+async def test_stats_report_hit_rate_and_latency_saved(rag_chain, db_path, kb_version):
+    """Tests the hit/miss counters and the accumulated latency saved."""
+    store = CannedAnswerStore(rag_chain, db_path=db_path)
+
+    # Nothing is warmed yet.
+    assert store.get("about_me") is None
+    await store.refresh()
+    answer = store.get("about_me")
+
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["latency_saved_seconds"] == pytest.approx(answer.generation_seconds, abs=1e-3)
+
+
+async def test_failed_generation_is_retried_later(rag_chain, db_path, kb_version):
+    """Tests that one failing question does not block the others and is retried."""
+    original = rag_chain.ainvoke.side_effect
+
+    async def flaky(inputs, config=None):
+        if inputs["question"] == PREDEFINED_QUESTIONS["about_me"]:
+            raise RuntimeError("LLM is down")
+        return original(inputs, config)
+
+    rag_chain.ainvoke.side_effect = flaky
+    store = CannedAnswerStore(rag_chain, db_path=db_path)
+    await store.refresh()
+
+    assert store.get("about_me") is None
+    assert store.get("hard_skills") is not None
+
+    rag_chain.ainvoke.side_effect = original
+    await store.refresh()
+    assert store.get("about_me") is not None
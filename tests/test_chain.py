@@ -0,0 +1,55 @@
+# tests/test_chain.py
+
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.chain import _get_async_chat_history
+from app.core.memory import SQLiteChatMessageHistory
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """
+    Provides a SQLite-backed history on a temporary database and makes
+    the chain's memory factory return it.
+    """
+    chat_history = SQLiteChatMessageHistory(
+        session_id="chain_session", db_path=str(tmp_path / "test_chain.sqlite3")
+    )
+    memory = MagicMock()
+    memory.chat_memory = chat_history
+    monkeypatch.setattr("app.core.chain.get_chat_memory", lambda session_id: memory)
+    return chat_history
+
+
+async def test_chat_history_is_windowed(history, monkeypatch):
+    """Tests that only the last MEMORY_WINDOW_SIZE turns are passed to the chain."""
+    monkeypatch.setattr("app.core.chain.settings.MEMORY_WINDOW_SIZE", 2)
+    for turn in range(5):
+        await history.add_messages(
+            [HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")]
+        )
+
+    result = await _get_async_chat_history({"session_id": "chain_session"})
+
+    assert [message.content for message in result["chat_history"]] == [
+        "question 3",
+        "answer 3",
+        "question 4",
+        "answer 4",
+    ]
+
+
+async def test_chat_history_disabled_window(history, monkeypatch):
+    """Tests that a zero window disables history entirely."""
+    monkeypatch.setattr("app.core.chain.settings.MEMORY_WINDOW_SIZE", 0)
+    await history.add_message(HumanMessage(content="ignored"))
+
+    result = await _get_async_chat_history({"session_id": "chain_session"})
+
+    assert result["chat_history"] == []
@@ -0,0 +1,80 @@
+# tests/test_chunking.py
+
+from langchain_core.documents import Document
+
+from app.core.chunking import MarkdownChunker, count_tokens
+
+DOCUMENT = """# Александр
+
+Python Backend Developer.
+
+## Проекты
+
+### PrimeNetworking
+Автоматизация бизнес-процессов.
+
+### Portfolio AI
+Telegram-бот с RAG.
+
+```python
+# not a heading
+```
+
+## Навыки
+- Python
+- asyncio
+"""
+
+
+def test_small_sections_are_merged_with_breadcrumbs():
+    """Tests that small related sections form one chunk with a common breadcrumb."""
+    chunker = MarkdownChunker(max_tokens=512, min_tokens=64, overlap_tokens=0)
+
+    chunks = chunker.split_text(DOCUMENT)
+
+    assert len(chunks) == 1
+    text, breadcrumb = chunks[0]
+    assert breadcrumb == "Александр"
+    assert "# not a heading" in text
+
+
+def test_sections_split_on_heading_hierarchy():
+    """Tests that sections that do not fit together are split at headings."""
+    body = "word " * 30
+    document = f"# Проекты\n## PrimeNetworking\n{body}\n## Portfolio AI\n{body}\n# Навыки\n{body}"
+    chunker = MarkdownChunker(max_tokens=count_tokens(body) + 20, min_tokens=0, overlap_tokens=0)
+
+    chunks = chunker.split_text(document)
+
+    assert [breadcrumb for _, breadcrumb in chunks] == [
+        "Проекты > PrimeNetworking",
+        "Проекты > Portfolio AI",
+        "Навыки",
+    ]
+    assert chunks[0][0].startswith("# Проекты\n\n## PrimeNetworking")
+
+
+def test_oversized_section_is_split_by_token_budget():
+    """Tests that a long section is split into pieces within the budget, each with its breadcrumb."""
+    chunker = MarkdownChunker(max_tokens=100, min_tokens=0, overlap_tokens=10)
+    text = "# Проекты\n## PrimeNetworking\n" + "Описание проекта. " * 200
+
+    documents = chunker.split_documents([Document(page_content=text, metadata={"source": "kb.md"})])
+
+    assert len(documents) > 3
+    assert all(count_tokens(doc.page_content) <= 100 for doc in documents)
+    assert all(doc.page_content.startswith("Проекты > PrimeNetworking\n\n") for doc in documents[1:])
+    assert documents[-1].metadata == {"source": "kb.md", "breadcrumb": "Проекты > PrimeNetworking"}
+
+
+def test_heading_only_section_moves_with_its_children():
+    """Tests that a heading with no text of its own starts the chunk of the section it introduces."""
+    body = "word " * 30
+    document = f"# Обо мне\n{body}\n# Проекты\n## PrimeNetworking\n{body}"
+    chunker = MarkdownChunker(max_tokens=count_tokens(body) + 20, min_tokens=10, overlap_tokens=0)
+
+    chunks = chunker.split_text(document)
+
+    assert [breadcrumb for _, breadcrumb in chunks] == ["Обо мне", "Проекты > PrimeNetworking"]
+    assert "# Проекты" not in chunks[0][0]
+    assert chunks[1][0].startswith("# Проекты\n\n## PrimeNetworking")
@@ -0,0 +1,113 @@
+# tests/test_concurrency.py
+
+import asyncio
+
+import pytest
+
+from app.core.concurrency import ConcurrencyLimiter, KeyedLocks, SingleFlight
+from app.core.metrics import metrics
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Starts every test with empty metrics."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+async def test_limiter_caps_concurrency_and_reports_queue_depth():
+    """Tests that no more than `limit` operations run at once and waiting ones are counted."""
+    limiter = ConcurrencyLimiter(2, "llm")
+    release = asyncio.Event()
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter:
+            peak = max(peak, limiter.in_flight)
+            await release.wait()
+
+    tasks = [asyncio.create_task(call()) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    gauges = metrics.snapshot()["gauges"]
+    assert gauges["llm_in_flight"] == 2
+    assert gauges["llm_waiting"] == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert peak == 2
+    assert metrics.snapshot()["gauges"]["llm_waiting"] == 0
+    assert metrics.snapshot()["gauges"]["llm_in_flight"] == 0
+
+
+async def test_keyed_locks_serialize_per_key_and_are_released():
+    """Tests that operations on one key run in order, other keys are not blocked and no lock is left behind."""
+    locks = KeyedLocks("chat_turns")
+    order = []
+    first_started = asyncio.Event()
+    release_first = asyncio.Event()
+
+    async def turn(key, name, wait=None):
+        async with locks.hold(key):
+            order.append(f"{name} start")
+            if wait is not None:
+                first_started.set()
+                await wait.wait()
+            order.append(f"{name} end")
+
+    first = asyncio.create_task(turn(1, "a1", wait=release_first))
+    await first_started.wait()
+    second = asyncio.create_task(turn(1, "a2"))
+    other = asyncio.create_task(turn(2, "b"))
+    await other
+    await asyncio.sleep(0.01)
+    assert metrics.snapshot()["gauges"]["chat_turns_waiting"] == 1
+
+    release_first.set()
+    await asyncio.gather(first, second)
+    assert order == ["a1 start", "b start", "b end", "a1 end", "a2 start", "a2 end"]
+    assert len(locks) == 0
+
+
+async def test_single_flight_shares_one_run():
+    """Tests that identical calls in flight run once and all get the result, and later calls run again."""
+    flight = SingleFlight("questions")
+    calls = 0
+    release = asyncio.Event()
+
+    async def answer():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return f"answer {calls}"
+
+    tasks = [asyncio.create_task(flight.run("q", answer)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == ["answer 1"] * 3
+    assert metrics.snapshot()["counters"]["questions_coalesced"] == 2
+    assert len(flight) == 0
+    assert await flight.run("q", answer) == "answer 2"
+
+
+async def test_single_flight_shares_errors():
+    """Tests that a failed run fails its duplicates too and is not cached."""
+    flight = SingleFlight("questions")
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise ConnectionError("LLM is down")
+
+    tasks = [asyncio.create_task(flight.run("q", failing)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(flight) == 0
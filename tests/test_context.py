@@ -0,0 +1,71 @@
+# tests/test_context.py
+
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+
+from app.config import settings
+from app.core.chunking import count_tokens
+from app.core.context import build_context, context_token_budget, merge_documents
+
+SENTENCE = "Александр разрабатывает асинхронные сервисы на Python и интегрирует LLM. "
+
+
+def test_overlapping_chunks_are_merged():
+    """Tests that adjacent chunks of one file are joined without repeating their overlap."""
+    text = "".join(f"{i}. {SENTENCE}" for i in range(6))
+    first, second = text[:250], text[180:]
+    docs = [
+        Document(page_content=second, metadata={"source": "about.md"}),
+        Document(page_content="Навыки: Python, asyncio.", metadata={"source": "skills.md"}),
+        Document(page_content=first, metadata={"source": "about.md"}),
+    ]
+
+    segments = merge_documents(docs)
+
+    assert segments == [text.strip(), "Навыки: Python, asyncio."]
+
+
+def test_breadcrumb_header_is_ignored_when_merging():
+    """Tests that pieces of a long section merge although each repeats the breadcrumb."""
+    header = "Проекты > Portfolio AI\n\n"
+    body = "".join(f"{i}. {SENTENCE}" for i in range(4))
+    docs = [
+        Document(page_content=header + body[:200], metadata={"source": "cv.md", "breadcrumb": "Проекты > Portfolio AI"}),
+        Document(page_content=header + body[150:], metadata={"source": "cv.md", "breadcrumb": "Проекты > Portfolio AI"}),
+        Document(page_content=header + body[60:120], metadata={"source": "cv.md", "breadcrumb": "Проекты > Portfolio AI"}),
+    ]
+
+    assert merge_documents(docs) == [header + body.strip()]
+
+
+def test_context_fits_budget_in_relevance_order():
+    """Tests that the most relevant segments are kept whole and the rest is trimmed."""
+    docs = [
+        Document(page_content=SENTENCE * 10, metadata={"source": f"doc_{i}.md"})
+        for i in range(5)
+    ]
+    budget = count_tokens(SENTENCE * 10) * 2 + 40
+
+    context = build_context(docs, budget)
+
+    assert count_tokens(context) <= budget
+    parts = context.split("\n\n")
+    assert parts[:2] == [(SENTENCE * 10).strip()] * 2
+    assert len(parts) == 3 and parts[2].endswith(".")
+    assert build_context(docs, 0) == ""
+
+
+def test_context_budget_leaves_room_for_history_and_answer(monkeypatch):
+    """Tests that the budget shrinks as the chat history grows."""
+    monkeypatch.setattr(settings, "MODEL_CONTEXT_TOKENS", 4096)
+    monkeypatch.setattr(settings, "CONTEXT_MAX_TOKENS", 2048)
+    monkeypatch.setattr(settings, "OPENROUTER_MAX_TOKENS", 1024)
+
+    assert context_token_budget("system", [], "вопрос") == 2048
+
+    history = [HumanMessage(content=SENTENCE * 10)] * 4
+    budget = context_token_budget("system", history, "вопрос")
+    assert 0 < budget < 2048
+    assert budget + count_tokens(SENTENCE * 10) * 4 + 1024 <= 4096
+
+    assert context_token_budget("system", history * 10, "вопрос") == 0
@@ -0,0 +1,99 @@
+# tests/test_database.py
+
+import sqlite3
+
+import pytest
+
+from app.core.database import SQLiteConnectionPool, close_all_pools, get_pool
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Returns the path to a temporary database file."""
+    return str(tmp_path / "test_pool.sqlite3")
+
+
+async def test_connections_are_configured(db_path):
+    """Tests that the pool applies WAL, synchronous=NORMAL and the busy timeout."""
+    pool = await get_pool(db_path)
+
+    async with pool.writer() as db:
+        journal_mode = await (await db.execute("PRAGMA journal_mode")).fetchone()
+        synchronous = await (await db.execute("PRAGMA synchronous")).fetchone()
+    async with pool.reader() as db:
+        busy_timeout = await (await db.execute("PRAGMA busy_timeout")).fetchone()
+
+    assert journal_mode[0] == "wal"
+    assert synchronous[0] == 1  # NORMAL
+    assert busy_timeout[0] == pool.busy_timeout_ms
+
+
+async def test_writer_commits_and_readers_see_changes(db_path):
+    """Tests that committed writes are visible through reader connections."""
+    pool = await get_pool(db_path)
+
+    async with pool.writer() as db:
+        await db.execute("CREATE TABLE items (value TEXT)")
+        await db.execute("INSERT INTO items VALUES ('a')")
+
+    async with pool.reader() as db:
+        rows = await (await db.execute("SELECT value FROM items")).fetchall()
+
+    assert [row[0] for row in rows] == ["a"]
+
+
+async def test_writer_rolls_back_on_error(db_path):
+    """Tests that a failing write block leaves no partial changes behind."""
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.execute("CREATE TABLE items (value TEXT)")
+
+    with pytest.raises(ValueError):
+        async with pool.writer() as db:
+            await db.execute("INSERT INTO items VALUES ('lost')")
+            raise ValueError("boom")
+
+    async with pool.reader() as db:
+        rows = await (await db.execute("SELECT value FROM items")).fetchall()
+    assert rows == []
+
+
+async def test_readers_are_query_only(db_path):
+    """Tests that reader connections refuse writes."""
+    pool = await get_pool(db_path)
+
+    async with pool.reader() as db:
+        with pytest.raises(sqlite3.OperationalError):
+            await db.execute("CREATE TABLE items (value TEXT)")
+
+
+async def test_get_pool_is_shared_per_path(db_path):
+    """Tests that the registry returns one pool per database file."""
+    first = await get_pool(db_path)
+    second = await get_pool(db_path)
+    assert first is second
+
+    await close_all_pools()
+    assert not first.is_open
+
+
+async def test_read_only_pool_has_no_writer(db_path):
+    """Tests that a read-only pool can read but never hands out the writer."""
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.execute("CREATE TABLE items (value TEXT)")
+
+    read_only_pool = SQLiteConnectionPool(db_path, pool_size=1, read_only=True)
+    try:
+        async with read_only_pool.reader() as db:
+            rows = await (await db.execute("SELECT value FROM items")).fetchall()
+        assert rows == []
+
+        with pytest.raises(RuntimeError):
+            async with read_only_pool.writer():
+                pass
+    finally:
+        await read_only_pool.close()
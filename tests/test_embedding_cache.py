@@ -0,0 +1,110 @@
+# tests/test_embedding_cache.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+def _fake_vector(text: str) -> list[float]:
+    """A deterministic 'embedding' that is exactly representable as float32."""
+    return [float(len(text)), 0.5]
+
+
+@pytest.fixture
+def inner_embeddings():
+    """A mock embedding model that records which texts it was asked to embed."""
+    embeddings = MagicMock(spec=Embeddings)
+    embeddings.aembed_documents = AsyncMock(side_effect=lambda texts: [_fake_vector(t) for t in texts])
+    embeddings.aembed_query = AsyncMock(side_effect=_fake_vector)
+    embeddings.embed_documents.side_effect = lambda texts: [_fake_vector(t) for t in texts]
+    return embeddings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """An embedding cache with a persistent tier in a temporary directory."""
+    cache = EmbeddingCache(max_entries=100, db_path=tmp_path / "embeddings.sqlite3")
+    yield cache
+    cache.close()
+
+
+async def test_repeated_query_skips_model(inner_embeddings, cache):
+    """Tests that a repeated query is served from the cache."""
+    cached = CachedEmbeddings(inner_embeddings, cache, namespace="model-a")
+
+    first = await cached.aembed_query("Какой у тебя стек?")
+    second = await cached.aembed_query("Какой у тебя стек?")
+
+    assert first == second
+    inner_embeddings.aembed_query.assert_awaited_once()
+    assert cache.stats()["memory_hits"] == 1
+
+
+async def test_documents_only_embed_missing_unique_texts(inner_embeddings, cache):
+    """Tests that only uncached texts are sent, and duplicates only once."""
+    cached = CachedEmbeddings(inner_embeddings, cache, namespace="model-a")
+    await cached.aembed_documents(["a", "bb"])
+
+    result = await cached.aembed_documents(["a", "ccc", "ccc", "bb"])
+
+    assert result == [_fake_vector(t) for t in ["a", "ccc", "ccc", "bb"]]
+    assert inner_embeddings.aembed_documents.await_args_list[-1].args[0] == ["ccc"]
+
+
+async def test_sync_path_shares_cache(inner_embeddings, cache):
+    """Tests that the synchronous methods read vectors cached by the async ones."""
+    cached = CachedEmbeddings(inner_embeddings, cache, namespace="model-a")
+    await cached.aembed_documents(["chunk"])
+
+    assert cached.embed_documents(["chunk"]) == [_fake_vector("chunk")]
+    inner_embeddings.embed_documents.assert_not_called()
+
+
+async def test_persistent_tier_survives_restart(inner_embeddings, tmp_path):
+    """Tests that vectors are reused from disk by a new cache instance."""
+    db_path = tmp_path / "embeddings.sqlite3"
+    first_cache = EmbeddingCache(max_entries=100, db_path=db_path)
+    await CachedEmbeddings(inner_embeddings, first_cache, namespace="model-a").aembed_documents(["chunk"])
+    first_cache.close()
+
+    second_cache = EmbeddingCache(max_entries=100, db_path=db_path)
+    try:
+        vectors = await CachedEmbeddings(
+            inner_embeddings, second_cache, namespace="model-a"
+        ).aembed_documents(["chunk"])
+    finally:
+        second_cache.close()
+
+    assert vectors == [_fake_vector("chunk")]
+    inner_embeddings.aembed_documents.assert_awaited_once()
+    assert second_cache.stats()["disk_hits"] == 1
+
+
+async def test_namespaces_and_kinds_do_not_mix(inner_embeddings, cache):
+    """Tests that vectors are not shared across models or between queries and documents."""
+    await CachedEmbeddings(inner_embeddings, cache, namespace="model-a").aembed_documents(["text"])
+
+    await CachedEmbeddings(inner_embeddings, cache, namespace="model-b").aembed_documents(["text"])
+    await CachedEmbeddings(inner_embeddings, cache, namespace="model-a").aembed_query("text")
+
+    assert inner_embeddings.aembed_documents.await_count == 2
+    inner_embeddings.aembed_query.assert_awaited_once()
+
+
+async def test_memory_tier_is_bounded(inner_embeddings):
+    """Tests that the in-memory tier evicts the least recently used vectors."""
+    cache = EmbeddingCache(max_entries=2, db_path=None)
+    cached = CachedEmbeddings(inner_embeddings, cache, namespace="model-a")
+
+    await cached.aembed_documents(["a", "b", "c"])
+
+    assert cache.stats()["memory_entries"] == 2
+    # "a" was evicted, so it has to be embedded again.
+    await cached.aembed_documents(["a"])
+    assert inner_embeddings.aembed_documents.await_args_list[-1].args[0] == ["a"]
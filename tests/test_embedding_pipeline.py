@@ -0,0 +1,102 @@
+# tests/test_embedding_pipeline.py
+
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+from app.core.embedding_pipeline import AdaptiveLimiter, EmbeddingPipeline, parse_retry_after
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+def make_documents(count: int) -> tuple[List[str], List[Document]]:
+    return [f"id-{i}" for i in range(count)], [Document(page_content=f"chunk {i}") for i in range(count)]
+
+
+def rate_limited_error(retry_after: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://stub/embed")
+    response = httpx.Response(429, headers={"Retry-After": retry_after}, request=request)
+    return httpx.HTTPStatusError("Too Many Requests", request=request, response=response)
+
+
+class StubService:
+    """Embeds texts after a short delay, rate limiting the first requests."""
+
+    def __init__(self, rate_limited_requests: int = 0):
+        self.rate_limited_requests = rate_limited_requests
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.calls <= self.rate_limited_requests:
+            raise rate_limited_error("0")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+
+async def test_pipeline_writes_every_chunk_concurrently():
+    """Tests that all chunks are written once and requests run concurrently."""
+    service = StubService()
+    written: dict[str, List[float]] = {}
+
+    async def write(ids, documents, vectors):
+        written.update(zip(ids, vectors))
+
+    limiter = AdaptiveLimiter(initial_batch_size=2, max_batch_size=4, max_concurrency=4, target_latency=1.0)
+    ids, documents = make_documents(50)
+    await EmbeddingPipeline(service.embed, write, limiter=limiter).run(zip(ids, documents))
+
+    assert set(written) == set(ids)
+    assert service.max_in_flight > 1
+    assert limiter.batch_size == 4
+
+
+async def test_pipeline_backs_off_on_rate_limit():
+    """Tests that 429 responses are retried and halve the concurrency."""
+    service = StubService(rate_limited_requests=2)
+    written: List[str] = []
+
+    async def write(ids, documents, vectors):
+        written.extend(ids)
+
+    limiter = AdaptiveLimiter(initial_batch_size=5, max_batch_size=5, max_concurrency=2, target_latency=1.0)
+    ids, documents = make_documents(20)
+    await EmbeddingPipeline(service.embed, write, limiter=limiter).run(zip(ids, documents))
+
+    assert sorted(written) == sorted(ids)
+    assert limiter.throttled == 2
+
+
+async def test_pipeline_raises_client_errors_and_writer_errors():
+    """Tests that non-retryable errors from either side stop the pipeline."""
+    request = httpx.Request("POST", "http://stub/embed")
+    bad_request = httpx.HTTPStatusError(
+        "Bad Request", request=request, response=httpx.Response(400, request=request)
+    )
+
+    async def failing_embed(texts):
+        raise bad_request
+
+    async def write(ids, documents, vectors):
+        raise RuntimeError("disk full")
+
+    ids, documents = make_documents(5)
+    with pytest.raises(httpx.HTTPStatusError):
+        await EmbeddingPipeline(failing_embed, write).run(zip(ids, documents))
+    with pytest.raises(RuntimeError, match="disk full"):
+        await EmbeddingPipeline(StubService().embed, write).run(zip(ids, documents))
+
+
+async def test_parse_retry_after():
+    """Tests parsing of numeric and missing Retry-After headers."""
+    assert parse_retry_after(rate_limited_error("2.5").response) == 2.5
+    assert parse_retry_after(httpx.Response(429), default=3.0) == 3.0
@@ -6,6 +6,8 @@
 полностью мокируются с помощью unittest.mock.
 """
 
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime
@@ -259,4 +261,197 @@ async def test_text_message_handler_parse_error_fallback(
     # `handle_message` корректно вызывает `process_query`.
     mock_process_query.return_value = None
     await user_handlers.handle_message(mock_message, mock_bot)
-    mock_process_query.assert_called_once()
\ No newline at end of file
+    mock_process_query.assert_called_once()
+
+@patch("app.handlers.user_handlers.log_query")
+@patch("app.handlers.user_handlers.get_chat_memory")
+@patch("app.handlers.user_handlers.init_runtime", new_callable=AsyncMock)
+async def test_process_query_serves_canned_answer(
+    mock_init_runtime, mock_get_chat_memory, mock_log_query, mock_bot, mock_message
+):
+    """Тестирует, что для предопределённого вопроса отдаётся готовый ответ без вызова LLM."""
+    # Настройка моков
+    canned_answer = MagicMock(answer="Готовый ответ", context="контекст")
+    mock_runtime = MagicMock()
+    mock_runtime.canned_answers.get.return_value = canned_answer
+    mock_runtime.rag_chain.ainvoke = AsyncMock()
+    mock_init_runtime.return_value = mock_runtime
+
+    mock_memory = MagicMock()
+    mock_memory.chat_memory.add_messages = AsyncMock()
+    mock_get_chat_memory.return_value = mock_memory
+
+    # Вызов функции
+    await user_handlers.process_query(
+        chat_id=mock_message.chat.id,
+        user_question="Представься локанично как человек",
+        bot=mock_bot,
+        message_to_answer=mock_message,
+        user=mock_message.from_user,
+        canned_action="about_me",
+    )
+
+    # Проверки: LLM не вызывался, ответ отправлен и сохранён в историю
+    mock_runtime.canned_answers.get.assert_called_once_with("about_me")
+    mock_runtime.rag_chain.ainvoke.assert_not_awaited()
+    mock_bot.send_chat_action.assert_not_awaited()
+    mock_message.answer.assert_called_once()
+    mock_memory.chat_memory.add_messages.assert_awaited_once()
+    assert mock_log_query.call_args.kwargs["llm_response"] == "Готовый ответ"
+
+
+@patch("app.handlers.user_handlers.log_query")
+@patch("app.handlers.user_handlers.get_chat_memory")
+@patch("app.handlers.user_handlers.init_runtime", new_callable=AsyncMock)
+async def test_process_query_streams_answer(
+    mock_init_runtime, mock_get_chat_memory, mock_log_query, mock_bot, mock_message, monkeypatch
+):
+    """Тестирует потоковый режим: заглушка редактируется по мере генерации, затем заменяется итоговым ответом."""
+    monkeypatch.setattr("app.handlers.user_handlers.settings.STREAM_RESPONSES", True)
+    monkeypatch.setattr("app.handlers.user_handlers.settings.STREAM_EDIT_INTERVAL", 0)
+    monkeypatch.setattr("app.handlers.user_handlers.settings.RESPONSE_AS_CODE_BLOCK", False)
+    monkeypatch.setattr("app.handlers.user_handlers.settings.SANITIZE_RESPONSE", True)
+
+    async def fake_astream(chain_input):
+        yield {"context": "контекст"}
+        yield {"answer": "При"}
+        yield {"answer": "вет"}
+
+    mock_runtime = MagicMock()
+    mock_runtime.rag_chain.astream = fake_astream
+    mock_init_runtime.return_value = mock_runtime
+
+    placeholder = MagicMock()
+    placeholder.edit_text = AsyncMock()
+    mock_message.answer.return_value = placeholder
+
+    mock_memory = MagicMock()
+    mock_memory.chat_memory.add_messages = AsyncMock()
+    mock_get_chat_memory.return_value = mock_memory
+
+    # Вызов функции
+    await user_handlers.process_query(
+        chat_id=mock_message.chat.id,
+        user_question="Какой у тебя стек?",
+        bot=mock_bot,
+        message_to_answer=mock_message,
+        user=mock_message.from_user,
+    )
+
+    # Проверки: отправлена одна заглушка, промежуточные правки без разметки, итог — в той же заглушке
+    mock_message.answer.assert_called_once()
+    edits = [call.args[0] for call in placeholder.edit_text.call_args_list]
+    assert edits[:2] == ["При", "Привет"]
+    assert placeholder.edit_text.call_args_list[0].kwargs["parse_mode"] is None
+    assert edits[-1] == user_handlers.sanitize_for_telegram_markdown("Привет")
+    assert mock_log_query.call_args.kwargs["llm_response"] == "Привет"
+    assert mock_log_query.call_args.kwargs["retrieved_context"] == "контекст"
+
+
+@patch("app.handlers.user_handlers.log_query")
+@patch("app.handlers.user_handlers.get_chat_memory")
+@patch("app.handlers.user_handlers.init_runtime", new_callable=AsyncMock)
+async def test_process_query_coalesces_duplicates_and_serializes_turns(
+    mock_init_runtime, mock_get_chat_memory, mock_log_query, mock_bot, mock_message, monkeypatch
+):
+    """
+    Тестирует, что повторный клик по кнопке не запускает цепочку второй раз,
+    а ходы одного чата выполняются по очереди: история сохраняется до начала следующего.
+    """
+    monkeypatch.setattr("app.handlers.user_handlers.settings.STREAM_RESPONSES", False)
+    release = asyncio.Event()
+    events = []
+
+    async def fake_ainvoke(chain_input):
+        events.append(f"start {chain_input['question']}")
+        await release.wait()
+        return {"answer": f"ответ на {chain_input['question']}", "context": None}
+
+    mock_runtime = MagicMock()
+    mock_runtime.canned_answers.get.return_value = None
+    mock_runtime.rag_chain.ainvoke = fake_ainvoke
+    mock_init_runtime.return_value = mock_runtime
+
+    async def fake_add_messages(messages):
+        events.append(f"saved {messages[0].content}")
+
+    mock_memory = MagicMock()
+    mock_memory.chat_memory.add_messages = fake_add_messages
+    mock_get_chat_memory.return_value = mock_memory
+
+    def ask(question):
+        return asyncio.create_task(
+            user_handlers.process_query(
+                chat_id=mock_message.chat.id,
+                user_question=question,
+                bot=mock_bot,
+                message_to_answer=mock_message,
+                user=mock_message.from_user,
+            )
+        )
+
+    # Двойной клик и следующий вопрос, пока первый ещё обрабатывается
+    tasks = [ask("Расскажи о проектах"), ask("Расскажи о проектах"), ask("Какой стек?")]
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(*tasks)
+
+    # Проверки: цепочка вызвана по разу на вопрос, ответ на дубликат не отправлялся повторно
+    assert events == [
+        "start Расскажи о проектах",
+        "saved Расскажи о проектах",
+        "start Какой стек?",
+        "saved Какой стек?",
+    ]
+    assert mock_message.answer.call_count == 2
+    assert len(user_handlers.chat_turns) == 0
+
+
+@patch("app.handlers.user_handlers.log_query")
+@patch("app.handlers.user_handlers.get_chat_memory")
+@patch("app.handlers.user_handlers.init_runtime", new_callable=AsyncMock)
+async def test_reset_waits_for_turn_in_flight(
+    mock_init_runtime, mock_get_chat_memory, mock_log_query, mock_bot, mock_message, monkeypatch
+):
+    """Тестирует, что /reset дожидается текущего хода чата и очищает историю уже после его сохранения."""
+    monkeypatch.setattr("app.handlers.user_handlers.settings.STREAM_RESPONSES", False)
+    release = asyncio.Event()
+    events = []
+
+    async def fake_ainvoke(chain_input):
+        await release.wait()
+        return {"answer": "ответ", "context": None}
+
+    mock_runtime = MagicMock()
+    mock_runtime.canned_answers.get.return_value = None
+    mock_runtime.rag_chain.ainvoke = fake_ainvoke
+    mock_init_runtime.return_value = mock_runtime
+
+    async def fake_add_messages(messages):
+        events.append("saved")
+
+    async def fake_clear():
+        events.append("cleared")
+
+    mock_memory = MagicMock()
+    mock_memory.chat_memory.add_messages = fake_add_messages
+    mock_memory.chat_memory.clear = fake_clear
+    mock_get_chat_memory.return_value = mock_memory
+
+    turn = asyncio.create_task(
+        user_handlers.process_query(
+            chat_id=mock_message.chat.id,
+            user_question="Какой стек?",
+            bot=mock_bot,
+            message_to_answer=mock_message,
+            user=mock_message.from_user,
+        )
+    )
+    await asyncio.sleep(0.01)
+    reset = asyncio.create_task(user_handlers.handle_reset(mock_message))
+    await asyncio.sleep(0.01)
+    assert events == []
+
+    release.set()
+    await asyncio.gather(turn, reset)
+    assert events == ["saved", "cleared"]
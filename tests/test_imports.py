@@ -0,0 +1,23 @@
+# tests/test_imports.py
+
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.bench_imports import FORBIDDEN_PACKAGES
+
+
+def test_handlers_do_not_import_the_rag_stack():
+    """Tests that the bot can start polling without importing LangChain, OpenAI or Chroma."""
+    code = (
+        "import sys, main\n"
+        f"print(sorted(name for name in {FORBIDDEN_PACKAGES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
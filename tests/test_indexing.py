@@ -0,0 +1,138 @@
+# tests/test_indexing.py
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.core import rag
+from app.core.indexing import (
+    INDEX_MANIFEST_FILENAME,
+    IndexManifest,
+    aiter_split_files,
+    iter_new_chunks,
+    plan_index_update,
+)
+from app.core.lexical import LEXICAL_INDEX_FILENAME, BM25Index
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake embeddings that count the texts they embed."""
+
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def knowledge_base(tmp_path, monkeypatch):
+    """Points the indexer at a temporary knowledge base and Chroma directory."""
+    kb_dir = tmp_path / "knowledge_base"
+    kb_dir.mkdir()
+    (kb_dir / "about.md").write_text("About me. " * 600, encoding="utf-8")
+    (kb_dir / "projects.md").write_text("Projects. " * 600, encoding="utf-8")
+    monkeypatch.setattr("app.core.rag.KNOWLEDGE_BASE_DIR", kb_dir)
+    monkeypatch.setattr("app.core.rag.CHROMA_PERSIST_DIR", tmp_path / "chroma_db")
+    return kb_dir
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """Replaces the embedding service with counting fake embeddings."""
+    fake = CountingEmbeddings()
+    monkeypatch.setattr("app.core.rag.get_embedding_model", lambda async_client=None: fake)
+    return fake
+
+
+async def plan_and_split(knowledge_base, previous):
+    """Plans an update and consumes its new chunks, like `create_vector_store` does."""
+    plan = plan_index_update(knowledge_base, previous, "model", "chunker")
+    new_chunks = [chunk async for chunk in iter_new_chunks(plan, knowledge_base, rag._split_file)]
+    return plan, [chunk_id for chunk_id, _ in new_chunks]
+
+
+async def test_plan_detects_new_changed_and_deleted_files(knowledge_base):
+    """Tests that only new and changed chunks are planned and stale chunks are deleted."""
+    first, first_ids = await plan_and_split(knowledge_base, None)
+    assert len(first_ids) > 2
+    assert first.delete_ids == []
+
+    unchanged, unchanged_ids = await plan_and_split(knowledge_base, first.manifest)
+    assert unchanged.is_empty
+    assert unchanged_ids == []
+    assert unchanged.unchanged_files == 2
+
+    (knowledge_base / "projects.md").unlink()
+    (knowledge_base / "about.md").write_text("About me. " * 600 + "New paragraph.", encoding="utf-8")
+    changed, changed_ids = await plan_and_split(knowledge_base, first.manifest)
+
+    old_about_ids = set(first.manifest.files["about.md"].chunk_ids)
+    new_about_ids = set(changed.manifest.files["about.md"].chunk_ids)
+    assert set(changed_ids) == new_about_ids - old_about_ids
+    assert set(changed.delete_ids) == (old_about_ids - new_about_ids) | set(
+        first.manifest.files["projects.md"].chunk_ids
+    )
+    assert "projects.md" not in changed.manifest.files
+
+
+async def test_split_files_in_process_pool(knowledge_base):
+    """Tests that files can be split in a process pool, in order."""
+    paths = sorted(knowledge_base.glob("*.md"))
+    with ProcessPoolExecutor(2) as executor:
+        results = [item async for item in aiter_split_files(paths, rag._split_file, executor)]
+
+    assert [path for path, _ in results] == paths
+    assert [chunks for _, chunks in results] == [rag._split_file(path) for path in paths]
+
+
+async def test_reindex_is_incremental(knowledge_base, embeddings):
+    """Tests that re-indexing embeds only changed chunks and never duplicates vectors."""
+    await rag.create_vector_store()
+    initial_count = len(embeddings.embedded)
+    manifest = IndexManifest.load(rag.CHROMA_PERSIST_DIR / INDEX_MANIFEST_FILENAME)
+    assert manifest is not None
+    indexed_ids = {i for entry in manifest.files.values() for i in entry.chunk_ids}
+    assert initial_count == len(indexed_ids)
+
+    # An unchanged corpus makes no embedding calls.
+    await rag.create_vector_store()
+    assert len(embeddings.embedded) == initial_count
+
+    # Deleting a file removes its chunks from the store.
+    (knowledge_base / "projects.md").unlink()
+    await rag.create_vector_store()
+    assert len(embeddings.embedded) == initial_count
+
+    vector_store = rag.get_vector_store(embeddings=embeddings)
+    stored_ids = set(vector_store.get()["ids"])
+    assert stored_ids == set(manifest.files["about.md"].chunk_ids)
+
+    # The lexical index follows the vector store and is rebuilt from it if missing.
+    lexical_path = rag.CHROMA_PERSIST_DIR / LEXICAL_INDEX_FILENAME
+    assert set(BM25Index.load(lexical_path)._documents) == stored_ids
+    lexical_path.unlink()
+    await rag.create_vector_store()
+    assert len(embeddings.embedded) == initial_count
+    assert set(BM25Index.load(lexical_path)._documents) == stored_ids
+
+
+async def test_chunker_change_resplits_unchanged_files(knowledge_base):
+    """Tests that new chunker settings re-split every file but reuse identical chunks."""
+    first, _ = await plan_and_split(knowledge_base, None)
+
+    plan = plan_index_update(knowledge_base, first.manifest, "model", "other chunker")
+    new_ids = [chunk_id async for chunk_id, _ in iter_new_chunks(plan, knowledge_base, rag._split_file)]
+
+    assert len(plan.changed_files) == 2
+    assert new_ids == []
+    assert plan.manifest.chunker == "other chunker"
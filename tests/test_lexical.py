@@ -0,0 +1,65 @@
+# tests/test_lexical.py
+
+from app.core.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = {
+    "bot": "Portfolio AI — Telegram-бот на aiogram с RAG и ChromaDB.",
+    "crm": "PrimeNetworking: автоматизация бизнес-процессов и интеграция CRM.",
+    "skills": "Навыки: Python, asyncio, FastAPI, SQLite, Docker. Python — основной язык.",
+    "about": "Backend-разработчик, люблю асинхронный Python.",
+}
+
+
+def make_index() -> BM25Index:
+    index = BM25Index()
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    return index
+
+
+def test_tokenize_keeps_identifiers():
+    """Tests that compound identifiers are kept whole and also split into parts."""
+    terms = tokenize("Telegram-бот на aiogram, C++ и python-telegram-bot.")
+
+    assert "aiogram" in terms
+    assert "c++" in terms
+    assert {"python-telegram-bot", "python", "telegram", "bot"} <= set(terms)
+    assert {"telegram-бот", "бот"} <= set(terms)
+
+
+def test_search_ranks_exact_terms():
+    """Tests that rare exact terms decide the ranking and unrelated chunks are skipped."""
+    index = make_index()
+
+    assert index.search("Где использовался aiogram?", k=3)[0][0] == "bot"
+    assert [doc_id for doc_id, _ in index.search("primenetworking", k=3)] == ["crm"]
+    # "Python" occurs twice in "skills", so it outranks the single mention in "about".
+    assert [doc_id for doc_id, _ in index.search("Python", k=3)] == ["skills", "about"]
+    assert index.search("Kubernetes", k=3) == []
+
+
+def test_remove_and_persistence(tmp_path):
+    """Tests that removed chunks disappear and the index survives a save/load round trip."""
+    index = make_index()
+    index.remove(["bot", "unknown"])
+    index.add(["crm"], ["CRM на aiogram"])
+
+    path = tmp_path / "bm25_index.json"
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert len(loaded) == 3
+    assert loaded.search("aiogram", k=3) == index.search("aiogram", k=3)
+    assert [doc_id for doc_id, _ in loaded.search("aiogram", k=3)] == ["crm"]
+    assert loaded.search("primenetworking", k=3) == []
+
+    path.write_text("{broken", encoding="utf-8")
+    assert BM25Index.load(path) is None
+    assert BM25Index.load(tmp_path / "missing.json") is None
+
+
+def test_reciprocal_rank_fusion():
+    """Tests that IDs ranked by both retrievers come first."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "a"]])
+
+    assert fused[:2] == ["a", "c"]
+    assert set(fused) == {"a", "b", "c", "d"}
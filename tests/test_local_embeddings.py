@@ -0,0 +1,101 @@
+# tests/test_local_embeddings.py
+
+import numpy as np
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from app.config import settings
+from app.core.embedding_cache import CachedEmbeddings
+from app.core.local_embeddings import HashingEmbeddings, OnnxEmbeddings
+from app.core.rag import get_embedding_model, get_embedding_namespace, preload_embedding_model
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, ":": 2, "query": 3, "passage": 4, "python": 5, "aiogram": 6, "bot": 7}
+
+
+class FakeSession:
+    """Stands in for an ONNX Runtime session: token embeddings are rows of a fixed table."""
+
+    def __init__(self, model_path, providers):
+        self.table = np.random.default_rng(0).normal(size=(len(VOCAB), 8)).astype(np.float32)
+
+    def get_inputs(self):
+        class Input:
+            def __init__(self, name):
+                self.name = name
+
+        return [Input("input_ids"), Input("attention_mask")]
+
+    def run(self, output_names, inputs):
+        return [self.table[inputs["input_ids"]]]
+
+
+@pytest.fixture
+def onnx_model(tmp_path, monkeypatch):
+    """Writes a word-level tokenizer and replaces ONNX Runtime with `FakeSession`."""
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    (tmp_path / "onnx").mkdir()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    monkeypatch.setattr("onnxruntime.InferenceSession", FakeSession)
+    return tmp_path / "onnx" / "model_quantized.onnx"
+
+
+async def test_hashing_embeddings_are_deterministic_and_normalized():
+    """Tests that the hashing vectorizer gives stable unit vectors that reflect shared words."""
+    embeddings = HashingEmbeddings(dimensions=256)
+
+    first, again, related, unrelated = await embeddings.aembed_documents(
+        ["Telegram-бот на aiogram", "Telegram-бот на aiogram", "бот на aiogram 3", "PostgreSQL и Redis"]
+    )
+
+    assert first == again
+    assert len(first) == 256
+    assert np.linalg.norm(first) == pytest.approx(1.0)
+    assert np.dot(first, related) > np.dot(first, unrelated)
+
+
+async def test_onnx_embeddings_mean_pool_without_padding(onnx_model):
+    """Tests prefixes, batching and that padding does not change a text's vector."""
+    embeddings = OnnxEmbeddings(onnx_model, query_prefix="query: ", document_prefix="passage: ", batch_size=2)
+
+    alone = (await embeddings.aembed_documents(["python"]))[0]
+    batch = await embeddings.aembed_documents(["python", "python aiogram bot", "bot"])
+    query = await embeddings.aembed_query("python")
+
+    table = embeddings._session.table
+    expected = table[[VOCAB["passage"], VOCAB[":"], VOCAB["python"]]].mean(axis=0)
+    assert alone == pytest.approx((expected / np.linalg.norm(expected)).tolist(), abs=1e-6)
+    assert batch[0] == pytest.approx(alone, abs=1e-6)
+    assert len(batch) == 3
+    assert query != pytest.approx(alone, abs=1e-6)
+
+
+async def test_backend_selection_and_preload(onnx_model, monkeypatch):
+    """Tests that the configured backend is built, cached under its own namespace and preloaded."""
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_NAMESPACE", None)
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "hashing")
+    assert isinstance(get_embedding_model(), HashingEmbeddings)
+    assert get_embedding_namespace() == f"hashing:{settings.EMBEDDING_DIMENSIONS}"
+
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "api")
+    monkeypatch.setattr(settings, "EMBEDDING_SERVICE_URL", None)
+    with pytest.raises(ValueError):
+        get_embedding_model()
+
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL_PATH", str(onnx_model))
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PERSIST", False)
+    embeddings = get_embedding_model()
+    assert isinstance(embeddings, CachedEmbeddings)
+    assert embeddings.namespace == f"onnx:{onnx_model}"
+    assert embeddings.embeddings._session is None
+
+    await preload_embedding_model(embeddings)
+    assert embeddings.embeddings._session is not None
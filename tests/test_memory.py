@@ -1,9 +1,15 @@
 # tests/test_memory.py
 
+import json
+
+import aiosqlite
 import pytest
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, message_to_dict
 
-from app.core.memory import SQLiteChatMessageHistory
+from app.core.database import get_pool
+from app.core.memory import SessionWindowCache, SQLiteChatMessageHistory, history_cache
+from app.core.metrics import metrics
+from app.core.migrations import SCHEMA_MIGRATIONS, run_migrations
 
 # Mark all tests in this file as asyncio
 pytestmark = pytest.mark.asyncio
@@ -113,4 +119,139 @@ async def test_non_ascii_characters(isolated_db_path):
 
     retrieved_messages = await history.messages
     assert len(retrieved_messages) == 1
-    assert retrieved_messages[0].content == cyrillic_message
\ No newline at end of file
+    assert retrieved_messages[0].content == cyrillic_message
+
+async def test_get_last_messages_returns_window_in_order(isolated_db_path):
+    """
+    Tests that get_last_messages returns only the most recent messages,
+    in chronological order.
+    """
+    history = SQLiteChatMessageHistory(session_id="session_window", db_path=isolated_db_path)
+    await history.add_messages([HumanMessage(content=f"message {i}") for i in range(10)])
+
+    window = await history.get_last_messages(3)
+    assert [message.content for message in window] == ["message 7", "message 8", "message 9"]
+
+    # A window larger than the history returns everything.
+    assert len(await history.get_last_messages(100)) == 10
+    # A non-positive window returns nothing.
+    assert await history.get_last_messages(0) == []
+
+
+async def test_window_cache_serves_repeated_loads(isolated_db_path, monkeypatch):
+    """
+    Tests that after the first load, windows are served from the cache and
+    kept up to date by add_messages without touching the database.
+    """
+    history = SQLiteChatMessageHistory(session_id="session_cached", db_path=isolated_db_path)
+    await history.add_messages([HumanMessage(content="q1"), AIMessage(content="a1")])
+
+    # The first load is a miss and populates the cache.
+    assert [m.content for m in await history.get_last_messages(2)] == ["q1", "a1"]
+    assert history_cache.stats()["misses"] == 1
+
+    # Writes go through to the cached window...
+    await history.add_messages([HumanMessage(content="q2"), AIMessage(content="a2")])
+
+    # ...so the next load needs no database round-trip at all.
+    async def fail_get_pool(*args, **kwargs):
+        raise AssertionError("The database must not be queried on a cache hit")
+
+    monkeypatch.setattr("app.core.memory.get_pool", fail_get_pool)
+    window = await history.get_last_messages(4)
+    assert [m.content for m in window] == ["q1", "a1", "q2", "a2"]
+    assert history_cache.stats()["hits"] == 1
+
+    # The counters reach the metrics logged on shutdown.
+    history_cache.publish_metrics()
+    gauges = metrics.snapshot()["gauges"]
+    assert gauges["history_cache_hits"] == 1
+    assert gauges["history_cache_misses"] == 1
+    assert gauges["history_cache_hit_rate"] == 0.5
+    assert gauges["history_cache_entries"] == 1
+
+
+async def test_window_cache_invalidated_on_clear(isolated_db_path):
+    """Tests that clearing the history also drops the cached window."""
+    history = SQLiteChatMessageHistory(session_id="session_reset", db_path=isolated_db_path)
+    await history.add_message(HumanMessage(content="forget me"))
+    assert len(await history.get_last_messages(2)) == 1
+
+    await history.clear()
+
+    assert await history.get_last_messages(2) == []
+    assert history_cache.stats()["hits"] == 0
+
+
+async def test_window_cache_lru_eviction():
+    """Tests that the cache evicts least recently used sessions to fit its budgets."""
+    cache = SessionWindowCache(max_entries=2, max_bytes=10)
+
+    cache.put(("db", "a"), [HumanMessage(content="aaa")], cache.generation)
+    cache.put(("db", "b"), [HumanMessage(content="bbb")], cache.generation)
+    # Touch "a" so that "b" becomes the least recently used entry.
+    assert cache.get(("db", "a")) is not None
+    cache.put(("db", "c"), [HumanMessage(content="ccc")], cache.generation)
+
+    assert cache.get(("db", "b")) is None
+    assert cache.get(("db", "a")) is not None
+
+    # A large window pushes out older entries to stay within the byte budget.
+    cache.put(("db", "d"), [HumanMessage(content="dddddddd")], cache.generation)
+    assert cache.stats()["bytes"] <= 10
+    assert cache.stats()["evictions"] >= 2
+
+
+async def test_window_cache_skips_stale_loads():
+    """Tests that a window loaded before a concurrent write is not cached."""
+    cache = SessionWindowCache(max_entries=10, max_bytes=1000)
+    generation = cache.generation
+
+    # A write happens while the window is being loaded from the database.
+    cache.append(("db", "a"), [HumanMessage(content="new")], capacity=4)
+    cache.put(("db", "a"), [HumanMessage(content="old")], generation)
+
+    assert cache.get(("db", "a")) is None
+
+
+async def test_messages_are_stored_in_typed_columns(isolated_db_path):
+    """Tests that plain messages use the role/content columns and others keep all their fields."""
+    history = SQLiteChatMessageHistory(session_id="compact", db_path=isolated_db_path)
+    messages = [
+        HumanMessage(content="Вопрос"),
+        AIMessage(content="Ответ", id="run-1", response_metadata={"model_name": "test"}),
+        SystemMessage(content="Системное сообщение"),
+    ]
+    await history.add_messages(messages)
+
+    async with aiosqlite.connect(isolated_db_path) as db:
+        cursor = await db.execute("SELECT role, content, extras IS NOT NULL, message FROM chat_history ORDER BY id")
+        rows = await cursor.fetchall()
+
+    assert rows[0] == ("human", "Вопрос", 0, None)
+    assert rows[1][:3] == ("ai", "Ответ", 1) and rows[1][3] is None
+    assert rows[2][0] is None and json.loads(rows[2][3])["type"] == "system"
+    assert await history.messages == messages
+
+
+async def test_legacy_json_rows_survive_the_compact_format_migration(isolated_db_path):
+    """Tests that rows written as JSON before migration 5 are still read and their ids are never reused."""
+    async with aiosqlite.connect(isolated_db_path) as db:
+        await run_migrations(db, tuple(m for m in SCHEMA_MIGRATIONS if m.version < 5))
+        legacy_messages = [HumanMessage(content="old q"), AIMessage(content="old a")]
+        await db.executemany(
+            "INSERT INTO chat_history (session_id, message) VALUES (?, ?)",
+            [("legacy", json.dumps(message_to_dict(m))) for m in legacy_messages] + [("other", "{}")],
+        )
+        await db.execute("DELETE FROM chat_history WHERE session_id = 'other'")
+        await db.commit()
+
+    history = SQLiteChatMessageHistory(session_id="legacy", db_path=isolated_db_path)
+    await history.add_message(HumanMessage(content="new q"))
+
+    assert [m.content for m in await history.messages] == ["old q", "old a", "new q"]
+    pool = await get_pool(isolated_db_path)
+    async with pool.reader() as db:
+        new_id = (await (await db.execute("SELECT MAX(id) FROM chat_history")).fetchone())[0]
+    assert new_id == 4
+
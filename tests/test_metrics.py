@@ -0,0 +1,24 @@
+# tests/test_metrics.py
+
+from app.core.metrics import Metrics
+
+
+def test_counters_gauges_and_timings():
+    """Tests that the registry aggregates counters, gauges and timing percentiles."""
+    registry = Metrics(window=10)
+    registry.increment("requests")
+    registry.increment("requests", 2)
+    registry.set_gauge("queue_depth", 5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        registry.observe("latency", seconds)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot["counters"] == {"requests": 3}
+    assert snapshot["gauges"] == {"queue_depth": 5}
+    assert snapshot["timings"]["latency"]["count"] == 4
+    assert snapshot["timings"]["latency"]["p50"] == 0.3
+    assert snapshot["timings"]["latency"]["max"] == 0.4
+
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "timings": {}}
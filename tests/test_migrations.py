@@ -0,0 +1,72 @@
+# tests/test_migrations.py
+
+import aiosqlite
+import pytest
+
+from app.core.database import get_pool
+from app.core.migrations import SCHEMA_MIGRATIONS
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+LATEST_VERSION = max(migration.version for migration in SCHEMA_MIGRATIONS)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Returns the path to a temporary database file."""
+    return str(tmp_path / "test_migrations.sqlite3")
+
+
+async def _fetch_names(db_path: str, kind: str) -> set[str]:
+    """Returns the names of all schema objects of the given kind."""
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))
+        return {row[0] for row in await cursor.fetchall()}
+
+
+async def test_fresh_database_is_migrated(db_path):
+    """Tests that opening a pool creates the tables, indexes and schema version."""
+    pool = await get_pool(db_path)
+
+    async with pool.reader() as db:
+        version = (await (await db.execute("PRAGMA user_version")).fetchone())[0]
+
+    assert version == LATEST_VERSION
+    assert {"chat_history", "query_stats"} <= await _fetch_names(db_path, "table")
+    assert {
+        "idx_chat_history_session_id",
+        "idx_query_stats_user_timestamp",
+    } <= await _fetch_names(db_path, "index")
+
+
+async def test_legacy_database_is_adopted(db_path):
+    """Tests that a database created before migrations keeps its rows and gains indexes."""
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute(
+            "CREATE TABLE chat_history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "session_id TEXT NOT NULL, message TEXT NOT NULL)"
+        )
+        await db.execute("INSERT INTO chat_history (session_id, message) VALUES ('s', '{}')")
+        await db.commit()
+
+    pool = await get_pool(db_path)
+
+    async with pool.reader() as db:
+        rows = await (await db.execute("SELECT session_id FROM chat_history")).fetchall()
+    assert rows == [("s",)]
+    assert "idx_chat_history_session_id" in await _fetch_names(db_path, "index")
+
+
+async def test_history_lookup_uses_index(db_path):
+    """Tests that the per-session history query no longer scans the whole table."""
+    pool = await get_pool(db_path)
+
+    async with pool.reader() as db:
+        cursor = await db.execute(
+            "EXPLAIN QUERY PLAN SELECT message FROM chat_history WHERE session_id = ? ORDER BY id ASC",
+            ("s",),
+        )
+        plan = " ".join(row[-1] for row in await cursor.fetchall())
+
+    assert "idx_chat_history_session_id" in plan
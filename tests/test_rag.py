@@ -1,6 +1,5 @@
 # tests/test_rag.py
 
-import asyncio
 from unittest.mock import AsyncMock
 
 import pytest
@@ -8,7 +7,7 @@ import httpx
 from langchain_core.documents import Document
 
 # Import the private function we want to test
-from app.core.rag import _load_and_split_documents, ApiServiceEmbeddings
+from app.core.rag import _load_and_split_documents, ApiServiceEmbeddings, compute_knowledge_base_version
 
 @pytest.fixture
 def temp_knowledge_base(tmp_path, monkeypatch):
@@ -62,10 +61,7 @@ async def test_api_service_embeddings_success():
     mock_client.post.return_value = mock_response
 
     # 2. Initialize the class with the mock client
-    loop = asyncio.get_running_loop()
-    embeddings_service = ApiServiceEmbeddings(
-        api_url="http://fake-url/embed", async_client=mock_client, loop=loop
-    )
+    embeddings_service = ApiServiceEmbeddings(api_url="http://fake-url/embed", async_client=mock_client)
 
     # 3. Test aembed_documents
     texts = ["hello", "world"]
@@ -90,11 +86,53 @@ async def test_api_service_embeddings_http_error():
     )
 
     # 2. Initialize the class with the mock client
-    loop = asyncio.get_running_loop()
-    embeddings_service = ApiServiceEmbeddings(
-        api_url="http://fake-url/embed", async_client=mock_client, loop=loop
-    )
+    embeddings_service = ApiServiceEmbeddings(api_url="http://fake-url/embed", async_client=mock_client)
 
     # 3. Assert that the correct exception is raised
     with pytest.raises(httpx.HTTPStatusError):
-        await embeddings_service.aembed_documents(["test text"])
\ No newline at end of file
+        await embeddings_service.aembed_documents(["test text"])
+
+def test_api_service_embeddings_sync_calls(monkeypatch):
+    """
+    Tests that the sync methods call the API with a blocking request
+    instead of going through the event loop.
+    """
+    calls = []
+
+    def fake_post(url, json, timeout):
+        calls.append((url, json))
+        vectors = [[0.5, 0.5]] * len(json["texts"])
+        return httpx.Response(200, json={"embeddings": vectors}, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(httpx, "post", fake_post)
+    embeddings_service = ApiServiceEmbeddings(api_url="http://fake-url/embed", async_client=AsyncMock())
+
+    assert embeddings_service.embed_query("test text") == [0.5, 0.5]
+    assert embeddings_service.embed_documents(["a", "b"]) == [[0.5, 0.5], [0.5, 0.5]]
+    assert calls == [
+        ("http://fake-url/embed", {"texts": ["test text"]}),
+        ("http://fake-url/embed", {"texts": ["a", "b"]}),
+    ]
+
+
+def test_knowledge_base_version_follows_the_index_not_the_sources(temp_knowledge_base, tmp_path, monkeypatch):
+    """
+    Tests that editing the markdown sources leaves the version unchanged until
+    they are indexed, and that a new manifest or lexical index changes it.
+    """
+    index_dir = tmp_path / "chroma_db"
+    index_dir.mkdir()
+    monkeypatch.setattr("app.core.rag.CHROMA_PERSIST_DIR", index_dir)
+    (index_dir / "index_manifest.json").write_text('{"files": {"sample.md": "v1"}}', encoding="utf-8")
+    version = compute_knowledge_base_version()
+
+    (temp_knowledge_base / "sample.md").write_text("Edited but not indexed yet.", encoding="utf-8")
+    assert compute_knowledge_base_version() == version
+
+    (index_dir / "index_manifest.json").write_text('{"files": {"sample.md": "v2"}}', encoding="utf-8")
+    reindexed = compute_knowledge_base_version()
+    assert reindexed != version
+
+    (index_dir / "bm25_index.json").write_text("{}", encoding="utf-8")
+    assert compute_knowledge_base_version() != reindexed
+
@@ -0,0 +1,107 @@
+# tests/test_retention.py
+
+from datetime import datetime, timezone
+
+import aiosqlite
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.config import settings
+from app.core import retention
+from app.core.memory import SQLiteChatMessageHistory, history_cache
+from app.core.retention import apply_retention, load_archived_messages
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    """Returns temporary chat history and archive paths, with a memory window of 2 turns (4 messages)."""
+    monkeypatch.setattr(settings, "MEMORY_WINDOW_SIZE", 2)
+    return str(tmp_path / "chat_history.sqlite3"), str(tmp_path / "chat_archive.sqlite3")
+
+
+async def add_turns(db_path: str, session_id: str, count: int) -> list:
+    """Adds `count` question/answer pairs to a session and returns the messages."""
+    messages = []
+    for i in range(count):
+        messages += [HumanMessage(content=f"{session_id} question {i}"), AIMessage(content=f"{session_id} answer {i}")]
+    await SQLiteChatMessageHistory(session_id, db_path=db_path).add_messages(messages)
+    return messages
+
+
+async def test_count_limit_archives_old_messages_and_frees_pages(paths):
+    """Tests that only the newest messages of a long session stay in the table and the rest are archived in order."""
+    db_path, archive_path = paths
+    long_session = await add_turns(db_path, "long", 15)
+    short_session = await add_turns(db_path, "short", 2)
+    history = SQLiteChatMessageHistory("long", db_path=db_path)
+    await history.get_last_messages(4)
+
+    report = await apply_retention(db_path, archive_path, max_age_days=0, max_messages=10, batch_size=7, now=NOW)
+
+    assert report.sessions == 1
+    assert report.archived == 20
+    assert [m.content for m in await history.messages] == [m.content for m in long_session[-10:]]
+    assert [m.content for m in await load_archived_messages("long", archive_path)] == [
+        m.content for m in long_session[:20]
+    ]
+    assert len(await SQLiteChatMessageHistory("short", db_path=db_path).messages) == len(short_session)
+    # The cached window of the pruned session was dropped.
+    assert history_cache.stats()["entries"] == 0
+
+    async with aiosqlite.connect(db_path) as db:
+        auto_vacuum = (await (await db.execute("PRAGMA auto_vacuum")).fetchone())[0]
+        free_pages = (await (await db.execute("PRAGMA freelist_count")).fetchone())[0]
+    assert auto_vacuum == 2
+    assert free_pages == 0
+
+
+async def test_age_limit_keeps_recent_messages_and_never_cuts_the_window(paths):
+    """Tests that messages past the age limit are archived except the window, and a count limit is raised to it."""
+    db_path, archive_path = paths
+    old_session = await add_turns(db_path, "old", 3)
+    await add_turns(db_path, "recent", 4)
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute("UPDATE chat_history SET created_at = '2024-01-01 00:00:00' WHERE session_id = 'old'")
+        await db.execute("UPDATE chat_history SET created_at = '2024-05-30 00:00:00' WHERE session_id = 'recent'")
+        await db.commit()
+
+    report = await apply_retention(db_path, archive_path, max_age_days=30, max_messages=1, now=NOW)
+
+    assert report.archived == 2 + 4
+    # The idle session keeps its memory window even though every message is old.
+    assert [m.content for m in await SQLiteChatMessageHistory("old", db_path=db_path).messages] == [
+        m.content for m in old_session[-4:]
+    ]
+    assert len(await load_archived_messages("old", archive_path)) == 2
+    assert len(await SQLiteChatMessageHistory("recent", db_path=db_path).messages) == 4
+
+
+async def test_interrupted_run_does_not_archive_twice(paths, monkeypatch):
+    """Tests that a batch archived before the process died is only deleted by the next run."""
+    db_path, archive_path = paths
+    messages = await add_turns(db_path, "chat", 5)
+    original_get_pool = retention.get_pool
+
+    with monkeypatch.context() as patch:
+        async def get_pool_without_hot_writer(path, **kwargs):
+            pool = await original_get_pool(path, **kwargs)
+            if str(path) == db_path:
+                # The archive commits, then deleting from the hot table fails.
+                patch.setattr(pool, "writer", None)
+            return pool
+
+        patch.setattr(retention, "get_pool", get_pool_without_hot_writer)
+        with pytest.raises(TypeError):
+            await apply_retention(db_path, archive_path, max_age_days=0, max_messages=4, now=NOW)
+
+    await apply_retention(db_path, archive_path, max_age_days=0, max_messages=4, now=NOW)
+
+    assert [m.content for m in await load_archived_messages("chat", archive_path)] == [
+        m.content for m in messages[:6]
+    ]
+    assert len(await SQLiteChatMessageHistory("chat", db_path=db_path).messages) == 4
@@ -0,0 +1,117 @@
+# tests/test_retrieval.py
+
+from typing import List
+
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.lexical import BM25Index, LexicalIndexFile
+from app.core.retrieval import HybridRetriever
+from app.core.vector_store import AsyncVectorStore
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+CHUNKS = {f"chunk-{i}": f"Общий опыт разработки, часть {i}." for i in range(10)}
+CHUNKS["chunk-bot"] = "Telegram-бот на aiogram с RAG."
+
+
+class LengthEmbeddings(Embeddings):
+    """Fake embeddings that only capture text length, so names are invisible to dense search."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+async def vector_store(tmp_path):
+    store = AsyncVectorStore(
+        Chroma(persist_directory=str(tmp_path / "chroma_db"), embedding_function=LengthEmbeddings())
+    )
+    await store.aadd_documents(
+        list(CHUNKS), [Document(page_content=text, metadata={"source": doc_id}) for doc_id, text in CHUNKS.items()]
+    )
+    yield store
+    await store.aclose()
+
+
+async def test_hybrid_retriever_finds_exact_names(vector_store):
+    """Tests that a chunk ignored by dense search is retrieved through BM25."""
+    lexical_index = BM25Index()
+    lexical_index.add(list(CHUNKS), list(CHUNKS.values()))
+    question = "Что ты делал на aiogram? Расскажи подробно, пожалуйста, про тот проект"
+
+    dense = await HybridRetriever(vector_store=vector_store, k=3, fetch_k=3).ainvoke(question)
+    hybrid = await HybridRetriever(
+        vector_store=vector_store, lexical_index=lexical_index, k=3, fetch_k=3
+    ).ainvoke(question)
+
+    assert "chunk-bot" not in [doc.metadata["source"] for doc in dense]
+    assert len(hybrid) == 3
+    assert "chunk-bot" in [doc.metadata["source"] for doc in hybrid]
+    assert all(doc.page_content == CHUNKS[doc.metadata["source"]] for doc in hybrid)
+
+
+async def test_hybrid_retriever_skips_ids_missing_from_store(vector_store):
+    """Tests that chunks known only to a stale lexical index are ignored."""
+    lexical_index = BM25Index()
+    lexical_index.add(["deleted"], ["aiogram"])
+
+    docs = await HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=4).ainvoke("aiogram")
+
+    assert len(docs) == 4
+    assert "deleted" not in [doc.metadata["source"] for doc in docs]
+
+
+async def test_hybrid_retriever_loads_only_the_top_chunks(vector_store, monkeypatch):
+    """Tests that chunks found by BM25 only are loaded from the store only if they make the top k."""
+    lexical_index = BM25Index()
+    lexical_index.add(list(CHUNKS), list(CHUNKS.values()))
+    requested = []
+    original_aget = vector_store.aget
+
+    async def recording_aget(ids):
+        requested.extend(ids)
+        return await original_aget(ids)
+
+    monkeypatch.setattr(vector_store, "aget", recording_aget)
+    retriever = HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=2, fetch_k=10)
+
+    docs = await retriever._fuse("опыт разработки aiogram", [])
+
+    assert len(docs) == 2
+    assert len(requested) == 2
+
+
+async def test_lexical_index_file_is_reloaded_after_reindexing(vector_store, tmp_path):
+    """Tests that retrieval picks up a BM25 index rewritten by the indexing script."""
+    path = tmp_path / "bm25_index.json"
+    lexical_file = LexicalIndexFile(path, check_interval=0)
+    retriever = HybridRetriever(vector_store=vector_store, lexical_index=lexical_file, k=3, fetch_k=3)
+    question = "Что ты делал на aiogram? Расскажи подробно, пожалуйста, про тот проект"
+
+    assert await lexical_file.aload() is None
+    dense = await retriever.ainvoke(question)
+
+    lexical_index = BM25Index()
+    lexical_index.add(list(CHUNKS), list(CHUNKS.values()))
+    lexical_index.save(path)
+    hybrid = await retriever.ainvoke(question)
+
+    assert "chunk-bot" not in [doc.metadata["source"] for doc in dense]
+    assert "chunk-bot" in [doc.metadata["source"] for doc in hybrid]
+
+
+async def test_hybrid_retriever_sync_api_matches_async(vector_store):
+    """Tests that `invoke` returns the same chunks as `ainvoke`."""
+    lexical_index = BM25Index()
+    lexical_index.add(list(CHUNKS), list(CHUNKS.values()))
+    retriever = HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=3, fetch_k=3)
+    question = "Что ты делал на aiogram? Расскажи подробно, пожалуйста, про тот проект"
+
+    assert retriever.invoke(question) == await retriever.ainvoke(question)
@@ -0,0 +1,116 @@
+# tests/test_runtime.py
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core import runtime
+from app.core.runtime import RAGRuntime, close_runtime, get_runtime, init_runtime
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def reset_runtime(monkeypatch):
+    """Ensures every test starts without a process-wide runtime."""
+    monkeypatch.setattr(runtime, "_runtime", None)
+    monkeypatch.setattr(runtime, "_runtime_task", None)
+
+
+@pytest.fixture
+def fake_runtime(monkeypatch):
+    """Replaces the expensive RAGRuntime.create with a mock-backed runtime."""
+    instance = RAGRuntime(
+        http_client=AsyncMock(), vector_store=AsyncMock(), rag_chain=MagicMock()
+    )
+    create = AsyncMock(return_value=instance)
+    monkeypatch.setattr(RAGRuntime, "create", create)
+    return instance, create
+
+
+async def test_get_runtime_before_init_raises():
+    """Tests that accessing the runtime before startup fails loudly."""
+    with pytest.raises(RuntimeError):
+        get_runtime()
+
+
+async def test_init_runtime_builds_once(fake_runtime):
+    """Tests that the runtime is built once and shared between callers."""
+    instance, create = fake_runtime
+
+    first = await init_runtime()
+    second = await init_runtime()
+
+    assert first is instance
+    assert second is instance
+    assert get_runtime() is instance
+    create.assert_awaited_once()
+
+
+async def test_close_runtime_releases_http_client(fake_runtime):
+    """Tests that closing the runtime closes its HTTP client and resets it."""
+    instance, _ = fake_runtime
+    await init_runtime()
+
+    await close_runtime()
+    # A second close must be a no-op.
+    await close_runtime()
+
+    instance.http_client.aclose.assert_awaited_once()
+    with pytest.raises(RuntimeError):
+        get_runtime()
+
+
+async def test_concurrent_callers_share_one_build(fake_runtime, monkeypatch):
+    """Tests that a question arriving during the background build waits for the same build."""
+    instance, _ = fake_runtime
+    release = asyncio.Event()
+    create = AsyncMock()
+
+    async def slow_create():
+        await release.wait()
+        return instance
+
+    create.side_effect = slow_create
+    monkeypatch.setattr(RAGRuntime, "create", create)
+
+    background = asyncio.create_task(init_runtime())
+    waiting = asyncio.create_task(init_runtime())
+    await asyncio.sleep(0)
+    with pytest.raises(RuntimeError):
+        get_runtime()
+
+    release.set()
+    assert await background is instance
+    assert await waiting is instance
+    create.assert_awaited_once()
+
+
+async def test_failed_build_is_retried(fake_runtime, monkeypatch):
+    """Tests that a failed build is not cached, so the next caller builds again."""
+    instance, _ = fake_runtime
+    create = AsyncMock(side_effect=[ConnectionError("chroma is down"), instance])
+    monkeypatch.setattr(RAGRuntime, "create", create)
+
+    with pytest.raises(ConnectionError):
+        await init_runtime()
+    assert await init_runtime() is instance
+    assert create.await_count == 2
+
+
+async def test_close_runtime_cancels_pending_build(monkeypatch):
+    """Tests that shutting down during the background build cancels it."""
+    async def endless_create():
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(RAGRuntime, "create", AsyncMock(side_effect=endless_create))
+    build = asyncio.create_task(init_runtime())
+    await asyncio.sleep(0)
+
+    await close_runtime()
+
+    with pytest.raises(asyncio.CancelledError):
+        await build
+    assert runtime._runtime_task is None
@@ -0,0 +1,89 @@
+# tests/test_semantic_cache.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.core.chain import _with_semantic_cache
+from app.core.semantic_cache import SemanticResponseCache, fingerprint_context
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+CONTEXT = fingerprint_context("retrieved context")
+
+
+async def test_similar_question_hits():
+    """Tests that a question above the similarity threshold reuses the stored answer."""
+    cache = SemanticResponseCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    assert cache.lookup([1.0, 0.0], CONTEXT, "v1") is None
+    cache.store([1.0, 0.0], CONTEXT, "v1", "answer")
+
+    assert cache.lookup([0.99, 0.05], CONTEXT, "v1") == "answer"
+    assert cache.lookup([0.0, 1.0], CONTEXT, "v1") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+async def test_different_context_misses():
+    """Tests that an answer is only reused for the same retrieved context."""
+    cache = SemanticResponseCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.lookup([1.0, 0.0], CONTEXT, "v1")
+    cache.store([1.0, 0.0], CONTEXT, "v1", "answer")
+
+    assert cache.lookup([1.0, 0.0], fingerprint_context("other context"), "v1") is None
+
+
+async def test_kb_version_change_invalidates():
+    """Tests that a new knowledge-base version drops all stored answers."""
+    cache = SemanticResponseCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.lookup([1.0, 0.0], CONTEXT, "v1")
+    cache.store([1.0, 0.0], CONTEXT, "v1", "answer")
+
+    assert cache.lookup([1.0, 0.0], CONTEXT, "v2") is None
+    assert cache.stats()["entries"] == 0
+    # An answer generated for the superseded version is not stored.
+    cache.store([1.0, 0.0], CONTEXT, "v1", "stale answer")
+    assert cache.stats()["entries"] == 0
+
+
+async def test_ttl_and_lru_eviction(monkeypatch):
+    """Tests that entries expire after the TTL and the least recently used entry is evicted."""
+    now = [1000.0]
+    monkeypatch.setattr("app.core.semantic_cache.time.monotonic", lambda: now[0])
+    cache = SemanticResponseCache(threshold=0.95, ttl_seconds=60, max_entries=2)
+    cache.lookup([1.0, 0.0], CONTEXT, "v1")
+    cache.store([1.0, 0.0], CONTEXT, "v1", "first")
+    cache.store([0.0, 1.0], CONTEXT, "v1", "second")
+    assert cache.lookup([1.0, 0.0], CONTEXT, "v1") == "first"
+
+    cache.store([0.7, 0.7], CONTEXT, "v1", "third")
+    assert cache.lookup([0.0, 1.0], CONTEXT, "v1") is None
+    assert cache.lookup([1.0, 0.0], CONTEXT, "v1") == "first"
+
+    now[0] += 61
+    assert cache.lookup([1.0, 0.0], CONTEXT, "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+async def test_chain_step_skips_llm_and_bypasses_history(monkeypatch):
+    """Tests that the chain step reuses answers and bypasses sessions with history."""
+    monkeypatch.setattr("app.core.semantic_cache.compute_knowledge_base_version", lambda: "v1")
+    llm_chain = AsyncMock(side_effect=lambda x: f"generated for {x['question']}")
+    vector_store = MagicMock()
+    vector_store.embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    cache = SemanticResponseCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    step = _with_semantic_cache(RunnableLambda(llm_chain), cache, vector_store)
+
+    first = await step.ainvoke({"question": "о себе", "context": "ctx", "chat_history": []})
+    second = await step.ainvoke({"question": "расскажи о себе", "context": "ctx", "chat_history": []})
+    with_history = await step.ainvoke(
+        {"question": "о себе", "context": "ctx", "chat_history": [HumanMessage(content="hi")]}
+    )
+
+    assert first == second == "generated for о себе"
+    assert with_history == "generated for о себе"
+    assert llm_chain.await_count == 2
+    assert cache.stats()["bypasses"] == 1
@@ -0,0 +1,100 @@
+# tests/test_startup.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import settings
+from app.core import startup
+from app.core.metrics import metrics
+from app.core.startup import prepare_bot, prepare_rag, record_first_query
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def fake_runtime(monkeypatch):
+    """Replaces the database pool and the RAG runtime with mocks and starts with empty metrics."""
+    runtime = MagicMock()
+    runtime.vector_store.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+    runtime.vector_store.aquery = AsyncMock(return_value=[])
+    runtime.llm.ainvoke = AsyncMock()
+    get_pool = AsyncMock()
+    monkeypatch.setattr(startup, "get_pool", get_pool)
+    monkeypatch.setattr(startup, "start_stats_writer", MagicMock())
+    monkeypatch.setattr(startup, "start_retention", MagicMock())
+    monkeypatch.setattr(startup, "init_runtime", AsyncMock(return_value=runtime))
+    metrics.reset()
+    yield runtime, get_pool
+    metrics.reset()
+
+
+async def test_prepare_bot_only_opens_the_database(fake_runtime):
+    """Tests that polling can start without waiting for the RAG stack."""
+    runtime, get_pool = fake_runtime
+
+    await prepare_bot()
+
+    get_pool.assert_awaited_once()
+    startup.start_stats_writer.assert_called_once()
+    startup.start_retention.assert_called_once()
+    startup.init_runtime.assert_not_awaited()
+    gauges = metrics.snapshot()["gauges"]
+    assert "startup_database_seconds" in gauges
+    assert "startup_seconds" in gauges
+
+
+async def test_prepare_rag_warms_up_and_times_every_step(fake_runtime, monkeypatch):
+    """Tests that the background startup warms up retrieval, pings the LLM, starts canned answers and records timings."""
+    runtime, _ = fake_runtime
+    monkeypatch.setattr(settings, "STARTUP_WARM_UP", True)
+    monkeypatch.setattr(settings, "STARTUP_PING_LLM", True)
+    monkeypatch.setattr(settings, "CANNED_ANSWERS_ENABLED", True)
+
+    assert await prepare_rag() is runtime
+
+    runtime.vector_store.aquery.assert_awaited_once_with([0.1, 0.2], k=1)
+    runtime.llm.ainvoke.assert_awaited_once_with("ping", max_tokens=1)
+    runtime.canned_answers.start.assert_called_once()
+    gauges = metrics.snapshot()["gauges"]
+    for step in ("rag_runtime", "warm_up_embedding", "warm_up_retrieval", "llm_ping"):
+        assert f"startup_{step}_seconds" in gauges
+    assert gauges["rag_ready_seconds"] >= gauges["startup_rag_runtime_seconds"]
+
+
+async def test_failed_warm_up_does_not_block_startup(fake_runtime, monkeypatch):
+    """Tests that an unavailable embedding service only skips the warm-up."""
+    runtime, _ = fake_runtime
+    monkeypatch.setattr(settings, "STARTUP_WARM_UP", True)
+    monkeypatch.setattr(settings, "STARTUP_PING_LLM", False)
+    runtime.vector_store.embeddings.aembed_query.side_effect = ConnectionError("service is down")
+
+    assert await prepare_rag() is runtime
+
+    runtime.vector_store.aquery.assert_not_awaited()
+    runtime.llm.ainvoke.assert_not_awaited()
+    assert "startup_warm_up_embedding_seconds" in metrics.snapshot()["gauges"]
+
+
+async def test_failed_runtime_build_is_logged(fake_runtime, monkeypatch):
+    """Tests that a failed background build does not raise; the next question retries it."""
+    runtime, _ = fake_runtime
+    monkeypatch.setattr(startup, "init_runtime", AsyncMock(side_effect=ConnectionError("chroma is down")))
+
+    assert await prepare_rag() is None
+
+    runtime.canned_answers.start.assert_not_called()
+    assert "rag_ready_seconds" not in metrics.snapshot()["gauges"]
+
+
+async def test_first_query_is_recorded_once(monkeypatch):
+    """Tests that only the first question after startup sets the first-query gauge."""
+    monkeypatch.setattr(startup, "_first_query_recorded", False)
+    metrics.reset()
+
+    record_first_query(2.5)
+    record_first_query(0.1)
+
+    assert metrics.snapshot()["gauges"]["first_query_seconds"] == 2.5
+    metrics.reset()
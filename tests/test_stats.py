@@ -1,9 +1,15 @@
 # tests/test_stats.py
 
+import asyncio
+
 import pytest
 import aiosqlite
 
-from app.core.stats import log_query
+from app.core import stats
+from app.core.database import get_pool
+from app.core.metrics import metrics
+from app.core.stats_storage import fetch_query_stats
+from app.core.stats import StatsWriter, log_query, start_stats_writer, stop_stats_writer
 
 # Mark all tests in this file as asyncio
 pytestmark = pytest.mark.asyncio
@@ -50,18 +56,19 @@ async def test_log_query_full(isolated_db_path):
         llm_response=llm_response,
     )
 
+    # The context is stored as shared chunks, so the row is read back through the storage layer.
     async with aiosqlite.connect(isolated_db_path) as db:
-        cursor = await db.execute("SELECT * FROM query_stats")
-        record = await cursor.fetchone()
+        records = await fetch_query_stats(db)
 
-    assert record is not None
-    assert record[1] == user_id
-    assert record[2] == username
-    assert record[3] == first_name
-    assert record[4] == last_name
-    assert record[5] == query_text
-    assert record[6] == retrieved_context
-    assert record[7] == llm_response
+    assert len(records) == 1
+    record = records[0]
+    assert record["user_id"] == user_id
+    assert record["username"] == username
+    assert record["first_name"] == first_name
+    assert record["last_name"] == last_name
+    assert record["query_text"] == query_text
+    assert record["retrieved_context"] == retrieved_context
+    assert record["llm_response"] == llm_response
 
 
 async def test_log_query_minimal(isolated_db_path):
@@ -83,4 +90,89 @@ async def test_log_query_minimal(isolated_db_path):
     assert record[1] == user_id
     assert record[5] == query_text
     assert record[6] is None  # retrieved_context should be NULL
-    assert record[7] is None  # llm_response should be NULL
\ No newline at end of file
+    assert record[7] is None  # llm_response should be NULL
+
+
+async def count_rows(db_path: str) -> int:
+    """Returns the number of rows in the query_stats table."""
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM query_stats")
+        return (await cursor.fetchone())[0]
+
+
+@pytest.fixture
+async def running_writer(isolated_db_path, monkeypatch):
+    """Starts the process-wide stats writer with a short flush interval and always stops it."""
+    monkeypatch.setattr(stats, "_writer", None)
+    metrics.reset()
+    writer = start_stats_writer()
+    writer.flush_interval = 0.05
+    try:
+        yield writer
+    finally:
+        await stop_stats_writer()
+        metrics.reset()
+
+
+async def test_log_query_is_queued_while_the_writer_runs(isolated_db_path, running_writer):
+    """
+    Tests that with the background writer running, log_query returns without
+    writing, and the rows are written in one batch once the flush interval passes.
+    """
+    # Creates the schema; log_query itself does not touch the database while queuing.
+    await get_pool(isolated_db_path)
+
+    for i in range(3):
+        await log_query(user_id=i, username=None, first_name=None, last_name=None, query_text=f"CLICK: {i}")
+    assert await count_rows(isolated_db_path) == 0
+
+    await asyncio.sleep(0.2)
+    assert await count_rows(isolated_db_path) == 3
+    assert metrics.snapshot()["counters"]["stats_written"] == 3
+    assert metrics.snapshot()["timings"]["stats_flush_seconds"]["count"] == 1
+
+
+async def test_writer_flushes_full_batches_and_on_stop(isolated_db_path):
+    """Tests that a full batch is written without waiting for the interval and that stop writes the rest."""
+    writer = StatsWriter(isolated_db_path, batch_size=2, flush_interval=60)
+    writer.start()
+    try:
+        for i in range(3):
+            writer.submit((i, None, None, None, f"q{i}", None, None, "2024-01-01"))
+
+        await asyncio.sleep(0.1)
+        assert await count_rows(isolated_db_path) == 2
+    finally:
+        await writer.stop()
+    assert await count_rows(isolated_db_path) == 3
+    assert not writer.running
+
+
+async def test_rows_submitted_while_stopping_are_dropped(isolated_db_path):
+    """Tests that a row submitted after stop() has begun is refused and counted instead of being lost silently."""
+    metrics.reset()
+    writer = StatsWriter(isolated_db_path, flush_interval=60)
+    writer.start()
+    writer.submit((1, None, None, None, "before", None, None, "2024-01-01"))
+
+    stopping = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0)
+    assert not writer.running
+    assert writer.submit((2, None, None, None, "after", None, None, "2024-01-01")) is False
+    await stopping
+
+    assert await count_rows(isolated_db_path) == 1
+    assert metrics.snapshot()["counters"]["stats_dropped"] == 1
+    metrics.reset()
+
+
+async def test_writer_drops_rows_when_the_queue_is_full(isolated_db_path):
+    """Tests the backpressure policy: rows beyond the queue limit are dropped and counted."""
+    metrics.reset()
+    writer = StatsWriter(isolated_db_path, max_queue_size=2, flush_interval=60)
+
+    accepted = [writer.submit((i, None, None, None, f"q{i}", None, None, "2024-01-01")) for i in range(3)]
+
+    assert accepted == [True, True, False]
+    assert metrics.snapshot()["counters"]["stats_dropped"] == 1
+    metrics.reset()
@@ -0,0 +1,87 @@
+# tests/test_stats_storage.py
+
+import aiosqlite
+import pytest
+
+from app.config import settings
+from app.core.database import get_pool
+from app.core.stats_storage import (
+    compact_query_stats,
+    fetch_query_stats,
+    insert_query_stats,
+)
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+PARAGRAPHS = [f"Paragraph {i} about the project. " * 20 for i in range(5)]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Returns the path to a temporary database and compresses responses from 256 bytes."""
+    monkeypatch.setattr(settings, "STATS_COMPRESS_RESPONSES", True)
+    monkeypatch.setattr(settings, "STATS_COMPRESS_MIN_BYTES", 256)
+    return str(tmp_path / "test_stats_storage.sqlite3")
+
+
+def make_row(i: int, context: str | None, response: str | None) -> tuple:
+    return (i, "user", None, None, f"question {i}", context, response, "2024-01-01 00:00:00")
+
+
+async def test_rows_round_trip_and_share_chunks(db_path):
+    """Tests that contexts are split into shared chunks, long responses are compressed and both read back exactly."""
+    long_response = "A long answer with lists and paragraphs.\n\n" * 20
+    rows = [
+        make_row(1, "\n\n".join(PARAGRAPHS[:3]), long_response),
+        make_row(2, "\n\n".join(PARAGRAPHS[1:4]), "short"),
+        make_row(3, None, None),
+        make_row(4, "", "short"),
+    ]
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await insert_query_stats(db, rows)
+
+    async with pool.reader() as db:
+        records = await fetch_query_stats(db)
+        chunk_count = (await (await db.execute("SELECT COUNT(*) FROM stats_chunks")).fetchone())[0]
+        raw = await (await db.execute(
+            "SELECT retrieved_context, llm_response, llm_response_zlib FROM query_stats ORDER BY id"
+        )).fetchall()
+
+    by_user = {record["user_id"]: record for record in records}
+    for row in rows:
+        assert by_user[row[0]]["retrieved_context"] == row[5]
+        assert by_user[row[0]]["llm_response"] == row[6]
+    # Paragraphs 1 and 2 are shared by both contexts.
+    assert chunk_count == 4
+    assert raw[0][0] is None and raw[0][1] is None and raw[0][2] is not None
+    assert raw[1][1] == "short" and raw[1][2] is None
+
+
+async def test_compaction_converts_legacy_rows(db_path):
+    """Tests that the compaction command moves inline contexts into chunks and shrinks the rows, keeping their text."""
+    context = "\n\n".join(PARAGRAPHS)
+    response = "Answer. " * 100
+    pool = await get_pool(db_path)
+    async with pool.writer() as db:
+        await db.executemany(
+            "INSERT INTO query_stats (user_id, query_text, retrieved_context, llm_response, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(i, f"q{i}", context, response, "2024-01-01") for i in range(10)],
+        )
+
+    assert await compact_query_stats(db_path, batch_size=3) == 10
+    # A second run finds nothing left to convert.
+    assert await compact_query_stats(db_path) == 0
+
+    async with aiosqlite.connect(db_path) as db:
+        records = await fetch_query_stats(db)
+        inline = (await (await db.execute(
+            "SELECT COUNT(*) FROM query_stats WHERE retrieved_context IS NOT NULL OR llm_response IS NOT NULL"
+        )).fetchone())[0]
+        chunk_count = (await (await db.execute("SELECT COUNT(*) FROM stats_chunks")).fetchone())[0]
+
+    assert inline == 0
+    assert chunk_count == len(PARAGRAPHS)
+    assert all(r["retrieved_context"] == context and r["llm_response"] == response for r in records)
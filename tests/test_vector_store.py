@@ -0,0 +1,98 @@
+# tests/test_vector_store.py
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.core.local_embeddings import HashingEmbeddings
+from app.core.metrics import metrics
+from app.core.vector_store import AsyncVectorStore
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+
+class SlowCollection:
+    """A fake Chroma collection whose queries block their thread for a while."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def query(self, query_embeddings, n_results, include):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        with self._lock:
+            self.running -= 1
+        return {"ids": [["a"]], "documents": [["text"]], "metadatas": [[None]]}
+
+
+async def test_concurrent_queries_are_bounded():
+    """Tests that Chroma calls never exceed the worker count and excess callers wait without a thread."""
+    collection = SlowCollection()
+    store = MagicMock(_collection=collection, embeddings=HashingEmbeddings(dimensions=8))
+    vector_store = AsyncVectorStore(store, max_workers=2, max_pending=1)
+    waiting = []
+
+    async def watch_backlog():
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            waiting.append(metrics.snapshot()["gauges"]["vector_store_waiting"])
+
+    results, _ = await asyncio.gather(
+        asyncio.gather(*(vector_store.asimilarity_search(f"query {i}", k=1) for i in range(10))),
+        watch_backlog(),
+    )
+    await vector_store.aclose()
+
+    assert all(docs == [Document(page_content="text")] for docs in results)
+    assert collection.max_running == 2
+    assert len(collection.threads) == 2
+    assert all(name.startswith("chroma") for name in collection.threads)
+    # Ten queries and three slots: the rest waited on the event loop.
+    assert max(waiting) > 0
+
+
+async def test_sync_queries_go_through_the_executor():
+    """Tests that sync callers run Chroma calls on the same bounded executor, not on their own thread."""
+    collection = SlowCollection()
+    store = MagicMock(_collection=collection, embeddings=HashingEmbeddings(dimensions=8))
+    vector_store = AsyncVectorStore(store, max_workers=2, max_pending=1)
+
+    results = await asyncio.gather(*(asyncio.to_thread(vector_store.query, [0.0] * 8, 1) for _ in range(6)))
+    await vector_store.aclose()
+
+    assert all(result == [("a", Document(page_content="text"))] for result in results)
+    assert collection.max_running <= 2
+    assert all(name.startswith("chroma") for name in collection.threads)
+
+
+async def test_add_search_get_and_delete(tmp_path):
+    """Tests the async round trip against a real Chroma store."""
+    embeddings = HashingEmbeddings(dimensions=64)
+    vector_store = AsyncVectorStore(Chroma(persist_directory=str(tmp_path), embedding_function=embeddings))
+    docs = [
+        Document(page_content="Telegram-бот на aiogram", metadata={"source": "bot.md"}),
+        Document(page_content="PostgreSQL и Redis", metadata={"source": "db.md"}),
+    ]
+
+    await vector_store.aadd_documents(["bot", "db"], docs)
+    found = await vector_store.asimilarity_search("бот на aiogram", k=1)
+    stored = await vector_store.aget(["db", "missing"])
+    await vector_store.adelete(["bot"])
+    remaining = await vector_store.aget()
+    await vector_store.aclose()
+
+    assert found == [docs[0]]
+    assert stored == [("db", docs[1])]
+    assert [doc_id for doc_id, _ in remaining] == ["db"]
@@ -0,0 +1,132 @@
+# tests/test_webhook.py
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.config import settings
+from app.core import runtime
+from app.webhook import HEALTH_PATH, SECRET_TOKEN_HEADER, create_webhook_app
+
+# Mark all tests in this file as asyncio
+pytestmark = pytest.mark.asyncio
+
+SECRET = "test-secret"
+
+
+def make_update(update_id: int, text: str) -> dict:
+    """Builds the JSON of a text message update, as Telegram sends it."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+@pytest.fixture
+def received():
+    """The texts of the messages the bot has handled."""
+    return []
+
+
+@pytest.fixture
+async def telegram(monkeypatch, received):
+    """
+    Serves the webhook app with a dispatcher that records messages and returns
+    a client that sends updates to it the way Telegram does.
+    """
+    monkeypatch.setattr(settings, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(settings, "WEBHOOK_PATH", "/webhook")
+    monkeypatch.setattr(settings, "WEBHOOK_SHUTDOWN_TIMEOUT", 5.0)
+
+    router = Router()
+
+    @router.message(F.text)
+    async def record(message: Message) -> None:
+        if message.text == "slow":
+            await asyncio.sleep(0.2)
+        received.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="123456:test")
+    bot.session.close = AsyncMock()
+
+    client = TestClient(TestServer(create_webhook_app(bot, dp)))
+    await client.start_server()
+    yield client, bot
+    await client.close()
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    """Waits until the background update handling meets a condition."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def test_update_with_secret_is_handled(telegram, received):
+    """Tests that an update with the right secret token reaches the handlers."""
+    client, _ = telegram
+
+    response = await client.post("/webhook", json=make_update(1, "привет"), headers={SECRET_TOKEN_HEADER: SECRET})
+
+    assert response.status == 200
+    await wait_for(lambda: received == ["привет"])
+
+
+async def test_update_without_valid_secret_is_rejected(telegram, received):
+    """Tests that updates that do not come from Telegram are refused."""
+    client, _ = telegram
+
+    missing = await client.post("/webhook", json=make_update(1, "fake"))
+    wrong = await client.post("/webhook", json=make_update(2, "fake"), headers={SECRET_TOKEN_HEADER: "guess"})
+
+    assert missing.status == 401
+    assert wrong.status == 401
+    await asyncio.sleep(0.05)
+    assert received == []
+
+
+async def test_health_reports_rag_readiness(telegram, monkeypatch):
+    """Tests that the health endpoint is up before the RAG stack is and reports when it is ready."""
+    client, _ = telegram
+    monkeypatch.setattr(runtime, "_runtime", None)
+
+    response = await client.get(HEALTH_PATH)
+    assert response.status == 200
+    assert await response.json() == {"status": "ok", "rag_ready": False}
+
+    monkeypatch.setattr(runtime, "_runtime", object())
+    response = await client.get(HEALTH_PATH)
+    assert (await response.json())["rag_ready"] is True
+
+
+async def test_shutdown_waits_for_in_flight_updates(telegram, received):
+    """Tests that stopping the server lets an update being handled finish before the session is closed."""
+    client, bot = telegram
+    response = await client.post("/webhook", json=make_update(1, "slow"), headers={SECRET_TOKEN_HEADER: SECRET})
+    assert response.status == 200
+    assert received == []
+
+    await client.close()
+
+    assert received == ["slow"]
+    bot.session.close.assert_awaited()
+
+
+async def test_webhook_mode_requires_a_secret(monkeypatch):
+    """Tests that the webhook is never served without secret-token validation."""
+    monkeypatch.setattr(settings, "WEBHOOK_SECRET", None)
+
+    with pytest.raises(ValueError):
+        create_webhook_app(Bot(token="123456:test"), Dispatcher())
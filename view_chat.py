@@ -1,18 +1,41 @@
 # view_chat.py
 
 import argparse
+import asyncio
 import json
 import sqlite3
 from pathlib import Path
 
+import aiosqlite
+
 # Define the path to the database file relative to the project root.
 DB_PATH = Path(__file__).parent / "app" / "db" / "chat_history.sqlite3"
 
+# How long to wait while the bot holds a write lock, in milliseconds. The
+# script does not load the bot's settings, so it needs no bot credentials.
+BUSY_TIMEOUT_MS = 5000
+
+
+def _parse_message(role: str | None, content: str | None, message: str | None) -> tuple[str, str]:
+    """
+    Returns the type and text of a stored message.
+
+    Rows hold either typed role/content columns or, for older rows and
+    databases that predate them, LangChain's JSON dict in `message`.
+    """
+    if role is not None:
+        return role.upper(), content or ""
+    # LangChain message objects have a nested structure.
+    # The type is at the top level, but content is inside the 'data' key.
+    message_data = json.loads(message)
+    return message_data.get("type", "unknown").upper(), message_data.get("data", {}).get("content", "")
+
 
-def fetch_and_print_chat(user_id: int):
+async def fetch_and_print_chat(user_id: int):
     """
-    Connects to the SQLite database, fetches the chat history for a specific
-    user ID, and prints it to the console in a readable format.
+    Connects to the SQLite database through a read-only connection,
+    fetches the chat history for a specific user ID, and prints it to the
+    console in a readable format.
 
     Args:
         user_id: The ID of the user (session_id) whose chat history to retrieve.
@@ -22,48 +45,47 @@ def fetch_and_print_chat(user_id: int):
         return
 
     try:
-        # Connect to the SQLite database in read-only mode for safety.
+        # Open the database in read-only mode for safety.
         # The URI=True parameter is necessary for mode specification.
-        with sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True) as conn:
-            cursor = conn.cursor()
+        async with aiosqlite.connect(f"file:{DB_PATH}?mode=ro", uri=True) as db:
+            await db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            # Databases not yet migrated by the bot only have the JSON column.
+            cursor = await db.execute("PRAGMA table_info(chat_history)")
+            columns = {row[1] for row in await cursor.fetchall()}
+            selected = "role, content, message" if "role" in columns else "NULL, NULL, message"
 
             # Fetch all messages for the given session_id, ordered by their insertion.
-            cursor.execute(
-                "SELECT message FROM chat_history WHERE session_id = ? ORDER BY id ASC",
+            cursor = await db.execute(
+                f"SELECT {selected} FROM chat_history WHERE session_id = ? ORDER BY id ASC",
                 (str(user_id),),  # session_id is stored as TEXT
             )
-            rows = cursor.fetchall()
-
-            if not rows:
-                print(f"No chat history found for user_id: {user_id}")
-                return
-
-            print("-" * 50)
-            print(f"Chat History for user_id: {user_id}")
-            print("-" * 50)
-
-            # Process and print each message.
-            for row in rows:
-                try:
-                    # The message is stored as a JSON string in the first column.
-                    message_data = json.loads(row[0])
-                    # LangChain message objects have a nested structure.
-                    # The type is at the top level, but content is inside the 'data' key.
-                    msg_type = message_data.get("type", "unknown").upper()
-                    content = message_data.get("data", {}).get("content", "")
-
-                    # Format the output based on the message type.
-                    if msg_type == "HUMAN":
-                        print(f"[USER]: {content}\n")
-                    elif msg_type == "AI":
-                        print(f"[BOT]:  {content}\n")
-                    else:
-                        print(f"[{msg_type}]: {content}\n")
-
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f"[ERROR] Could not parse message: {row[0]}. Reason: {e}")
-
-            print("-" * 50)
+            rows = await cursor.fetchall()
+
+        if not rows:
+            print(f"No chat history found for user_id: {user_id}")
+            return
+
+        print("-" * 50)
+        print(f"Chat History for user_id: {user_id}")
+        print("-" * 50)
+
+        # Process and print each message.
+        for row in rows:
+            try:
+                msg_type, content = _parse_message(*row)
+
+                # Format the output based on the message type.
+                if msg_type == "HUMAN":
+                    print(f"[USER]: {content}\n")
+                elif msg_type == "AI":
+                    print(f"[BOT]:  {content}\n")
+                else:
+                    print(f"[{msg_type}]: {content}\n")
+
+            except (json.JSONDecodeError, TypeError) as e:
+                print(f"[ERROR] Could not parse message: {row}. Reason: {e}")
+
+        print("-" * 50)
 
     except sqlite3.OperationalError as e:
         print(f"Database error: {e}")
@@ -82,4 +104,4 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     # Run the main function with the provided user_id.
-    fetch_and_print_chat(args.user_id)
\ No newline at end of file
+    asyncio.run(fetch_and_print_chat(args.user_id))
\ No newline at end of file